@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_ml.settings')
 
 application = get_asgi_application()
+
+# Render the dashboard's service cards before the first request needs them
+from machine_learning.service_cards import warm  # noqa: E402
+
+warm()
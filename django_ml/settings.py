@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'machine_learning.middleware.MetricsMiddleware',
+    'machine_learning.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'machine_learning.context_processors.poll_token',
             ],
         },
     },
@@ -85,9 +88,24 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
-    }
+    },
+    # Optional read-only replica of 'default' (see machine_learning/routers.py):
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.mysql',
+    #     'NAME': 'django_ml',
+    #     'HOST': 'replica.internal',
+    #     ...
+    #     'TEST': {'MIRROR': 'default'},
+    # },
 }
 
+# GET requests read notifications, templates and service cards from
+# REPLICA_DATABASE when DATABASES defines it; a client that wrote reads
+# from the primary for REPLICA_STICKY_SECONDS
+DATABASE_ROUTERS = ['machine_learning.routers.PrimaryReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_STICKY_SECONDS = 5
+
 
 
 # Password validation
@@ -128,6 +146,18 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / "machine_learning/static",
 ]
+# collectstatic writes content-hashed names plus .gz/.br copies here; they
+# are served by machine_learning.static_assets.serve
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'machine_learning.static_assets.CompressedManifestStaticFilesStorage',
+    },
+}
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -135,3 +165,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Profile images (see machine_learning/profile_images.py). Uploads are stored
+# under the hash of their content with square WebP/JPEG copies at these sizes
+# for srcset; the pages show them at 20-120 CSS pixels.
+PROFILE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+PROFILE_IMAGE_MAX_PIXELS = 40_000_000
+PROFILE_IMAGE_SIZES = [32, 64, 128, 256]
+PROFILE_IMAGE_WORKERS = 2                 # threads writing the resized copies
+
+# Prometheus metrics (/metrics). Every process writes its samples to a file
+# in METRICS_DIR and /metrics adds them up; empty the directory before the
+# workers start. Scrapes are allowed from these addresses and for staff.
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 1.0              # seconds between writes per process
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Dashboard service cards are cached until a card is saved or deleted; with
+# a per-process cache, other processes refresh after this many seconds
+SERVICE_CARDS_CACHE_TIMEOUT = 600
+
+# Caches. 'shared' lives on disk, so every worker process on this host sees
+# the same entries; use Redis or Memcached when workers run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+# Signed tokens the dashboard polls with instead of the session (see
+# machine_learning/poll_tokens.py); revocations must be seen by all workers
+POLL_TOKEN_MAX_AGE = 900                  # seconds a token is accepted
+POLL_TOKEN_CACHE = 'shared'
+
+# Per-user token buckets (see machine_learning/throttling.py), as
+# scope: (requests per minute on average, requests allowed back to back)
+RATE_LIMITS = {
+    'generate_dynamic': (6, 3),
+}
+RATE_LIMIT_CACHE = 'shared'
+SHARED_LOCK_DIR = BASE_DIR / 'cache' / 'locks'
+
+# Notifications
+
+# Upper bound (seconds) on how long a polled notification feed may be
+# answered with 304 Not Modified without a database change, so notifications
+# that expire by time still drop out of clients' cached copies.
+NOTIFICATIONS_ETAG_MAX_AGE = 300
+
+# Server-Sent Events stream (/api/notifications/stream/). Only served
+# through django_ml.asgi (e.g. uvicorn); WSGI workers answer 204.
+NOTIFICATIONS_STREAM_HEARTBEAT = 15      # seconds between keep-alive comments
+NOTIFICATIONS_STREAM_RETRY_MS = 5000     # client reconnect delay
+NOTIFICATIONS_STREAM_HISTORY = 1000      # events kept for Last-Event-ID replay
+NOTIFICATIONS_STREAM_MAX_PENDING = 100   # queued events per connection before resync
+NOTIFICATIONS_STREAM_POLL_INTERVAL = 1.0  # seconds between reads of the change log
+
+# Delta sync (/api/notifications/?since=<cursor>)
+NOTIFICATIONS_SYNC_SETTLE_SECONDS = 5      # cursor lag covering in-flight transactions
+NOTIFICATIONS_SYNC_PAGE_SIZE = 500         # change log entries per delta response
+NOTIFICATIONS_CHANGE_LOG_RETENTION_DAYS = 14
+
+# Bulk creation (/api/notifications/bulk/)
+NOTIFICATIONS_BULK_MAX_ITEMS = 1000        # notifications accepted per request
+NOTIFICATIONS_BULK_CHUNK_SIZE = 500        # rows per INSERT statement
+
+# Compiled NotificationTemplate cache; saves and deletes in this process
+# clear it at once, other processes pick up changes within this many seconds
+NOTIFICATIONS_TEMPLATE_CACHE_TTL = 300
+
+# Dynamic notification scheduler (manage.py run_notification_scheduler)
+NOTIFICATIONS_SCHEDULER_INTERVAL = 3600     # seconds between cycles
+NOTIFICATIONS_SCHEDULER_JITTER = 300        # random spread of each wait, in seconds
+NOTIFICATIONS_SCHEDULER_MAX_PER_USER = 24   # dynamic notifications per user per day
+
+# Notification creation API: 'sync' writes each notification before
+# answering; 'buffered' queues it and answers 202, see
+# machine_learning/notification_ingest.py
+NOTIFICATIONS_INGEST_MODE = 'sync'
+NOTIFICATIONS_INGEST_MAX_QUEUE = 10000       # queued notifications before 429
+NOTIFICATIONS_INGEST_BATCH_SIZE = 500        # notifications per write
+NOTIFICATIONS_INGEST_FLUSH_INTERVAL = 0.5    # seconds a notification may wait
+
+# Notifications are kept (and shown) for this many calendar months, counting
+# the current one; older monthly partitions are dropped by
+# manage.py rotate_notification_partitions (MySQL)
+NOTIFICATIONS_RETENTION_MONTHS = 6
+NOTIFICATIONS_PARTITIONS_AHEAD = 3          # empty future months kept ready
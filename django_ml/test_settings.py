@@ -0,0 +1,39 @@
+"""
+Settings for the test suite: ``python manage.py test --settings=django_ml.test_settings``
+
+Two SQLite files stand in for the MySQL primary and its read replica, and
+the shared cache, locks and metrics live in a temporary directory.
+"""
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+SCRATCH_DIR = Path(tempfile.mkdtemp(prefix='django_ml_tests_'))
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_replica.sqlite3',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SCRATCH_DIR / 'cache',
+    },
+}
+SHARED_LOCK_DIR = SCRATCH_DIR / 'locks'
+METRICS_DIR = SCRATCH_DIR / 'metrics'
+MEDIA_ROOT = SCRATCH_DIR / 'media'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
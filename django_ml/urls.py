@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from machine_learning.static_assets import serve as serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Hashed, precompressed files from collectstatic
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
     path('', include('machine_learning.urls')),  # Include the URLs from machine_learning app
 ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
 from .models import Notification, NotificationTemplate, ServiceCard
+from .notification_templates import VARIABLE_PROVIDERS, sample_variables, template_cache
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -57,22 +58,25 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread', 'activate_notifications', 'deactivate_notifications']
     
     def mark_as_read(self, request, queryset):
-        updated = queryset.update(is_read=True, read_at=timezone.now())
+        # Global notifications are only marked read for the acting admin
+        updated = queryset.filter(is_global=False).update_tracked(is_read=True, read_at=timezone.now())
+        updated += queryset.filter(is_global=True).mark_read_for(request.user)
         self.message_user(request, f'{updated} notifications marked as read.')
     mark_as_read.short_description = "Mark selected notifications as read"
     
     def mark_as_unread(self, request, queryset):
-        updated = queryset.update(is_read=False, read_at=None)
+        updated = queryset.filter(is_global=False).update_tracked(is_read=False, read_at=None)
+        updated += queryset.filter(is_global=True).mark_unread_for(request.user)
         self.message_user(request, f'{updated} notifications marked as unread.')
     mark_as_unread.short_description = "Mark selected notifications as unread"
     
     def activate_notifications(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = queryset.update_tracked(is_active=True)
         self.message_user(request, f'{updated} notifications activated.')
     activate_notifications.short_description = "Activate selected notifications"
     
     def deactivate_notifications(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = queryset.update_tracked(is_active=False)
         self.message_user(request, f'{updated} notifications deactivated.')
     deactivate_notifications.short_description = "Deactivate selected notifications"
 
@@ -109,58 +113,36 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
         if not obj.title_template or not obj.message_template:
             return "No template content"
         
-        sample_data = {
-            'accuracy': '94.2',
-            'records': '5000',
-            'duration': '30',
-            'cpu_usage': '75',
-            'confidence': '0.87',
-            'improvement': '1.5',
-            'file_size': '25',
-            'record_count': '50000',
-            'model_version': '3',
-            'predictor_version': '2',
-            'production_version': '1',
-            'anomaly_confidence': '0.92',
-            'neural_net_version': '4'
-        }
-        
+        compiled = template_cache.compile(obj)
         try:
-            title = obj.title_template.format(**sample_data)
-            message = obj.message_template.format(**sample_data)
+            title, message = compiled.render(sample_variables())
             return f"<strong>{title}</strong><br><small>{message}</small>"
         except KeyError as e:
             return f"<span style='color: red;'>Missing variable: {e}</span>"
+        except ValueError as e:
+            return f"<span style='color: red;'>{e}</span>"
     preview.allow_tags = True
     preview.short_description = 'Preview'
     
     def variable_help(self, obj):
         """Show available variables for templates"""
-        return """
-        Available variables for templates:
-        • {accuracy} - Model accuracy (85-95%)
-        • {records} - Number of records (1000-11000)
-        • {duration} - Processing time in minutes (5-65)
-        • {cpu_usage} - CPU usage percentage (70-90)
-        • {confidence} - Confidence score (0.7-1.0)
-        • {improvement} - Accuracy improvement (0.5-2.5%)
-        • {file_size} - File size in MB (10-60)
-        • {record_count} - Record count (10000-110000)
-        • {model_version} - Model version (1-10)
-        • {predictor_version} - Predictor version (1-3)
-        • {production_version} - Production version (1-3)
-        • {anomaly_confidence} - Anomaly confidence (0.8-1.0)
-        • {neural_net_version} - Neural net version (1-5)
-        """
+        lines = ['Available variables for templates:']
+        lines += [
+            f'• {{{name}}} - {provider.description}'
+            for name, provider in VARIABLE_PROVIDERS.items()
+        ]
+        return '\n'.join(lines)
     variable_help.short_description = 'Variable Help'
     
     def activate_templates(self, request, queryset):
         updated = queryset.update(is_active=True)
+        template_cache.invalidate()
         self.message_user(request, f'{updated} templates activated.')
     activate_templates.short_description = "Activate selected templates"
     
     def deactivate_templates(self, request, queryset):
         updated = queryset.update(is_active=False)
+        template_cache.invalidate()
         self.message_user(request, f'{updated} templates deactivated.')
     deactivate_templates.short_description = "Deactivate selected templates"
     
@@ -174,10 +156,13 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
                                   data='{"count": 1}', 
                                   content_type='application/json')
         test_request.user = request.user
+        # Testing templates is not the user asking for notifications
+        test_request._dont_enforce_rate_limits = True
         
         for template in queryset:
             # Temporarily deactivate other templates
             NotificationTemplate.objects.exclude(id=template.id).update(is_active=False)
+            template_cache.invalidate()
             template.is_active = True
             template.save()
             
@@ -192,6 +177,7 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
         
         # Reactivate all templates
         NotificationTemplate.objects.all().update(is_active=True)
+        template_cache.invalidate()
     test_template.short_description = "Test selected templates"
 
 @admin.register(ServiceCard)
@@ -4,3 +4,23 @@ from django.apps import AppConfig
 class MachineLearningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'machine_learning'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from . import poll_tokens, routers, service_cards
+        from .models import NotificationTemplate, ServiceCard
+        from .notification_templates import template_cache
+        from .signals import notifications_changed
+
+        for signal in (post_save, post_delete):
+            signal.connect(template_cache.invalidate, sender=NotificationTemplate,
+                           dispatch_uid='notification_template_cache')
+            signal.connect(service_cards.invalidate, sender=ServiceCard,
+                           dispatch_uid='service_card_cache')
+            for model in (NotificationTemplate, ServiceCard):
+                signal.connect(routers.note_write, sender=model,
+                               dispatch_uid=f'replica_sticky_{model._meta.model_name}')
+        notifications_changed.connect(routers.note_write, dispatch_uid='replica_sticky_notifications')
+        pre_save.connect(poll_tokens.revoke_on_change, sender=User, dispatch_uid='poll_token_revoke_on_change')
+        post_delete.connect(poll_tokens.revoke_on_delete, sender=User, dispatch_uid='poll_token_revoke_on_delete')
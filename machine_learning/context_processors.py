@@ -0,0 +1,11 @@
+"""
+Template context processors for the machine_learning app
+"""
+from functools import partial
+
+from . import poll_tokens
+
+
+def poll_token(request):
+    """``{{ poll_token }}``: a polling token, signed only if a template uses it"""
+    return {'poll_token': partial(poll_tokens.issue_for_request, request)}
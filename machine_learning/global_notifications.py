@@ -0,0 +1,106 @@
+"""
+In-process cache of the active global notifications
+
+An inbox is a user's own notifications plus the global ones. Asking the
+database for both at once (``user=... OR is_global``) keeps MySQL from
+reading the user's index range in order. Global notifications are few,
+the same for every user and rarely change, so each process keeps them in
+memory instead and inbox queries read only ``user=...`` rows. The two are
+merged by ``(created_at, id)`` in Python; ``KeysetPaginator`` takes the
+globals as ``extra_rows`` for that.
+
+The cache is keyed by the ``version`` of the global ``NotificationCounter``,
+which moves on every change to a global notification. A request that
+reads a newer version than the cache holds reloads it, so processes need
+no invalidation messages and never serve a global set older than the
+counter they read. Expiry is time based rather than a change; it is
+applied whenever the globals are read.
+
+Read state is per user: their receipts on the visible globals are looked
+up in one query and set on copies, as ``with_read_state()`` would.
+"""
+import copy
+import threading
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import Notification, NotificationReceipt
+
+
+class GlobalNotificationCache:
+    """
+    Active global notifications of one process, newest first
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (version, notifications), swapped in one assignment
+        self._entry = (None, ())
+
+    def get(self, version):
+        """
+        Active global notifications as of ``version`` of the global counter
+        or later
+
+        Args:
+            version (int): Global counter version the caller has read; None
+                when there is no global counter yet, which is never cached
+        """
+        cached_version, notifications = self._entry
+        if version is not None and cached_version is not None and cached_version >= version:
+            return notifications
+
+        queryset = Notification.objects.retained().filter(
+            is_global=True, is_active=True
+        ).order_by('-created_at', '-id')
+        with self._lock:
+            cached_version, notifications = self._entry
+            if version is not None and cached_version is not None and cached_version >= version:
+                return notifications
+            notifications = tuple(queryset)
+            # Rows read inside a transaction may yet be rolled back
+            if version is not None and not connections[queryset.db].in_atomic_block:
+                self._entry = (version, notifications)
+        return notifications
+
+    def visible(self, version, now=None):
+        """
+        Globals from ``get()`` that are unexpired
+
+        They are all active, so those from before the retention window are
+        lasting and still shown (see ``NotificationQuerySet.retained()``).
+        """
+        now = now or timezone.now()
+        return [
+            notification for notification in self.get(version)
+            if not (notification.auto_expire and notification.expiry_date
+                    and notification.expiry_date < now)
+        ]
+
+    def for_user(self, user, version):
+        """
+        Visible globals for ``user``, with their read state as
+        ``user_has_read`` and ``user_read_at``
+
+        Returns copies; the cached instances are shared by every request.
+        """
+        notifications = self.visible(version)
+        if not notifications:
+            return []
+        read_at = dict(
+            NotificationReceipt.objects.filter(
+                user=user, notification_id__in=[notification.pk for notification in notifications]
+            ).values_list('notification_id', 'read_at')
+        )
+        annotated = []
+        for notification in notifications:
+            notification = copy.copy(notification)
+            notification.user_has_read = notification.pk in read_at
+            notification.user_read_at = read_at.get(notification.pk)
+            annotated.append(notification)
+        return annotated
+
+
+global_notifications = GlobalNotificationCache()
+
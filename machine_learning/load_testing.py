@@ -0,0 +1,520 @@
+"""
+Load generator that replays open dashboard tabs against a running server
+
+Every synthetic tab behaves like ``static/js/dashboard.js``: it loads
+``/`` and the static files the page links to (once per user, like a
+browser cache), polls ``/api/notifications/`` with ``If-None-Match`` every
+``poll_interval`` seconds and, if enabled, POSTs to ``generate-dynamic/`` on
+its own timer and holds the ``stream/`` connection open. Polls carry the
+page's ``X-Poll-Token`` like the browser does. Tabs of the same user share
+a session, as browser tabs do.
+
+Tabs are added in stages (``ramp``). For each stage the client side
+(throughput, latency, errors) is measured, and the server side (requests,
+database queries, query time) is read from the ``/metrics`` endpoint
+before and after the stage.
+
+Uses only ``asyncio`` streams, so it runs wherever the project does.
+"""
+import asyncio
+import gzip
+import json
+import random
+import re
+import ssl
+import statistics
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+_asset_pattern = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+_poll_token_pattern = re.compile(r'data-poll-token="([^"]*)"')
+_csrf_pattern = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+_metric_line = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self):
+        body = self.body
+        if self.headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body.decode('utf-8', 'replace')
+
+
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection, reopened when the server closes it
+    """
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            await self.close()
+            if not reused:
+                raise HTTPError(str(e)) from e
+            # The server dropped an idle keep-alive connection: try once more
+            return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _request(self, method, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.writer.write(self._head(method, path, headers, body))
+        if body:
+            self.writer.write(body)
+        await self.writer.drain()
+
+        status, response_headers = await self._read_head()
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            content = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''.join([chunk async for chunk in self._chunks()])
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self.reader.read()
+            response_headers['connection'] = 'close'
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return Response(status, response_headers, content)
+
+    async def stream(self, path, headers=None, on_open=None):
+        """
+        Send a GET and yield the body as it arrives (the connection is not
+        reused); ``on_open`` is called once the response has started
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.writer.write(self._head('GET', path, headers, None))
+        await self.writer.drain()
+        status, response_headers = await self._read_head()
+        if status != 200:
+            raise HTTPError(f'stream answered {status}')
+        if on_open is not None:
+            on_open()
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            async for chunk in self._chunks():
+                yield chunk
+        else:
+            while chunk := await self.reader.read(4096):
+                yield chunk
+
+    def _head(self, method, path, headers, body):
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host_header}', 'Connection: keep-alive']
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        if body is not None:
+            lines.append(f'Content-Length: {len(body)}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _read_head(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed before a response')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        headers = {}
+        set_cookies = []
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                set_cookies.append(value)
+            headers[name] = value
+        headers['set-cookie'] = set_cookies
+        if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+            headers['connection'] = 'close'
+        return int(status), headers
+
+    async def _chunks(self):
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                # Trailers end with an empty line
+                while (await self.reader.readline()).strip():
+                    pass
+                return
+            yield await self.reader.readexactly(size)
+            await self.reader.readexactly(2)
+
+
+class Browser:
+    """
+    Cookies and cached static files shared by the tabs of one user
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self.cookies = {}
+        self.cached_assets = set()
+
+    def cookie_header(self):
+        return '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+    def store_cookies(self, response):
+        for header in response.headers['set-cookie']:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                self.cookies[name] = morsel.value
+
+
+class StageStats:
+    """Client-side measurements of one ramp stage"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.not_modified = 0
+        self.bytes = 0
+
+    def record(self, kind, seconds, ok, size=0):
+        self.latencies.setdefault(kind, []).append(seconds)
+        if not ok:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+        self.bytes += size
+
+    def summary(self, elapsed):
+        everything = [value for values in self.latencies.values() for value in values]
+        requests = len(everything)
+        errors = sum(self.errors.values())
+        return {
+            'requests': requests,
+            'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+            'poll_rps': round(len(self.latencies.get('poll', ())) / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'not_modified': self.not_modified,
+            'megabytes': round(self.bytes / 1e6, 3),
+            **percentiles(everything),
+            'by_kind': {
+                kind: {
+                    'requests': len(values),
+                    'errors': self.errors.get(kind, 0),
+                    **percentiles(values),
+                }
+                for kind, values in sorted(self.latencies.items())
+            },
+        }
+
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {
+        'p50_ms': round(cuts[49] * 1000, 1),
+        'p95_ms': round(cuts[94] * 1000, 1),
+        'p99_ms': round(cuts[98] * 1000, 1),
+    }
+
+
+def parse_metrics(text):
+    """Totals per metric name from Prometheus text, all labels added up"""
+    totals = {}
+    for line in text.splitlines():
+        match = _metric_line.match(line)
+        if match is None:
+            continue
+        name, _, value = match.groups()
+        if name.endswith('_bucket'):
+            continue
+        try:
+            totals[name] = totals.get(name, 0.0) + float(value)
+        except ValueError:
+            continue
+    return totals
+
+
+def server_delta(before, after, elapsed):
+    """Server-side load between two ``/metrics`` scrapes"""
+    if before is None or after is None:
+        return None
+
+    def delta(name):
+        return after.get(name, 0.0) - before.get(name, 0.0)
+
+    requests = delta('http_request_duration_seconds_count')
+    queries = delta('http_request_db_queries_sum')
+    return {
+        'requests': int(requests),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+        'queries_per_request': round(queries / requests, 2) if requests else 0.0,
+        'queries_per_second': round(queries / elapsed, 1) if elapsed else 0.0,
+        'db_seconds_per_second': round(delta('http_request_db_seconds_total') / elapsed, 3) if elapsed else 0.0,
+        'mean_server_ms': round(delta('http_request_duration_seconds_sum') / requests * 1000, 1) if requests else None,
+    }
+
+
+class LoadTest:
+    """
+    Args:
+        base_url (str): Server to load, e.g. ``http://127.0.0.1:8000``
+        usernames (list): Accounts the tabs log in as, all with ``password``
+        password (str): Their password
+        ramp (list): Open tabs in each stage, increasing
+        stage_seconds (float): Length of a stage
+        poll_interval (float): Seconds between feed polls of a tab
+        generate_interval (float): Seconds between generate-dynamic POSTs of
+            a tab; 0 to never generate
+        stream (bool): Hold the notification stream open in every tab
+        timeout (float): Seconds before a request counts as failed
+        rng (random.Random): Source of tab start offsets
+        log (callable): Receives progress lines
+    """
+
+    STREAM_POLL_INTERVAL = 300  # dashboard.js polls this rarely while the stream is up
+
+    def __init__(self, base_url, usernames, password, ramp, stage_seconds=60, poll_interval=30,
+                 generate_interval=0, stream=False, timeout=10, rng=None, log=print):
+        self.base_url = base_url.rstrip('/')
+        self.browsers = [Browser(username) for username in usernames]
+        self.password = password
+        self.ramp = ramp
+        self.stage_seconds = stage_seconds
+        self.poll_interval = poll_interval
+        self.generate_interval = generate_interval
+        self.stream = stream
+        self.timeout = timeout
+        self.rng = rng or random.Random()
+        self.log = log
+        self.stats = StageStats()
+        self.stopping = asyncio.Event()
+
+    async def run(self):
+        self.log(f'Logging in {len(self.browsers)} users...')
+        await asyncio.gather(*(self.login(browser) for browser in self.browsers))
+
+        tabs = []
+        results = []
+        # Tabs open at random moments, not all at once; a stage is measured
+        # once they are all open, so it sees the steady state
+        opening = min(self.poll_interval, self.stage_seconds / 2)
+        for concurrency in self.ramp:
+            while len(tabs) < concurrency:
+                browser = self.browsers[len(tabs) % len(self.browsers)]
+                tabs.append(asyncio.create_task(self.tab(browser, self.rng.uniform(0, opening))))
+            await asyncio.sleep(opening)
+
+            before = await self.scrape_metrics()
+            self.stats = StageStats()
+            started = time.monotonic()
+            await asyncio.sleep(self.stage_seconds)
+            elapsed = time.monotonic() - started
+            after = await self.scrape_metrics()
+
+            result = {'tabs': concurrency, 'client': self.stats.summary(elapsed),
+                      'server': server_delta(before, after, elapsed)}
+            results.append(result)
+            self.log(format_stage(result))
+
+        self.stopping.set()
+        for task in tabs:
+            task.cancel()
+        await asyncio.gather(*tabs, return_exceptions=True)
+        return results
+
+    async def login(self, browser):
+        connection = Connection(self.base_url, self.timeout)
+        try:
+            page = await connection.request('GET', '/accounts/login/')
+            browser.store_cookies(page)
+            match = _csrf_pattern.search(page.text())
+            if match is None:
+                raise HTTPError('no CSRF token on the login page')
+            body = urlencode({
+                'username': browser.username,
+                'password': self.password,
+                'csrfmiddlewaretoken': match.group(1),
+            }).encode()
+            response = await connection.request('POST', '/accounts/login/', {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Cookie': browser.cookie_header(),
+                'Referer': f'{self.base_url}/accounts/login/',
+            }, body)
+            browser.store_cookies(response)
+            if response.status != 302 or 'sessionid' not in browser.cookies:
+                raise HTTPError(f'login as {browser.username} failed ({response.status})')
+        finally:
+            await connection.close()
+
+    async def timed(self, connection, kind, method, path, headers=None, body=None):
+        started = time.monotonic()
+        try:
+            response = await connection.request(method, path, headers, body)
+        except (OSError, HTTPError, asyncio.TimeoutError, ValueError):
+            self.stats.record(kind, time.monotonic() - started, ok=False)
+            return None
+        ok = response.status < 400
+        if response.status == 304:
+            self.stats.not_modified += 1
+        self.stats.record(kind, time.monotonic() - started, ok, len(response.body))
+        return response
+
+    async def tab(self, browser, delay):
+        """One open dashboard tab"""
+        await asyncio.sleep(delay)
+        connection = Connection(self.base_url, self.timeout)
+        state = {'etag': None, 'poll_token': None, 'stream_up': False, 'last_load': 0.0}
+        headers = lambda: {'Cookie': browser.cookie_header(), 'Accept-Encoding': 'gzip'}
+        helpers = []
+        try:
+            page = await self.timed(connection, 'page', 'GET', '/', headers())
+            if page is not None and page.status == 200:
+                html = page.text()
+                match = _poll_token_pattern.search(html)
+                state['poll_token'] = match.group(1) if match else None
+                for asset in _asset_pattern.findall(html):
+                    if asset not in browser.cached_assets:
+                        browser.cached_assets.add(asset)
+                        await self.timed(connection, 'static', 'GET', asset, headers())
+
+            if self.stream:
+                helpers.append(asyncio.create_task(self.hold_stream(browser, connection, state, headers)))
+            if self.generate_interval:
+                helpers.append(asyncio.create_task(self.generate(browser, headers)))
+
+            await self.poll(connection, state, headers)
+            next_poll = time.monotonic() + self.poll_interval
+            while not self.stopping.is_set():
+                await asyncio.sleep(max(0, next_poll - time.monotonic()))
+                next_poll += self.poll_interval
+                if not state['stream_up'] or time.monotonic() - state['last_load'] > self.STREAM_POLL_INTERVAL:
+                    await self.poll(connection, state, headers)
+        finally:
+            for helper in helpers:
+                helper.cancel()
+            await connection.close()
+
+    async def poll(self, connection, state, headers):
+        request_headers = headers()
+        if state['etag']:
+            request_headers['If-None-Match'] = state['etag']
+        if state['poll_token']:
+            request_headers['X-Poll-Token'] = state['poll_token']
+        response = await self.timed(connection, 'poll', 'GET', '/api/notifications/', request_headers)
+        if response is not None:
+            state['poll_token'] = response.headers.get('x-poll-token', state['poll_token'])
+        if response is not None and response.status in (200, 304):
+            state['etag'] = response.headers.get('etag', state['etag'])
+            state['last_load'] = time.monotonic()
+
+    async def generate(self, browser, headers):
+        connection = Connection(self.base_url, self.timeout)
+        try:
+            await asyncio.sleep(self.rng.uniform(0, self.generate_interval))
+            while not self.stopping.is_set():
+                request_headers = headers()
+                request_headers.update({
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': browser.cookies.get('csrftoken', ''),
+                })
+                await self.timed(connection, 'generate', 'POST', '/api/notifications/generate-dynamic/',
+                                 request_headers, json.dumps({'count': 1}).encode())
+                await asyncio.sleep(self.generate_interval)
+        finally:
+            await connection.close()
+
+    async def hold_stream(self, browser, poll_connection, state, headers):
+        """Keep the push stream open; reload the feed on its events, like EventSource"""
+        while not self.stopping.is_set():
+            connection = Connection(self.base_url, None)
+            buffer = b''
+            try:
+                async for chunk in connection.stream('/api/notifications/stream/', {
+                    'Cookie': browser.cookie_header(), 'Accept': 'text/event-stream',
+                }, on_open=lambda: state.update(stream_up=True)):
+                    buffer += chunk
+                    while b'\n\n' in buffer:
+                        event, buffer = buffer.split(b'\n\n', 1)
+                        if b'event: notifications' in event or b'event: resync' in event:
+                            await self.poll(poll_connection, state, headers)
+            except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError):
+                self.stats.record('stream', 0, ok=False)
+            finally:
+                state['stream_up'] = False
+                await connection.close()
+            await asyncio.sleep(5)  # the dashboard's reconnect delay
+
+    async def scrape_metrics(self):
+        connection = Connection(self.base_url, self.timeout)
+        try:
+            response = await connection.request('GET', '/metrics')
+        except (OSError, HTTPError, asyncio.TimeoutError):
+            return None
+        finally:
+            await connection.close()
+        if response.status != 200:
+            return None
+        return parse_metrics(response.text())
+
+
+def format_stage(result):
+    client, server = result['client'], result['server']
+    line = (f'{result["tabs"]:>6} tabs  {client["throughput_rps"]:>8.1f} req/s  '
+            f'p50 {client["p50_ms"]} ms  p95 {client["p95_ms"]} ms  p99 {client["p99_ms"]} ms  '
+            f'errors {client["error_rate"]:.2%}')
+    if server:
+        line += (f'  | server {server["queries_per_request"]} queries/req, '
+                 f'{server["db_seconds_per_second"]} db s/s')
+    return line
+
+
+def find_saturation(results, slo_ms, max_error_rate, poll_interval=None):
+    """
+    First stage where p95 broke the SLO, the error rate went over the limit
+    or, given ``poll_interval``, the server answered fewer than 90% of the
+    polls the tabs wanted to make (requests queue up instead)
+
+    Returns:
+        dict: That stage's result with a ``reason``, or None
+    """
+    for result in results:
+        client = result['client']
+        reasons = []
+        if client['p95_ms'] is not None and client['p95_ms'] > slo_ms:
+            reasons.append(f'p95 {client["p95_ms"]} ms over {slo_ms} ms')
+        if client['error_rate'] > max_error_rate:
+            reasons.append(f'error rate {client["error_rate"]:.2%}')
+        if poll_interval:
+            offered = result['tabs'] / poll_interval
+            if client['poll_rps'] < 0.9 * offered:
+                reasons.append(f'{client["poll_rps"]} polls/s answered of {offered:.1f} wanted')
+        if reasons:
+            return {**result, 'reason': '; '.join(reasons)}
+    return None
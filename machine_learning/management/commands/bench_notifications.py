@@ -0,0 +1,261 @@
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from machine_learning.models import Notification, NotificationTemplate
+from machine_learning.notification_utils import cleanup_expired_notifications
+from machine_learning.pagination import KeysetPaginator
+from machine_learning.views import _visible_notifications
+
+BENCH_TAG = 'bench-notifications'
+USERNAME_PREFIX = 'bench_user_'
+
+
+class Command(BaseCommand):
+    help = ('Seed a benchmark dataset, time the hot notification paths through the test '
+            'client and report p50/p95/p99 latency and query counts as JSON. With '
+            '--baseline, fail if a path got slower or makes more queries.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Benchmark users')
+        parser.add_argument('--per-user', type=int, default=200, help='Notifications per user')
+        parser.add_argument('--global', dest='global_count', type=int, default=100,
+                            help='Global notifications (seen by every user, real ones included)')
+        parser.add_argument('--expired-ratio', type=float, default=0.1,
+                            help='Share of notifications whose expiry date has passed')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed runs per path')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed runs per path first')
+        parser.add_argument('--deep-page', type=int, default=5,
+                            help='Page of the notification list timed as the deep page')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and users')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Compare with a report written earlier with --output')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown against the baseline (0.2 = 20%%)')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the benchmark users and notifications afterwards')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['iterations'], options['deep_page']) < 1:
+            raise CommandError('--users, --iterations and --deep-page must be positive')
+        if not 0 <= options['expired_ratio'] <= 1:
+            raise CommandError('--expired-ratio must be between 0 and 1')
+
+        rng = random.Random(options['seed'])
+        users = self.seed(options, rng)
+        self.stderr.write(f'Benchmarking {len(users)} users on {connection.vendor}...')
+
+        # The test client talks to 'testserver'; the timed paths run far more
+        # often than the rate limits allow
+        unlimited = dict.fromkeys(settings.RATE_LIMITS)
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], RATE_LIMITS=unlimited):
+            # Log every user in and create their counters before timing
+            self.clients = {}
+            for user in users:
+                self.ensure_ok(self.client_for(user).get(reverse('machine_learning:get_notifications_api')))
+
+            results = {}
+            for name, setup, run in self.scenarios(users, options, rng):
+                results[name] = self.measure(setup, run, options['iterations'], options['warmup'])
+                self.stderr.write(f'  {name}: p95 {results[name]["p95_ms"]} ms, '
+                                  f'{results[name]["queries"]} queries')
+
+        report = {
+            'database': connection.vendor,
+            'dataset': {
+                'users': options['users'],
+                'per_user': options['per_user'],
+                'global': options['global_count'],
+                'expired_ratio': options['expired_ratio'],
+            },
+            'iterations': options['iterations'],
+            'scenarios': results,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if options['cleanup']:
+            self.cleanup()
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['threshold'])
+
+    def seed(self, options, rng):
+        """
+        Create what is missing of the dataset; existing benchmark users
+        (and their notifications) are reused as they are
+        """
+        if not NotificationTemplate.objects.exists():
+            call_command('populate_notification_templates', stdout=self.stderr)
+
+        users = []
+        for i in range(options['users']):
+            user, created = User.objects.get_or_create(username=f'{USERNAME_PREFIX}{i:04d}')
+            if created:
+                self.seed_notifications(user, options['per_user'], options['expired_ratio'], rng)
+            users.append(user)
+
+        missing = options['global_count'] - Notification.objects.filter(
+            operation_id=BENCH_TAG, is_global=True
+        ).count()
+        if missing > 0:
+            self.seed_notifications(None, missing, options['expired_ratio'], rng)
+        return users
+
+    def seed_notifications(self, user, count, expired_ratio, rng):
+        now = timezone.now()
+        notifications = []
+        for i in range(count):
+            expired = rng.random() < expired_ratio
+            notifications.append(Notification(
+                user=user,
+                is_global=user is None,
+                title=f'Benchmark notification {i}',
+                message='Seeded by bench_notifications. ' * rng.randint(1, 8),
+                notification_type=rng.choice(Notification.NOTIFICATION_TYPES)[0],
+                priority=rng.choice(Notification.PRIORITY_LEVELS)[0],
+                is_read=user is not None and rng.random() < 0.5,
+                expiry_date=now - timedelta(hours=1) if expired else now + timedelta(days=rng.randint(1, 30)),
+                operation_id=BENCH_TAG,
+                metadata={'source': 'bench_notifications'},
+            ))
+        Notification.objects.bulk_create_tracked(notifications, batch_size=1000)
+
+    def scenarios(self, users, options, rng):
+        """The timed paths as ``(name, setup, run)``; ``setup`` is not timed"""
+        client_for = self.client_for
+        state = {}
+
+        def pick():
+            state['user'] = rng.choice(users)
+
+        def pick_deep():
+            pick()
+            paginator = KeysetPaginator(_visible_notifications(state['user']), 20)
+            cursor = None
+            for _ in range(options['deep_page'] - 1):
+                page = paginator.page(cursor)
+                if not page.has_next():
+                    break
+                cursor = page.next_cursor
+            state['cursor'] = cursor
+
+        def pick_with_unread():
+            pick()
+            Notification.objects.all().mark_unread_for(state['user'])
+
+        def reset_expired():
+            # Bring the expired rows back so every sweep has the same work
+            Notification.objects.filter(
+                operation_id=BENCH_TAG, is_active=False, expiry_date__lt=timezone.now()
+            ).update_tracked(is_active=True)
+
+        def get(url):
+            return lambda: self.ensure_ok(client_for(state['user']).get(url))
+
+        def deep_page():
+            params = {'cursor': state['cursor']} if state['cursor'] else {}
+            return self.ensure_ok(client_for(state['user']).get(list_url, params))
+
+        def post(url, body=None):
+            return lambda: self.ensure_ok(client_for(state['user']).post(
+                url, json.dumps(body) if body is not None else None, content_type='application/json'
+            ))
+
+        list_url = reverse('machine_learning:notification_list')
+        return [
+            ('get_notifications_api', pick, get(reverse('machine_learning:get_notifications_api'))),
+            ('notification_list_first_page', pick, get(list_url)),
+            ('notification_list_deep_page', pick_deep, deep_page),
+            ('mark_all_read', pick_with_unread, post(reverse('machine_learning:mark_all_read'))),
+            ('generate_dynamic_notifications', pick,
+             post(reverse('machine_learning:generate_dynamic_notifications'), {'count': 2})),
+            ('cleanup_expired_notifications', reset_expired, cleanup_expired_notifications),
+        ]
+
+    def client_for(self, user):
+        if user.pk not in self.clients:
+            self.clients[user.pk] = Client()
+            self.clients[user.pk].force_login(user)
+        return self.clients[user.pk]
+
+    def ensure_ok(self, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{response.request["PATH_INFO"]} answered {response.status_code}')
+        return response
+
+    def measure(self, setup, run, iterations, warmup):
+        for _ in range(warmup):
+            setup()
+            run()
+
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            setup()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0]
+        return {
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': round(statistics.median(queries)),
+            'max_queries': max(queries),
+        }
+
+    def compare(self, report, path, threshold):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+
+        if baseline.get('dataset') != report['dataset'] or baseline.get('database') != report['database']:
+            self.stderr.write(self.style.WARNING(
+                'The baseline was taken on another database or dataset; comparing anyway'
+            ))
+
+        regressions = []
+        for name, result in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name)
+            if before is None:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append(f'{name}: p95 {before["p95_ms"]} -> {result["p95_ms"]} ms')
+            if result['queries'] > before['queries']:
+                regressions.append(f'{name}: {before["queries"]} -> {result["queries"]} queries')
+
+        if regressions:
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f'REGRESSION {line}'))
+            raise CommandError(f'{len(regressions)} regressions against {path}')
+        self.stderr.write(self.style.SUCCESS(f'No regressions against {path}'))
+
+    def cleanup(self):
+        Notification.objects.filter(operation_id=BENCH_TAG).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        self.stderr.write('Removed the benchmark users and notifications')
@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from machine_learning.models import Notification
+
+BENCHMARK_TAG = 'metadata-benchmark'
+SOURCES = ['dynamic_generator', 'training', 'prediction', 'upload', 'system']
+STATUSES = ['queued', 'running', 'completed', 'failed', 'cancelled']
+
+
+class Command(BaseCommand):
+    help = ('Time filters on hot Notification.metadata keys through the JSON column '
+            'and through their indexed generated columns')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000,
+                            help='Benchmark rows to have in the table (existing ones are reused)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs of each query; the median is reported')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per insert while seeding')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed for the generated metadata')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 0 or options['repeat'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--rows must not be negative; --repeat and --batch-size must be positive')
+
+        self.seed(options['rows'], options['batch_size'], random.Random(options['seed']))
+        total = Notification.objects.count()
+        self.stdout.write(f'Timing on {connection.vendor} with {total} notifications '
+                          f'(median of {options["repeat"]} runs)')
+
+        json_lookups = Notification.objects.filter
+        column_lookups = Notification.objects.filter_metadata
+        self.stdout.write(f'{"query":<40} {"json ms":>10} {"column ms":>10} {"speedup":>8}')
+        for name, run in self.queries():
+            json_ms = self.time(lambda: run(json_lookups), options['repeat'])
+            column_ms = self.time(lambda: run(column_lookups), options['repeat'])
+            speedup = json_ms / column_ms if column_ms else float('inf')
+            self.stdout.write(f'{name:<40} {json_ms:>10.1f} {column_ms:>10.1f} {speedup:>7.1f}x')
+
+        if options['cleanup']:
+            deleted = self.cleanup(options['batch_size'])
+            self.stdout.write(f'Deleted {deleted} benchmark notifications')
+
+    def queries(self):
+        """
+        The metadata filters used by the notification code, as (name, callable)
+        pairs; the callable takes ``filter`` or ``filter_metadata``
+        """
+        return [
+            ('count isDynamic isnull (cleanup)',
+             lambda where: where(metadata__isDynamic__isnull=True).count()),
+            ('count isDynamic=True',
+             lambda where: where(metadata__isDynamic=True).count()),
+            ('latest 50 by source',
+             lambda where: list(where(metadata__source='training').order_by('-created_at')
+                                .values_list('pk', flat=True)[:50])),
+            ('count status=failed',
+             lambda where: where(metadata__status='failed').count()),
+            ('count confidence >= 0.99',
+             lambda where: where(metadata__confidence__gte=0.99).count()),
+        ]
+
+    def time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, rows, batch_size, rng):
+        """
+        Top the table up to ``rows`` benchmark notifications
+
+        The rows are inactive and belong to nobody, so they never show up in
+        feeds or badge counts.
+        """
+        existing = Notification.objects.filter(operation_id=BENCHMARK_TAG).count()
+        missing = rows - existing
+        if missing <= 0:
+            return
+        self.stdout.write(f'Inserting {missing} benchmark notifications...')
+        while missing > 0:
+            size = min(batch_size, missing)
+            with transaction.atomic():
+                Notification.objects.bulk_create(
+                    [self.make_notification(rng) for _ in range(size)], batch_size=size
+                )
+            missing -= size
+
+    def make_notification(self, rng):
+        metadata = {'source': rng.choice(SOURCES)}
+        if rng.random() < 0.3:
+            metadata['isDynamic'] = True
+        if rng.random() < 0.5:
+            metadata['status'] = rng.choice(STATUSES)
+        if rng.random() < 0.5:
+            metadata['confidence'] = round(rng.random(), 4)
+        return Notification(
+            title='Benchmark notification',
+            message='Generated by benchmark_metadata_lookups',
+            is_active=False,
+            operation_id=BENCHMARK_TAG,
+            metadata=metadata,
+        )
+
+    def cleanup(self, batch_size):
+        deleted = 0
+        while True:
+            ids = list(
+                Notification.objects.filter(operation_id=BENCHMARK_TAG)
+                .order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            Notification.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
@@ -0,0 +1,96 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import JsonResponse
+from django.test.utils import CaptureQueriesContext
+
+from machine_learning import serializers
+from machine_learning.models import NotificationCounter
+from machine_learning.pagination import KeysetPaginator
+from machine_learning.views import _visible_notifications
+
+
+class Command(BaseCommand):
+    help = ('Compare building a notification feed page from model instances with '
+            'the projected rows and encoder in machine_learning.serializers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose feed is serialized (default: first user)')
+        parser.add_argument('--page-size', type=int, default=10,
+                            help='Notifications per page (the API uses 10)')
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Runs of each code path; the median is reported')
+
+    def handle(self, *args, **options):
+        if options['page_size'] < 1 or options['iterations'] < 1:
+            raise CommandError('--page-size and --iterations must be positive')
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        else:
+            user = User.objects.order_by('id').first()
+            if user is None:
+                raise CommandError('No users found; create one or pass --user')
+
+        counters = NotificationCounter.objects.for_user(user)
+        unread_count, _ = NotificationCounter.objects.combine(*counters)
+        paths = [
+            ('model instances + JsonResponse', self.instances),
+            (f'projection + {"orjson" if serializers.orjson else "json"}', self.projected),
+        ]
+
+        outputs = []
+        self.stdout.write(f'Serializing {options["page_size"]} notifications per page for {user.username} '
+                          f'(median of {options["iterations"]} runs)')
+        self.stdout.write(f'{"code path":<34} {"ms":>8} {"queries":>8} {"bytes":>8}')
+        for name, run in paths:
+            with CaptureQueriesContext(connection) as queries:
+                content = run(user, options['page_size'], unread_count)
+            outputs.append(json.loads(content))
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                run(user, options['page_size'], unread_count)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'{name:<34} {statistics.median(timings):>8.2f} '
+                              f'{len(queries.captured_queries):>8} {len(content):>8}')
+
+        if outputs[0] == outputs[1]:
+            self.stdout.write(self.style.SUCCESS('Both code paths return the same JSON'))
+        else:
+            raise CommandError('The code paths returned different JSON')
+
+    def instances(self, user, page_size, unread_count):
+        """The feed as built before machine_learning.serializers"""
+        page = KeysetPaginator(_visible_notifications(user), page_size).page()
+        data = [{
+            'id': str(notification.id),
+            'title': notification.title,
+            'message': notification.message,
+            'type': notification.notification_type,
+            'priority': notification.priority,
+            'is_read': notification.user_has_read,
+            'created_at': notification.created_at.isoformat(),
+            'action_url': notification.action_url,
+            'action_text': notification.action_text,
+            'model_name': notification.model_name,
+        } for notification in page]
+        return JsonResponse({
+            'notifications': data,
+            'unread_count': unread_count,
+            'next_cursor': page.next_cursor,
+        }).content
+
+    def projected(self, user, page_size, unread_count):
+        page = KeysetPaginator(serializers.FEED.rows(_visible_notifications(user)), page_size).page()
+        return serializers.json_response({
+            'notifications': [serializers.FEED.output(row) for row in page],
+            'unread_count': unread_count,
+            'next_cursor': page.next_cursor,
+        }).content
@@ -6,7 +6,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         # Remove notifications that are not dynamic (don't have isDynamic metadata)
-        static_notifications = Notification.objects.filter(
+        static_notifications = Notification.objects.filter_metadata(
             metadata__isDynamic__isnull=True
         )
         
@@ -18,7 +18,7 @@ class Command(BaseCommand):
         )
         
         # Show remaining dynamic notifications
-        dynamic_count = Notification.objects.filter(
+        dynamic_count = Notification.objects.filter_metadata(
             metadata__isDynamic=True
         ).count()
         
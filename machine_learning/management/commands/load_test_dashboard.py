@@ -0,0 +1,101 @@
+import asyncio
+import json
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from machine_learning.load_testing import HTTPError, LoadTest, find_saturation
+
+USERNAME_PREFIX = 'load_user_'
+
+
+class Command(BaseCommand):
+    help = ('Open more and more simulated dashboard tabs against a running server and '
+            'report throughput, tail latency, errors and server-side query load per stage, '
+            'to find where one worker saturates')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server to load (runserver, gunicorn or an ASGI server)')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Accounts the tabs are spread over; created if missing')
+        parser.add_argument('--password', default='load-test-password',
+                            help='Password set on the load test accounts')
+        parser.add_argument('--ramp', default='50,100,200,400,800',
+                            help='Open tabs in each stage, comma separated and increasing')
+        parser.add_argument('--stage-seconds', type=float, default=60, help='Length of each stage')
+        parser.add_argument('--poll-interval', type=float, default=30,
+                            help='Seconds between feed polls of a tab (the dashboard uses 30)')
+        parser.add_argument('--generate-interval', type=float, default=3600,
+                            help='Seconds between generate-dynamic POSTs of a tab; 0 turns them off')
+        parser.add_argument('--stream', action='store_true',
+                            help='Hold the notification stream open in every tab')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Seconds before a request counts as failed')
+        parser.add_argument('--slo-ms', type=float, default=1000,
+                            help='p95 latency above which a stage counts as saturated')
+        parser.add_argument('--max-error-rate', type=float, default=0.01,
+                            help='Error rate above which a stage counts as saturated')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for tab start times')
+        parser.add_argument('--output', help='Write the stage results as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            ramp = [int(value) for value in options['ramp'].split(',')]
+        except ValueError:
+            raise CommandError('--ramp must be a comma separated list of tab counts')
+        if not ramp or min(ramp) < 1 or ramp != sorted(ramp):
+            raise CommandError('--ramp must list positive, increasing tab counts')
+        if options['users'] < 1 or options['poll_interval'] <= 0 or options['stage_seconds'] <= 0:
+            raise CommandError('--users, --poll-interval and --stage-seconds must be positive')
+
+        usernames = self.ensure_users(options['users'], options['password'])
+        load_test = LoadTest(
+            options['base_url'], usernames, options['password'], ramp,
+            stage_seconds=options['stage_seconds'],
+            poll_interval=options['poll_interval'],
+            generate_interval=options['generate_interval'],
+            stream=options['stream'],
+            timeout=options['timeout'],
+            rng=random.Random(options['seed']),
+            log=self.stdout.write,
+        )
+        try:
+            results = asyncio.run(load_test.run())
+        except (OSError, HTTPError, asyncio.TimeoutError) as e:
+            raise CommandError(f'Cannot load {options["base_url"]}: {e}')
+
+        if any(result['server'] is None for result in results):
+            self.stderr.write(self.style.WARNING(
+                'No server-side numbers: /metrics is only open to METRICS_ALLOWED_IPS'
+            ))
+
+        # With the stream open, tabs hardly poll, so the poll rate says nothing
+        poll_interval = None if options['stream'] else options['poll_interval']
+        saturation = find_saturation(results, options['slo_ms'], options['max_error_rate'], poll_interval)
+        if saturation is None:
+            self.stdout.write(self.style.SUCCESS(
+                f'Not saturated at {ramp[-1]} tabs; extend --ramp to find the limit'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Saturated at {saturation["tabs"]} tabs: {saturation["reason"]}'
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'stages': results, 'saturation': saturation}, f, indent=2)
+
+    def ensure_users(self, count, password):
+        """Create the missing load test accounts and give all of them ``password``"""
+        usernames = [f'{USERNAME_PREFIX}{i:04d}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Hash once; hashing per user would take longer than the test itself
+        hashed = make_password(password)
+        User.objects.bulk_create([
+            User(username=username, password=hashed) for username in usernames if username not in existing
+        ])
+        User.objects.filter(username__in=usernames).update(password=hashed)
+        return usernames
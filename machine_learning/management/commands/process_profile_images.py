@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from machine_learning import profile_images
+
+
+class Command(BaseCommand):
+    help = ('Move profile images uploaded before content-addressed storage into it and '
+            'write the missing resized variants of every profile image')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be converted without changing anything')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        default = User._meta.get_field('profile_image').default
+        moved = processed = skipped = 0
+
+        names = (
+            User.objects.exclude(profile_image='').exclude(profile_image=default)
+            .order_by().values_list('profile_image', flat=True).distinct()
+        )
+        for name in names.iterator():
+            if not default_storage.exists(name):
+                self.stderr.write(f'Missing file, skipped: {name}')
+                skipped += 1
+                continue
+
+            if not profile_images.is_content_addressed(name):
+                if dry_run:
+                    self.stdout.write(f'Would move {name}')
+                    moved += 1
+                    continue
+                try:
+                    with default_storage.open(name) as f:
+                        stored = profile_images.store_upload(f)
+                except ValidationError as e:
+                    self.stderr.write(f'Not a usable image, skipped: {name} ({e.messages[0]})')
+                    skipped += 1
+                    continue
+                User.objects.filter(profile_image=name).update(profile_image=stored)
+                moved += 1
+                name = stored
+
+            if not dry_run and not profile_images.is_processed(name):
+                profile_images.make_variants(name)
+                processed += 1
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} images, wrote variants for {processed}, skipped {skipped}'
+        ))
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q
+from machine_learning.models import Notification, NotificationCounter, NotificationReceipt
+from machine_learning.notification_utils import cleanup_expired_notifications
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized notification badge counters from the notifications table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of users to reconcile per transaction')
+        parser.add_argument('--skip-cleanup', action='store_true',
+                            help='Do not deactivate expired notifications before rebuilding')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if not options['skip_cleanup']:
+            expired = cleanup_expired_notifications()
+            self.stdout.write(f'Deactivated {expired} expired notifications')
+
+        with transaction.atomic():
+            counts = NotificationCounter.objects.compute_counts(None)
+            # Rows may have changed behind the counter's back: move its version
+            # on so feed ETags and cached global notifications are renewed
+            updated = NotificationCounter.objects.select_for_update().filter(
+                user__isnull=True
+            ).update(version=F('version') + 1, **counts)
+            if not updated:
+                NotificationCounter.objects.create(user=None, **counts)
+        self.stdout.write(
+            f'Global counter: {counts["unread_count"]} unread / {counts["total_count"]} total'
+        )
+
+        last_id = 0
+        reconciled = 0
+        changed = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            with transaction.atomic():
+                # Lock the batch so concurrent deltas queue up behind the rebuild
+                existing = {
+                    counter.user_id: counter
+                    for counter in NotificationCounter.objects.select_for_update().filter(user_id__in=user_ids)
+                }
+                actual = {
+                    row['user_id']: row
+                    for row in Notification.objects.filter(
+                        user_id__in=user_ids, is_global=False, is_active=True
+                    ).order_by().values('user_id').annotate(
+                        unread_count=Count('pk', filter=Q(is_read=False)),
+                        total_count=Count('pk'),
+                    )
+                }
+                global_reads = dict(
+                    NotificationReceipt.objects.filter(
+                        user_id__in=user_ids,
+                        notification__is_global=True,
+                        notification__is_active=True,
+                    ).order_by().values('user_id').annotate(read=Count('pk')).values_list('user_id', 'read')
+                )
+
+                to_create = []
+                to_update = []
+                for user_id in user_ids:
+                    row = actual.get(user_id, {'unread_count': 0, 'total_count': 0})
+                    counts = (row['unread_count'], row['total_count'], global_reads.get(user_id, 0))
+                    counter = existing.get(user_id)
+                    if counter is None:
+                        to_create.append(NotificationCounter(
+                            user_id=user_id,
+                            unread_count=counts[0],
+                            total_count=counts[1],
+                            global_read_count=counts[2],
+                        ))
+                    elif (counter.unread_count, counter.total_count, counter.global_read_count) != counts:
+                        counter.unread_count, counter.total_count, counter.global_read_count = counts
+                        to_update.append(counter)
+
+                NotificationCounter.objects.bulk_create(to_create)
+                NotificationCounter.objects.bulk_update(
+                    to_update, ['unread_count', 'total_count', 'global_read_count']
+                )
+
+            reconciled += len(user_ids)
+            changed += len(to_create) + len(to_update)
+            self.stdout.write(f'Reconciled {reconciled} users...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt counters for {reconciled} users ({changed} corrected)')
+        )
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from machine_learning import partitions
+from machine_learning.models import Notification, NotificationReceipt
+
+
+class Command(BaseCommand):
+    help = ('Add monthly notification partitions ahead of time and drop the partitions '
+            'of months past the retention window once none of their notifications last '
+            '(MySQL). Run daily.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=settings.NOTIFICATIONS_PARTITIONS_AHEAD,
+                            help='Future months to keep partitions ready for')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be added and dropped without changing anything')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Notifications deactivated per transaction before a drop')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f'Notification partitions are only used on MySQL, not {connection.vendor}')
+
+        existing = partitions.list_partitions(connection)
+        if not existing:
+            raise CommandError(f'{partitions.TABLE} is not partitioned; run the migrations first')
+
+        now = timezone.now()
+        keep_from = partitions.retention_start(now)
+        months = [month for _, month, _ in existing if month is not None]
+        newest = max(months) if months else partitions.add_months(partitions.month_start(now), -1)
+        wanted = partitions.add_months(partitions.month_start(now), options['ahead'])
+        to_add = partitions.months_between(partitions.add_months(newest, 1), wanted)
+        # Notifications that are active and not due to expire outlive the
+        # window; their months stay until those rows expire or are deactivated
+        lasting = {
+            month: self.lasting_rows(month, now) for _, month, _ in existing
+            if month is not None and month < keep_from
+        }
+        to_drop = [
+            (name, month, rows) for name, month, rows in existing
+            if month in lasting and not lasting[month]
+        ]
+
+        self.stdout.write(f'Keeping notifications created since {keep_from:%Y-%m-%d}')
+        for name, month, rows in existing:
+            if month is None:
+                action = 'catch-all'
+            elif month not in lasting:
+                action = 'keep'
+            elif lasting[month]:
+                action = f'keep ({lasting[month]} notifications last)'
+            else:
+                action = 'drop'
+            self.stdout.write(f'  {name:<8} ~{rows} rows  {action}')
+        for month in to_add:
+            self.stdout.write(f'  {partitions.partition_name(month):<8} new')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: would add {len(to_add)} and drop {len(to_drop)} partitions'
+            ))
+            return
+
+        if to_add:
+            with connection.cursor() as cursor:
+                cursor.execute(partitions.add_partitions_sql(to_add))
+            self.stdout.write(f'Added {len(to_add)} partitions')
+
+        for name, month, _ in to_drop:
+            self.release(month, options['batch_size'])
+            # Rows may have been reactivated since they were counted
+            if self.lasting_rows(month, timezone.now()):
+                self.stdout.write(self.style.WARNING(f'Kept {name}: notifications in it last again'))
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(partitions.drop_partitions_sql([name]))
+            self.stdout.write(f'Dropped {name}')
+
+        self.stdout.write(self.style.SUCCESS('Notification partitions are up to date'))
+
+    def in_month(self, month):
+        return Notification.objects.filter(
+            created_at__gte=month, created_at__lt=partitions.add_months(month, 1)
+        )
+
+    def lasting_rows(self, month, now):
+        """Notifications of ``month`` that are active and not due to expire"""
+        return self.in_month(month).lasting(now).count()
+
+    def release(self, month, batch_size):
+        """
+        Settle the rows of ``month`` before its partition goes
+
+        Dropping a partition bypasses Django, so rows that are still active
+        (expired ones the sweep has not reached) are deactivated first,
+        adjusting the badge counters and logging a tombstone for delta sync.
+        That happens in batches of ``batch_size`` by id. Their read receipts
+        are deleted after.
+        """
+        active = self.in_month(month).filter(is_active=True)
+        deactivated = 0
+        last_pk = None
+        while True:
+            batch = active.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            deactivated += active.filter(pk__in=pks).update_tracked(is_active=False)
+
+        receipts, _ = NotificationReceipt.objects.filter(
+            notification__created_at__gte=month,
+            notification__created_at__lt=partitions.add_months(month, 1),
+        ).delete()
+        self.stdout.write(
+            f'{partitions.partition_name(month)}: deactivated {deactivated} notifications '
+            f'and removed {receipts} read receipts'
+        )
+        return deactivated
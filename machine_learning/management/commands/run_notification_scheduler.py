@@ -0,0 +1,111 @@
+import random
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from machine_learning.models import Notification
+from machine_learning.notification_utils import create_dynamic_notifications
+
+
+class Command(BaseCommand):
+    help = ('Generate dynamic notifications for active users on a fixed cadence. '
+            'Run a single instance; it replaces the generator in the browser.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.NOTIFICATIONS_SCHEDULER_INTERVAL,
+                            help='Seconds between cycles')
+        parser.add_argument('--jitter', type=int, default=settings.NOTIFICATIONS_SCHEDULER_JITTER,
+                            help='Up to this many seconds are added to or taken from each wait')
+        parser.add_argument('--per-cycle', type=int, default=1,
+                            help='Notifications per user per cycle')
+        parser.add_argument('--max-per-user', type=int, default=settings.NOTIFICATIONS_SCHEDULER_MAX_PER_USER,
+                            help='Most dynamic notifications a user may receive per --cap-hours')
+        parser.add_argument('--cap-hours', type=int, default=24,
+                            help='Window the per-user cap applies to')
+        parser.add_argument('--active-days', type=int, default=30,
+                            help='Only users who logged in within this many days (0 for all active users)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users per transaction')
+        parser.add_argument('--once', action='store_true',
+                            help='Run one cycle and exit')
+
+    def handle(self, *args, **options):
+        if options['interval'] < 1 or options['per_cycle'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--interval, --per-cycle and --batch-size must be positive')
+
+        if options['once']:
+            self.run_cycle(options)
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        self.stdout.write(f'Scheduler started: every {options["interval"]}s ± {options["jitter"]}s')
+        # Start at a random point so restarted instances do not line up
+        stop.wait(random.uniform(0, options['jitter']))
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_cycle(options, stop)
+            finally:
+                close_old_connections()
+            delay = options['interval'] + random.uniform(-options['jitter'], options['jitter'])
+            stop.wait(max(0, delay - (time.monotonic() - started)))
+        self.stdout.write('Scheduler stopped')
+
+    def run_cycle(self, options, stop=None):
+        """Generate one round of notifications, a batch of users at a time"""
+        users = User.objects.filter(is_active=True)
+        if options['active_days']:
+            users = users.filter(last_login__gte=timezone.now() - timedelta(days=options['active_days']))
+
+        last_id = 0
+        created = 0
+        capped = 0
+        while stop is None or not stop.is_set():
+            user_ids = list(
+                users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            with transaction.atomic():
+                allowance = self.allowance(user_ids, options)
+                capped += sum(1 for allowed in allowance.values() if allowed < options['per_cycle'])
+                # Users with the same allowance are created together
+                by_count = {}
+                for user_id, allowed in allowance.items():
+                    if allowed > 0:
+                        by_count.setdefault(allowed, []).append(user_id)
+                for count, batch in by_count.items():
+                    created += len(create_dynamic_notifications(batch, count, generated_by='scheduler'))
+
+        self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} created {created} notifications '
+                          f'({capped} users at their cap)')
+        return created
+
+    def allowance(self, user_ids, options):
+        """How many notifications each user may still receive this cycle"""
+        since = timezone.now() - timedelta(hours=options['cap_hours'])
+        recent = dict(
+            Notification.objects.filter_metadata(
+                user_id__in=user_ids,
+                is_global=False,
+                created_at__gte=since,
+                metadata__isDynamic=True,
+            ).order_by().values('user_id').annotate(n=Count('pk')).values_list('user_id', 'n')
+        )
+        return {
+            user_id: max(0, min(options['per_cycle'], options['max_per_user'] - recent.get(user_id, 0)))
+            for user_id in user_ids
+        }
@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from machine_learning import seeding
+from machine_learning.models import Notification, NotificationTemplate
+
+
+class Command(BaseCommand):
+    help = ('Seed a production-sized data set of users, templates and notifications. '
+            'The same --seed always gives the same rows, with or without --processes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help='Users to create')
+        parser.add_argument('--notifications', type=int, default=5_000_000, help='Notifications to create')
+        parser.add_argument('--templates', type=int, default=50, help='Notification templates to create')
+        parser.add_argument('--global-ratio', type=float, default=0.01,
+                            help='Share of notifications shown to every user')
+        parser.add_argument('--read-ratio', type=float, default=0.6,
+                            help="Share of users' notifications that are read")
+        parser.add_argument('--expired-ratio', type=float, default=0.15,
+                            help='Share of notifications whose expiry date has passed')
+        parser.add_argument('--months', type=int, default=settings.NOTIFICATIONS_RETENTION_MONTHS,
+                            help='How many months back the notifications go')
+        parser.add_argument('--now',
+                            help='ISO date the data set ends at (default: today 00:00 UTC), '
+                                 'so reruns on other days give the same rows')
+        parser.add_argument('--password',
+                            help='Password of the seeded users (default: they cannot log in)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--chunk-size', type=int, default=50_000,
+                            help='Rows generated and committed per chunk; part of the seed')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes inserting chunks in parallel (not on SQLite)')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete earlier seeded users, templates and notifications first')
+        parser.add_argument('--skip-counters', action='store_true',
+                            help='Do not rebuild the badge counters afterwards')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'notifications', 'templates'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} must not be negative')
+        if min(options['chunk_size'], options['batch_size'], options['processes'], options['months']) < 1:
+            raise CommandError('--chunk-size, --batch-size, --processes and --months must be positive')
+        for name in ('global_ratio', 'read_ratio', 'expired_ratio'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be between 0 and 1')
+        if options['processes'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite allows one writer at a time; use --processes 1')
+        if options['notifications'] and not options['templates']:
+            raise CommandError('Notifications are made from templates; --templates must be positive')
+        now = self.parse_now(options['now'])
+
+        if options['reset']:
+            self.reset(options['batch_size'])
+        elif (Notification.objects.filter(operation_id=seeding.SEED_TAG).exists()
+              or User.objects.filter(username__startswith=seeding.USERNAME_PREFIX).exists()):
+            raise CommandError('A seeded data set exists already; pass --reset to replace it')
+
+        phases = []
+        templates = seeding.make_templates(options['templates'], options['seed'])
+        phase = seeding.Throughput('templates', len(templates))
+        NotificationTemplate.objects.bulk_create(templates, batch_size=options['batch_size'])
+        phase.add(len(templates))
+        phases.append(phase)
+
+        password = make_password(options['password']) if options['password'] else seeding.UNUSABLE_PASSWORD
+        phases.append(self.run_chunks(
+            'users', options['users'], options,
+            lambda start, count: (start, count, options['seed'], now, password, options['batch_size']),
+            seeding.seed_users_in_worker,
+        ))
+
+        user_ids = list(
+            User.objects.filter(username__startswith=seeding.USERNAME_PREFIX)
+            .order_by('username').values_list('pk', flat=True)
+        )
+        factory = seeding.NotificationFactory(
+            user_ids,
+            [(t.title_template, t.message_template, t.notification_type, t.priority) for t in templates],
+            now, options['months'],
+            options['global_ratio'], options['read_ratio'], options['expired_ratio'],
+        )
+        phases.append(self.run_chunks(
+            'notifications', options['notifications'], options,
+            lambda start, count: (start // options['chunk_size'], count, options['seed'], options['batch_size']),
+            seeding.seed_notifications_in_worker, factory,
+        ))
+
+        if not options['skip_counters']:
+            self.stdout.write('Rebuilding the badge counters...')
+            call_command('rebuild_notification_counters', skip_cleanup=True, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS('Seeded:'))
+        for phase in phases:
+            self.stdout.write(f'  {phase.name:<14} {phase.done:>10} rows  {phase.seconds:>8.1f} s  '
+                              f'{phase.rate:>10,.0f} rows/s')
+
+    def parse_now(self, value):
+        if value is None:
+            return timezone.now().astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            now = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'--now is not an ISO date: {value}')
+        return now if timezone.is_aware(now) else now.replace(tzinfo=dt_timezone.utc)
+
+    def run_chunks(self, name, total, options, arguments, work, factory=None):
+        """
+        Run ``work(*arguments(start, count))`` for every chunk of ``total``
+        rows, in this process or in a pool of ``--processes`` workers
+        """
+        chunk_size = options['chunk_size']
+        chunks = [(start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+        phase = seeding.Throughput(name, total)
+        if not chunks:
+            return phase
+
+        if options['processes'] == 1:
+            seeding.init_worker(factory)
+            for start, count in chunks:
+                phase.add(work(*arguments(start, count)))
+                self.stdout.write(f'  {phase}')
+            return phase
+
+        # Forked workers must not inherit open connections
+        connections.close_all()
+        with ProcessPoolExecutor(options['processes'], initializer=seeding.init_worker,
+                                 initargs=(factory,)) as pool:
+            futures = [pool.submit(work, *arguments(start, count)) for start, count in chunks]
+            for future in as_completed(futures):
+                phase.add(future.result())
+                self.stdout.write(f'  {phase}')
+        return phase
+
+    def reset(self, batch_size):
+        deleted = 0
+        while True:
+            ids = list(
+                Notification.objects.filter(operation_id=seeding.SEED_TAG)
+                .order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            Notification.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        users, _ = User.objects.filter(username__startswith=seeding.USERNAME_PREFIX).delete()
+        templates, _ = NotificationTemplate.objects.filter(name__startswith=seeding.TEMPLATE_PREFIX).delete()
+        self.stdout.write(f'Deleted {deleted} seeded notifications, {users} users and rows '
+                          f'referring to them, and {templates} templates')
@@ -0,0 +1,217 @@
+"""
+Generated columns for frequently filtered ``Notification.metadata`` keys
+
+Filtering on a key inside the ``metadata`` JSON column cannot use an index.
+The keys registered in ``METADATA_COLUMNS`` are copied by the database into
+virtual generated columns, each with an index.
+``Notification.objects.filter_metadata()`` takes ``filter()`` arguments and
+runs lookups such as ``metadata__isDynamic=True`` or
+``metadata__confidence__gte=0.9`` on those columns; ``filter()`` and
+``exclude()`` themselves are left alone.
+
+A generated column holds the key's value only when it has the registered
+JSON type (strings are cut to ``max_length``); otherwise it is NULL.
+Lookups are only rewritten for values of the column's type, and then
+match the same rows as the JSON lookup, with one exception: range lookups
+on a number column match numbers only, where the JSON lookup would also
+match every string value (strings sort above numbers in JSON comparisons).
+
+Number columns use ``CAST(... AS DOUBLE)``, which needs MySQL 8.0.17 or
+later.
+"""
+import re
+
+from django.db import NotSupportedError, models
+from django.db.models import F, Func, Q
+
+_key_pattern = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# JSON type names reported by each database's JSON type function
+_JSON_TYPES = {
+    'mysql': {
+        'string': ("'STRING'",),
+        'boolean': ("'BOOLEAN'",),
+        'number': ("'INTEGER'", "'UNSIGNED INTEGER'", "'DOUBLE'", "'DECIMAL'"),
+    },
+    'sqlite': {
+        'string': ("'text'",),
+        'boolean': ("'true'", "'false'"),
+        'number': ("'integer'", "'real'"),
+    },
+    'postgresql': {
+        'string': ("'string'",),
+        'boolean': ("'boolean'",),
+        'number': ("'number'",),
+    },
+}
+
+
+class JSONScalar(Func):
+    """
+    The value of a top-level JSON key if it has the given JSON type, else NULL
+
+    Never raises for values of another type, so it is safe to use in a
+    generated column under MySQL's strict mode.
+    """
+
+    def __init__(self, field, key, json_type, max_length=None):
+        if not _key_pattern.match(key):
+            raise ValueError(f'Unsupported metadata key: {key!r}')
+        self.key = key
+        self.json_type = json_type
+        self.max_length = max_length
+        super().__init__(F(field))
+
+    def _case(self, type_sql, value_sql, vendor):
+        types = ', '.join(_JSON_TYPES[vendor][self.json_type])
+        return f'CASE WHEN {type_sql} IN ({types}) THEN {value_sql} END'
+
+    def as_mysql(self, compiler, connection):
+        if (self.json_type == 'number' and not connection.mysql_is_mariadb
+                and connection.mysql_version < (8, 0, 17)):
+            raise NotSupportedError('Number metadata columns need MySQL 8.0.17 or later')
+        column, params = compiler.compile(self.source_expressions[0])
+        value = f"JSON_EXTRACT({column}, '$.{self.key}')"
+        if self.json_type == 'string':
+            result = f'LEFT(JSON_UNQUOTE({value}), {self.max_length})'
+        elif self.json_type == 'boolean':
+            result = f"JSON_UNQUOTE({value}) = 'true'"
+        else:
+            result = f'CAST({value} AS DOUBLE)'
+        return self._case(f'JSON_TYPE({value})', result, 'mysql'), params
+
+    def as_sqlite(self, compiler, connection):
+        column, params = compiler.compile(self.source_expressions[0])
+        json_type = f"json_type({column}, '$.{self.key}')"
+        if self.json_type == 'string':
+            result = f"substr(json_extract({column}, '$.{self.key}'), 1, {self.max_length})"
+        elif self.json_type == 'boolean':
+            result = f"{json_type} = 'true'"
+        else:
+            result = f"json_extract({column}, '$.{self.key}')"
+        return self._case(json_type, result, 'sqlite'), params
+
+    def as_postgresql(self, compiler, connection):
+        column, params = compiler.compile(self.source_expressions[0])
+        text = f"({column} ->> '{self.key}')"
+        if self.json_type == 'string':
+            result = f'left({text}, {self.max_length})'
+        elif self.json_type == 'boolean':
+            result = f'{text}::boolean'
+        else:
+            result = f'{text}::double precision'
+        return self._case(f"jsonb_typeof({column} -> '{self.key}')", result, 'postgresql'), params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f'Metadata columns are not supported on {connection.vendor}')
+
+
+class MetadataColumn:
+    """
+    One metadata key promoted to a generated column
+
+    Args:
+        key (str): Key in ``Notification.metadata``
+        field (str): Name of the generated field on ``Notification``
+        json_type (str): ``'string'``, ``'boolean'`` or ``'number'``
+        max_length (int): Characters kept of string values
+    """
+
+    LOOKUPS = {
+        'string': {'exact', 'in'},
+        'boolean': {'exact'},
+        'number': {'exact', 'in', 'gt', 'gte', 'lt', 'lte'},
+    }
+
+    def __init__(self, key, field, json_type, max_length=None):
+        self.key = key
+        self.field = field
+        self.json_type = json_type
+        self.max_length = max_length
+
+    def generated_field(self):
+        if self.json_type == 'string':
+            output_field = models.CharField(max_length=self.max_length)
+        elif self.json_type == 'boolean':
+            output_field = models.BooleanField()
+        else:
+            output_field = models.FloatField()
+        return models.GeneratedField(
+            expression=JSONScalar('metadata', self.key, self.json_type, self.max_length),
+            output_field=output_field,
+            db_persist=False,
+            null=True,
+            help_text=f'metadata["{self.key}"] when it is a {self.json_type}',
+        )
+
+    def accepts(self, value):
+        if self.json_type == 'string':
+            # A value as long as max_length could match a truncated longer one
+            return isinstance(value, str) and len(value) < self.max_length
+        if self.json_type == 'boolean':
+            return isinstance(value, bool)
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def rewrite(self, lookup, operator, value):
+        """An equivalent ``Q`` using the generated column, or None"""
+        if operator == 'isnull' and value is True:
+            # NULL also stands for values of another type, so the JSON
+            # lookup stays as a check on the rows the index finds
+            return Q(**{f'{self.field}__isnull': True}) & Q(**{lookup: value})
+        if operator not in self.LOOKUPS[self.json_type]:
+            return None
+        if operator == 'in':
+            if not isinstance(value, (list, tuple, set)) or not all(self.accepts(v) for v in value):
+                return None
+        elif not self.accepts(value):
+            return None
+        return Q(**{f'{self.field}__{operator}': value})
+
+
+METADATA_COLUMNS = {
+    column.key: column for column in [
+        MetadataColumn('isDynamic', 'meta_is_dynamic', 'boolean'),
+        MetadataColumn('source', 'meta_source', 'string', max_length=100),
+        MetadataColumn('status', 'meta_status', 'string', max_length=50),
+        MetadataColumn('confidence', 'meta_confidence', 'number'),
+    ]
+}
+
+
+def rewrite_lookup(lookup, value):
+    """
+    Rewrite one ``metadata__<key>[__<lookup>]`` filter to use its generated
+    column
+
+    Returns:
+        Q: The rewritten filter, or None to keep the original
+    """
+    parts = lookup.split('__')
+    if parts[0] != 'metadata' or len(parts) not in (2, 3):
+        return None
+    column = METADATA_COLUMNS.get(parts[1])
+    if column is None:
+        return None
+    return column.rewrite(lookup, parts[2] if len(parts) == 3 else 'exact', value)
+
+
+def rewrite_filters(kwargs):
+    """
+    Rewrite the keyword arguments of a ``filter()``
+
+    Only keyword arguments are taken: under a negation (``exclude()``,
+    ``~Q``) rows where the key is missing or has another type would be
+    matched differently.
+
+    Returns:
+        tuple: ``(args, kwargs)`` for ``filter()``
+    """
+    args = []
+    remaining = {}
+    for lookup, value in kwargs.items():
+        rewritten = rewrite_lookup(lookup, value)
+        if rewritten is None:
+            remaining[lookup] = value
+        else:
+            args.append(rewritten)
+    return args, remaining
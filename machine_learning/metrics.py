@@ -0,0 +1,433 @@
+"""
+Request and notification metrics in the Prometheus text format
+
+Each process keeps its samples in memory and a thread writes them every
+``METRICS_FLUSH_INTERVAL`` seconds, and at exit, to its own file
+``metrics-<pid>-<nonce>.json`` in ``METRICS_DIR``. ``/metrics`` adds up the
+files of all processes, so every web worker (and management commands such
+as the scheduler) contributes to the same totals. Only one process ever
+writes a file, and the nonce is new for every process, so a reused pid
+never takes over an old file.
+
+Each process also holds a lock on ``metrics-<pid>-<nonce>.lock`` for as
+long as it runs; the operating system releases it when the process exits.
+``/metrics`` folds the counters of exited processes into ``exited.json``,
+since they are part of the totals, and deletes their files. Their gauges
+are dropped: a queue that is gone holds nothing. Without ``METRICS_DIR``
+each process reports only its own samples.
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+FILE_PREFIX = 'metrics-'
+EXITED_FILE = 'exited.json'
+COLLECT_LOCK = 'collect.lock'
+
+
+class Registry:
+    """
+    Metric families and the samples this process has recorded
+
+    Samples are kept flat, keyed by ``(sample name, labels)``, so the
+    samples of several processes can be merged by adding them up.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.families = []
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._gauges = []
+        # Pid the flusher thread runs in; a forked worker starts its own
+        self._flusher_pid = None
+        # (pid, file name stem, open lock file) of this process
+        self._owner = (None, None, None)
+
+    def register(self, metric):
+        self.families.append(metric)
+        if isinstance(metric, Gauge):
+            self._gauges.append(metric)
+        return metric
+
+    def add(self, name, labels, amount):
+        with self._lock:
+            key = (name, labels)
+            self._samples[key] = self._samples.get(key, 0) + amount
+            self._dirty = True
+        self.start_flusher()
+
+    def add_many(self, entries):
+        """Add several ``(name, labels, amount)`` samples under one lock"""
+        with self._lock:
+            for name, labels, amount in entries:
+                key = (name, labels)
+                self._samples[key] = self._samples.get(key, 0) + amount
+            self._dirty = True
+        self.start_flusher()
+
+    def snapshot(self):
+        with self._lock:
+            samples = dict(self._samples)
+        for gauge in self._gauges:
+            samples.update(gauge.collect())
+        return samples
+
+    @property
+    def path(self):
+        return self.directory / f'{self._claim()}.json'
+
+    def _claim(self):
+        """
+        Name of this process's files, taking the lock that marks it running
+
+        A forked worker gets a name and lock of its own.
+        """
+        pid, stem, _ = self._owner
+        if pid == os.getpid():
+            return stem
+        with self._lock:
+            pid, stem, inherited = self._owner
+            if pid == os.getpid():
+                return stem
+            if inherited is not None:
+                # The parent's lock stays held by the parent
+                inherited.close()
+            stem = f'{FILE_PREFIX}{os.getpid()}-{secrets.token_hex(4)}'
+            self.directory.mkdir(parents=True, exist_ok=True)
+            alive = open(self.directory / f'{stem}.lock', 'a')
+            locks.lock(alive, locks.LOCK_EX)
+            self._owner = (os.getpid(), stem, alive)
+        return stem
+
+    def start_flusher(self):
+        """Flush on a thread, so samples of an idle process reach the file too"""
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name='metrics-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's samples to its file"""
+        if self.directory is None or not (self._dirty or self._gauges):
+            return
+        with self._lock:
+            self._dirty = False
+        samples = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.path
+            temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+            temporary.write_text(json.dumps(samples))
+            # Readers see either the old file or the new one, never half of one
+            os.replace(temporary, path)
+        except OSError:
+            logger.warning('Could not write metrics to %s', self.directory, exc_info=True)
+
+    def collect(self):
+        """
+        Samples of every process, added up
+
+        Files of exited processes are folded into ``EXITED_FILE`` on the way.
+        That happens under a lock, so two scrapes never fold a file twice.
+        """
+        if self.directory is None:
+            return self.snapshot()
+
+        own = self.path
+        totals = self.snapshot()
+        gauges = {gauge.name for gauge in self._gauges}
+        with self._exclusive(COLLECT_LOCK):
+            exited = self._read_exited()
+            exited_samples = dict(exited['samples'])
+            paths = [path for path in self.directory.glob(f'{FILE_PREFIX}*.json') if path != own]
+            exited_paths = []
+            for path in paths:
+                samples = _read_samples(path)
+                if samples is None:
+                    # Removed while listing, or not a metrics file
+                    continue
+                if _is_running(path):
+                    _add(totals, samples)
+                    continue
+                exited_paths.append(path)
+                if path.name not in exited['folded']:
+                    _add(exited_samples, [sample for sample in samples if sample[0] not in gauges])
+                    exited['folded'].append(path.name)
+            if exited_paths:
+                self._write_exited(exited['folded'], exited_samples)
+                for path in exited_paths:
+                    path.unlink(missing_ok=True)
+                    path.with_suffix('.lock').unlink(missing_ok=True)
+            self._remove_orphan_locks()
+        _add(totals, [[name, labels, value] for (name, labels), value in exited_samples.items()])
+        return totals
+
+    @contextmanager
+    def _exclusive(self, name):
+        with open(self.directory / name, 'a') as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def _read_exited(self):
+        """
+        Counters of exited processes, and the files already added to them
+
+        A file is listed until it is deleted, so a scrape that stopped
+        between writing this and deleting the file does not add it twice.
+        """
+        try:
+            exited = json.loads((self.directory / EXITED_FILE).read_text())
+        except FileNotFoundError:
+            exited = {'folded': [], 'samples': []}
+        samples = {}
+        _add(samples, exited['samples'])
+        folded = [name for name in exited['folded'] if (self.directory / name).exists()]
+        return {'folded': folded, 'samples': samples}
+
+    def _write_exited(self, folded, samples):
+        path = self.directory / EXITED_FILE
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({
+            'folded': folded,
+            'samples': [[name, list(labels), value] for (name, labels), value in samples.items()],
+        }))
+        os.replace(temporary, path)
+
+    def _remove_orphan_locks(self):
+        """Locks of exited processes that never wrote a file"""
+        own = self.path.with_suffix('.lock')
+        for path in self.directory.glob(f'{FILE_PREFIX}*.lock'):
+            if path != own and not path.with_suffix('.json').exists() and not _is_running(path):
+                path.unlink(missing_ok=True)
+
+    def exposition(self):
+        """All metrics in the Prometheus text format"""
+        samples = self.collect()
+        lines = []
+        for family in self.families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.type}')
+            names = family.sample_names()
+            own = [item for item in samples.items() if item[0][0] in names]
+            if not own and family.type == 'counter' and not family.labelnames:
+                own = [((family.name, ()), 0)]
+            for (name, labels), value in sorted(own, key=family.sort_key):
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _read_samples(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _add(totals, samples):
+    """Add ``[name, labels, value]`` samples to ``totals``"""
+    for name, labels, value in samples:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        totals[key] = totals.get(key, 0) + value
+
+
+def _is_running(path):
+    """Whether the process that writes ``path`` still holds its lock"""
+    try:
+        with open(path.with_suffix('.lock'), 'r+') as f:
+            if not locks.lock(f, locks.LOCK_EX | locks.LOCK_NB):
+                return True
+            locks.unlock(f)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def sample_names(self):
+        return {self.name}
+
+    def sort_key(self, item):
+        (name, labels), _ = item
+        return labels
+
+    def _labels(self, labels):
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        if amount:
+            self.registry.add(self.name, self._labels(labels), amount)
+
+    def inc_on_commit(self, amount=1, using=None, **labels):
+        """Count once the current transaction commits, so rollbacks are not counted"""
+        if amount:
+            transaction.on_commit(lambda: self.inc(amount, **labels), using=using)
+
+
+class Gauge(Counter):
+    """
+    A value read from ``function`` whenever the samples are collected
+
+    The values of all processes are added up, like the counters.
+    """
+    type = 'gauge'
+
+    def __init__(self, registry, name, documentation, function=None):
+        self.function = function
+        super().__init__(registry, name, documentation)
+
+    def set_function(self, function):
+        self.function = function
+
+    def collect(self):
+        if self.function is None:
+            return {}
+        try:
+            return {(self.name, ()): self.function()}
+        except Exception:
+            logger.warning('Could not read gauge %s', self.name, exc_info=True)
+            return {}
+
+
+class Histogram(Counter):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=()):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = list(buckets) + [math.inf]
+
+    def sample_names(self):
+        return {f'{self.name}_bucket', f'{self.name}_sum', f'{self.name}_count'}
+
+    def sort_key(self, item):
+        # Group by labels, then buckets in ascending order before _sum and _count
+        (name, labels), _ = item
+        labels = dict(labels)
+        le = labels.pop('le', None)
+        bound = math.inf if le in (None, '+Inf') else float(le)
+        return tuple(sorted(labels.items())), name != f'{self.name}_bucket', bound, name
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        # Every bucket gets a sample, even at zero, as Prometheus expects
+        entries = [
+            (f'{self.name}_bucket', labels + (('le', format_value(bound)),), int(value <= bound))
+            for bound in self.buckets
+        ]
+        entries.append((f'{self.name}_sum', labels, value))
+        entries.append((f'{self.name}_count', labels, 1))
+        self.registry.add_many(entries)
+
+
+registry = Registry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+atexit.register(registry.flush)
+
+# Requests, labelled by URL name (e.g. machine_learning:get_notifications_api)
+http_requests = Counter(
+    registry, 'http_requests_total', 'Requests answered, by view, method and status',
+    ['view', 'method', 'status'],
+)
+http_request_duration = Histogram(
+    registry, 'http_request_duration_seconds', 'Time to build a response, by view and method',
+    ['view', 'method'], buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+http_request_queries = Histogram(
+    registry, 'http_request_db_queries', 'Database queries per request, by view',
+    ['view'], buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100],
+)
+http_request_db_duration = Counter(
+    registry, 'http_request_db_seconds_total', 'Time spent in database queries, by view',
+    ['view'],
+)
+http_response_size = Histogram(
+    registry, 'http_response_size_bytes', 'Response body size, by view (not streamed responses)',
+    ['view'], buckets=[100, 1000, 10000, 50000, 100000, 500000, 1000000],
+)
+
+# Throttling (see throttling.py)
+rate_limited_requests = Counter(
+    registry, 'rate_limited_requests_total', 'Requests refused with 429 by a rate limit, by scope',
+    ['scope'],
+)
+coalesced_requests = Counter(
+    registry, 'coalesced_requests_total', 'Requests answered with the response of an identical concurrent one',
+    ['scope'],
+)
+
+# Notifications; counted when the change commits
+notifications_created = Counter(
+    registry, 'notifications_created_total', 'Notifications created',
+)
+notifications_read = Counter(
+    registry, 'notifications_read_total', 'Notifications marked as read (read receipts included)',
+)
+notifications_expired = Counter(
+    registry, 'notifications_expired_total', 'Notifications deactivated by expiry, rotation or an admin',
+)
+notifications_generated = Counter(
+    registry, 'notifications_generated_total', 'Dynamic notifications generated, by who asked for them',
+    ['generated_by'],
+)
+
+# Buffered ingest (see notification_ingest.py)
+ingest_queue_depth = Gauge(
+    registry, 'notification_ingest_queue_depth', 'Notifications waiting in the ingest buffers',
+)
+ingest_flush_duration = Histogram(
+    registry, 'notification_ingest_flush_seconds', 'Time to write one batch of buffered notifications',
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5],
+)
@@ -0,0 +1,110 @@
+"""
+Middleware for the machine_learning app
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts queries and the time they take"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries, response size and status per view
+
+    Put it first in ``MIDDLEWARE`` so the other middleware's queries and
+    time are included. It is synchronous on purpose: under ASGI Django then
+    runs it in the same thread as the sync views, where the database
+    connections (and so the query recorder) live.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view = self.view_name(request)
+        metrics.http_requests.inc(view=view, method=request.method, status=response.status_code)
+        metrics.http_request_duration.observe(duration, view=view, method=request.method)
+        metrics.http_request_queries.observe(recorder.count, view=view)
+        metrics.http_request_db_duration.inc(recorder.duration, view=view)
+        size = self.response_size(response)
+        if size is not None:
+            metrics.http_response_size.observe(size, view=view)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        """URL name of the view, so ids in the path do not become labels"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match.route
+
+    @staticmethod
+    def response_size(response):
+        if not response.streaming:
+            return len(response.content)
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        # Streamed without a known length, e.g. the notification stream
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether ``PrimaryReplicaRouter`` may use the replica
+
+    GET and HEAD requests read from the replica unless the view is marked
+    with ``routers.use_primary`` or the client wrote in the last
+    ``REPLICA_STICKY_SECONDS``. A request that writes sets a cookie that
+    keeps the client on the primary for that long.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = routers.end_request(token)
+        if state.wrote and routers.replica_alias():
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(routers.STICKY_COOKIE, f'{time.time() + sticky:.3f}',
+                                max_age=sticky, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in self.SAFE_METHODS
+                and not getattr(view_func, 'use_primary', False)
+                and not routers.is_sticky(request)):
+            routers.read_from_replica()
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def create_global_counter(apps, schema_editor):
+    Notification = apps.get_model('machine_learning', 'Notification')
+    NotificationCounter = apps.get_model('machine_learning', 'NotificationCounter')
+    counts = Notification.objects.filter(is_global=True, is_active=True).aggregate(
+        unread_count=Count('pk', filter=Q(is_read=False)),
+        total_count=Count('pk'),
+    )
+    NotificationCounter.objects.create(user=None, **counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0003_add_profile_image_to_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.IntegerField(default=0)),
+                ('total_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(blank=True, help_text='Counter owner (null for global notifications)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notification_counter', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_global_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0004_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, help_text="Bumped on every change to the owner's notifications"),
+        ),
+    ]
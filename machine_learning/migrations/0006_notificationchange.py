@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0005_notificationcounter_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.UUIDField()),
+                ('change_type', models.CharField(choices=[('upsert', 'Created or updated'), ('read', 'Read state changed'), ('delete', 'Deleted'), ('expire', 'Expired or deactivated')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, help_text='Owner (null for global notifications)', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='machine_lea_user_id_f1623e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def reset_global_read_flags(apps, schema_editor):
+    # Read state of global notifications moves to per-user receipts; the
+    # shared flag no longer means anything for them
+    Notification = apps.get_model('machine_learning', 'Notification')
+    NotificationCounter = apps.get_model('machine_learning', 'NotificationCounter')
+    Notification.objects.filter(is_global=True, is_read=True).update(is_read=False, read_at=None)
+    NotificationCounter.objects.filter(user__isnull=True).update(unread_count=F('total_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0006_notificationchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='global_read_count',
+            field=models.IntegerField(default=0, help_text='Active global notifications this user has read'),
+        ),
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='machine_learning.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'notification'), name='unique_notification_receipt')],
+            },
+        ),
+        migrations.RunPython(reset_global_read_flags, migrations.RunPython.noop),
+    ]
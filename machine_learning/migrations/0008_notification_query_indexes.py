@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0007_notificationreceipt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='machine_lea_user_id_bfb584_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='machine_lea_notific_a89160_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='machine_lea_is_acti_c05cde_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_global', 'is_active', '-created_at'], name='machine_lea_user_id_25b39c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_global', 'is_active', '-created_at'], name='machine_lea_is_glob_7f4cec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_global', 'is_active', 'is_read'], name='machine_lea_user_id_09bfb3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_active', 'auto_expire', 'expiry_date'], name='machine_lea_is_acti_38fdc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['-created_at'], name='machine_lea_created_d7813b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['notification_type', '-created_at'], name='machine_lea_notific_861d07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['priority', '-created_at'], name='machine_lea_priorit_873741_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+from machine_learning import partitions
+
+
+def partition_notifications(apps, schema_editor):
+    # Monthly RANGE partitions are a MySQL feature; other databases keep a
+    # plain table and the retention command leaves them alone
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    Notification = apps.get_model('machine_learning', 'Notification')
+    oldest = Notification.objects.aggregate(oldest=Min('created_at'))['oldest']
+    current = partitions.month_start(timezone.now())
+    first = partitions.month_start(oldest) if oldest else current
+    last = partitions.add_months(current, settings.NOTIFICATIONS_PARTITIONS_AHEAD)
+    for sql in partitions.partition_table_sql(partitions.months_between(first, last)):
+        schema_editor.execute(sql)
+
+
+def unpartition_notifications(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for sql in partitions.unpartition_table_sql():
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0008_notification_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Target user (null for all users)', null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='notificationreceipt',
+            name='notification',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='machine_learning.notification'),
+        ),
+        migrations.RunPython(partition_notifications, unpartition_notifications),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:40
+
+import machine_learning.metadata_columns
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0009_notification_partitions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='meta_confidence',
+            field=models.GeneratedField(db_persist=False, expression=machine_learning.metadata_columns.JSONScalar('metadata', 'confidence', 'number', None), help_text='metadata["confidence"] when it is a number', null=True, output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='meta_is_dynamic',
+            field=models.GeneratedField(db_persist=False, expression=machine_learning.metadata_columns.JSONScalar('metadata', 'isDynamic', 'boolean', None), help_text='metadata["isDynamic"] when it is a boolean', null=True, output_field=models.BooleanField()),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='meta_source',
+            field=models.GeneratedField(db_persist=False, expression=machine_learning.metadata_columns.JSONScalar('metadata', 'source', 'string', 100), help_text='metadata["source"] when it is a string', null=True, output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='meta_status',
+            field=models.GeneratedField(db_persist=False, expression=machine_learning.metadata_columns.JSONScalar('metadata', 'status', 'string', 50), help_text='metadata["status"] when it is a string', null=True, output_field=models.CharField(max_length=50)),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['meta_is_dynamic'], name='machine_lea_meta_is_4d840c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['meta_source', '-created_at'], name='machine_lea_meta_so_5ee296_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['meta_status'], name='machine_lea_meta_st_3a4cc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['meta_confidence'], name='machine_lea_meta_co_47dcf9_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_learning', '0010_notification_metadata_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='machine_lea_user_id_25b39c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='machine_lea_is_glob_7f4cec_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_global', 'is_active', 'created_at', 'id'], name='machine_lea_user_id_7449ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_global', 'is_active', 'created_at', 'id'], name='machine_lea_is_glob_cab1fa_idx'),
+        ),
+    ]
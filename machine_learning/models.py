@@ -1,15 +1,286 @@
-from django.db import models
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import (
+    BooleanField, Case, Count, Exists, F, Max, Min, OuterRef, Q, Subquery, Value, When,
+)
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
+import heapq
+import time
 import uuid
+from itertools import islice
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete, post_delete
+from . import metrics
+from .metadata_columns import METADATA_COLUMNS, rewrite_filters
+from .partitions import retention_start
+from .signals import notifications_changed
 
 User.add_to_class(
     'profile_image',
     models.ImageField(upload_to='profile_pics/', default='profile_pics/default-avatar.png', blank=True)
 )
 
+# Per database and retention window: (oldest lasting created_at, loaded at)
+_kept_since_cache = {}
+KEPT_SINCE_TTL = 3600
+
+def lasting_q(now):
+    """Notifications that are active and not due to expire by ``now``"""
+    return Q(is_active=True) & (Q(auto_expire=False) | Q(expiry_date__isnull=True) | Q(expiry_date__gt=now))
+
+def _add_counter_contribution(deltas, is_global, user_id, is_read, is_active, rows=1):
+    """
+    Add what ``rows`` notifications in the given state contribute to the
+    badge counters into ``deltas`` (pass a negative ``rows`` to remove them)
+    
+    Global notifications are counted on the ``user=None`` counter. Rows with
+    neither a user nor ``is_global`` are never shown, so they are not counted.
+    """
+    if not is_global and user_id is None:
+        return
+    owner = None if is_global else user_id
+    unread, total = deltas.get(owner, (0, 0))
+    deltas[owner] = (
+        unread + rows * int(is_active and not is_read),
+        total + rows * int(is_active),
+    )
+
+
+def _write_db(manager):
+    """
+    The alias a manager writes to
+
+    ``Manager.db`` is where reads go, which may be a replica (see routers.py).
+    """
+    return manager._db or router.db_for_write(manager.model, **manager._hints)
+
+
+class NotificationQuerySet(models.QuerySet):
+    def update_tracked(self, **changes):
+        """
+        Bulk update notifications and keep the badge counters and the change
+        log in step
+        
+        Works like ``update()`` but reads the owner and read/active state of
+        the affected rows first, so the counters can be adjusted without
+        re-counting the table and each row gets a change log entry.
+        
+        Returns:
+            int: Number of rows updated
+        """
+        # As in update(): this and the reads below go to the primary
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            rows = list(
+                self.order_by().select_for_update()
+                .values_list('pk', 'is_global', 'user_id', 'is_read', 'is_active')
+            )
+            updated = self.update(**changes)
+            
+            deltas = {}
+            for pk, is_global, user_id, is_read, is_active in rows:
+                _add_counter_contribution(deltas, is_global, user_id, is_read, is_active, rows=-1)
+                _add_counter_contribution(
+                    deltas,
+                    changes.get('is_global', is_global),
+                    user_id,
+                    changes.get('is_read', is_read),
+                    changes.get('is_active', is_active),
+                )
+            counters = NotificationCounter.objects.db_manager(self.db)
+            counters.apply_deltas(deltas)
+            
+            # Receipts on global notifications only count while they are shown
+            shown = {True: [], False: []}
+            for pk, is_global, _, _, is_active in rows:
+                was_shown = is_global and is_active
+                now_shown = changes.get('is_global', is_global) and changes.get('is_active', is_active)
+                if was_shown != now_shown:
+                    shown[now_shown].append(pk)
+            counters.shift_global_reads(shown[True], 1)
+            counters.shift_global_reads(shown[False], -1)
+            
+            if 'is_active' in changes and not changes['is_active']:
+                change_type = NotificationChange.EXPIRE
+            elif set(changes) <= {'is_read', 'read_at'}:
+                change_type = NotificationChange.READ
+            else:
+                change_type = NotificationChange.UPSERT
+            NotificationChange.objects.db_manager(self.db).record_many(
+                [(pk, changes.get('is_global', is_global), user_id) for pk, is_global, user_id, _, _ in rows],
+                change_type,
+            )
+            
+            if changes.get('is_read') is True:
+                metrics.notifications_read.inc_on_commit(
+                    sum(1 for _, _, _, is_read, _ in rows if not is_read), using=self.db
+                )
+            if changes.get('is_active') is False:
+                metrics.notifications_expired.inc_on_commit(
+                    sum(1 for _, _, _, _, is_active in rows if is_active), using=self.db
+                )
+        
+        return updated
+    
+    def bulk_create_tracked(self, notifications, batch_size=500):
+        """
+        Insert many notifications with ``bulk_create`` and keep the badge
+        counters and the change log in step
+        
+        ``bulk_create`` skips ``Notification.save``, so the default expiry is
+        applied here and the counters are adjusted once for the whole batch.
+        
+        Args:
+            notifications (list): Unsaved ``Notification`` instances
+            batch_size (int): Rows per INSERT statement
+        
+        Returns:
+            list: The created notifications
+        """
+        self._for_write = True
+        for notification in notifications:
+            notification.apply_default_expiry()
+        
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(notifications, batch_size=batch_size)
+            
+            deltas = {}
+            for notification in created:
+                _add_counter_contribution(
+                    deltas, notification.is_global, notification.user_id,
+                    notification.is_read, notification.is_active,
+                )
+                notification._remember_counter_state()
+            NotificationCounter.objects.db_manager(self.db).apply_deltas(deltas)
+            
+            changes = NotificationChange.objects.db_manager(self.db)
+            for is_active, change_type in ((True, NotificationChange.UPSERT), (False, NotificationChange.EXPIRE)):
+                changes.record_many(
+                    [(n.pk, n.is_global, n.user_id) for n in created if n.is_active == is_active],
+                    change_type,
+                )
+            metrics.notifications_created.inc_on_commit(len(created), using=self.db)
+        
+        return created
+    
+    def filter_metadata(self, **kwargs):
+        """
+        ``filter(**kwargs)`` with lookups on promoted metadata keys run on
+        their indexed columns; see metadata_columns.py
+        """
+        args, kwargs = rewrite_filters(kwargs)
+        return self.filter(*args, **kwargs)
+    
+    def lasting(self, now=None):
+        """Active notifications that are not due to expire: kept past the retention window"""
+        return self.filter(lasting_q(now or timezone.now()))
+    
+    def retained(self):
+        """
+        Notifications inside the retention window, plus older ones that
+        are ``lasting()``
+        
+        The ``created_at`` bound lets MySQL skip the partitions of older
+        months, which are dropped by ``rotate_notification_partitions``
+        once nothing in them lasts.
+        """
+        now = timezone.now()
+        start = retention_start(now)
+        kept_since = self._kept_since(start, now)
+        if kept_since is None:
+            return self.filter(created_at__gte=start)
+        return self.filter(Q(created_at__gte=start) | (Q(created_at__gte=kept_since) & lasting_q(now)))
+    
+    def _kept_since(self, start, now):
+        """Oldest ``created_at`` of a lasting notification from before ``start``, or None"""
+        key = (self.db, start)
+        cached = _kept_since_cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < KEPT_SINCE_TTL:
+            return cached[0]
+        kept_since = self.model._base_manager.db_manager(self.db).filter(
+            lasting_q(now), created_at__lt=start
+        ).aggregate(oldest=Min('created_at'))['oldest']
+        _kept_since_cache.clear()
+        _kept_since_cache[key] = (kept_since, time.monotonic())
+        return kept_since
+    
+    def with_read_state(self, user):
+        """
+        Annotate each notification with ``user_has_read`` and ``user_read_at``
+        for ``user``: the shared flag for their own notifications, their read
+        receipt for global ones
+        """
+        receipts = NotificationReceipt.objects.filter(notification=OuterRef('pk'), user=user)
+        return self.annotate(
+            user_has_read=Case(
+                When(is_global=True, then=Exists(receipts)),
+                default=F('is_read'),
+                output_field=BooleanField(),
+            ),
+            user_read_at=Case(
+                When(is_global=True, then=Subquery(receipts.values('read_at')[:1])),
+                default=F('read_at'),
+            ),
+        )
+    
+    def owned_by(self, user):
+        """
+        ``user``'s own notifications, without the global ones, annotated
+        like ``with_read_state()``. Reads the ``user`` index range alone;
+        see global_notifications.py for merging in the global ones.
+        """
+        return self.filter(user=user, is_global=False).annotate(
+            user_has_read=F('is_read'),
+            user_read_at=F('read_at'),
+        )
+    
+    def unread_for(self, user):
+        """Notifications ``user`` has not read; global ones via an anti-join on receipts"""
+        receipts = NotificationReceipt.objects.filter(notification=OuterRef('pk'), user=user)
+        return self.filter(Q(is_global=False, is_read=False) | Q(Q(is_global=True) & ~Exists(receipts)))
+    
+    def mark_read_for(self, user):
+        """
+        Mark notifications as read for one user
+        
+        The user's own notifications flip their ``is_read`` flag; global
+        notifications get a read receipt for this user in a single bulk
+        insert, so the shared rows are never written.
+        
+        Returns:
+            int: Number of notifications marked as read
+        """
+        self._for_write = True
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            updated = self.filter(is_global=False, user=user, is_read=False).update_tracked(
+                is_read=True, read_at=now
+            )
+            unread_global = list(
+                self.filter(is_global=True).unread_for(user).values_list('pk', 'is_active')
+            )
+            NotificationReceipt.objects.db_manager(self.db).add_receipts(user, unread_global, now)
+        return updated + len(unread_global)
+    
+    def mark_unread_for(self, user):
+        """
+        Undo ``mark_read_for``: clear the flag on the user's own
+        notifications and drop their receipts on global ones
+        
+        Returns:
+            int: Number of notifications marked as unread
+        """
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            updated = self.filter(is_global=False, user=user, is_read=True).update_tracked(
+                is_read=False, read_at=None
+            )
+            global_ids = self.filter(is_global=True).values('pk')
+            updated += NotificationReceipt.objects.db_manager(self.db).remove_receipts(user, global_ids)
+        return updated
+
+
 # Create your models here.
 class Notification(models.Model):
     """
@@ -39,7 +310,9 @@ class Notification(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_LEVELS, default='medium')
     
     # User and targeting
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, 
+    # No database constraint: MySQL does not allow foreign keys on the
+    # partitioned table (see partitions.py); deletes still cascade in Django
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False,
                            help_text="Target user (null for all users)")
     is_global = models.BooleanField(default=False, help_text="Show to all users")
     
@@ -68,20 +341,69 @@ class Notification(models.Model):
     metadata = models.JSONField(default=dict, blank=True, 
                                help_text="Additional metadata as JSON")
     
+    # Frequently filtered metadata keys, kept in indexed generated columns
+    # (see metadata_columns.py)
+    meta_is_dynamic = METADATA_COLUMNS['isDynamic'].generated_field()
+    meta_source = METADATA_COLUMNS['source'].generated_field()
+    meta_status = METADATA_COLUMNS['status'].generated_field()
+    meta_confidence = METADATA_COLUMNS['confidence'].generated_field()
+    
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'is_read']),
-            models.Index(fields=['notification_type']),
-            models.Index(fields=['is_active', 'created_at']),
+            # Inboxes, newest first: a user's own notifications and the global ones.
+            # Read backwards; ``id`` covers the tie-break of keyset pages.
+            models.Index(fields=['user', 'is_global', 'is_active', 'created_at', 'id']),
+            models.Index(fields=['is_global', 'is_active', 'created_at', 'id']),
+            # Unread counts and mark-all-read for a user's own notifications
+            models.Index(fields=['user', 'is_global', 'is_active', 'is_read']),
+            # Expiry sweep
+            models.Index(fields=['is_active', 'auto_expire', 'expiry_date']),
+            # Admin: default ordering, date hierarchy and list filters
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['notification_type', '-created_at']),
+            models.Index(fields=['priority', '-created_at']),
+            # Promoted metadata keys
+            models.Index(fields=['meta_is_dynamic']),
+            models.Index(fields=['meta_source', '-created_at']),
+            models.Index(fields=['meta_status']),
+            models.Index(fields=['meta_confidence']),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.get_notification_type_display()}"
     
-    def mark_as_read(self):
-        """Mark notification as read"""
-        if not self.is_read:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counter_state()
+        return instance
+    
+    def _remember_counter_state(self):
+        """Snapshot the fields the badge counters depend on"""
+        self._counter_state = (self.is_global, self.user_id, self.is_read, self.is_active)
+    
+    def _counter_deltas(self):
+        """Counter changes caused by moving from the snapshot to the current state"""
+        deltas = {}
+        previous = getattr(self, '_counter_state', None)
+        if previous is not None:
+            _add_counter_contribution(deltas, *previous, rows=-1)
+        _add_counter_contribution(deltas, self.is_global, self.user_id, self.is_read, self.is_active)
+        return deltas
+    
+    def mark_as_read(self, user=None):
+        """
+        Mark notification as read
+        
+        Global notifications are marked as read for ``user`` only, with a
+        read receipt; without a user the shared flag is set.
+        """
+        if self.is_global and user is not None:
+            NotificationReceipt.objects.add_receipts(user, [(self.pk, self.is_active)])
+        elif not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
             self.save(update_fields=['is_read', 'read_at'])
@@ -92,12 +414,68 @@ class Notification(models.Model):
             return False
         return timezone.now() > self.expiry_date
     
-    def save(self, *args, **kwargs):
-        """Override save to handle auto-expiry"""
+    def apply_default_expiry(self):
+        """Set the default expiry, 7 days from now, if none is set"""
         if self.auto_expire and not self.expiry_date:
-            # Set default expiry to 7 days from creation
             self.expiry_date = timezone.now() + timezone.timedelta(days=7)
-        super().save(*args, **kwargs)
+    
+    def save(self, *args, **kwargs):
+        """Override save to handle auto-expiry"""
+        self.apply_default_expiry()
+        
+        if self._state.adding:
+            self._counter_state = None
+        
+        update_fields = kwargs.get('update_fields')
+        tracks_counters = update_fields is None or {
+            'user', 'user_id', 'is_global', 'is_read', 'is_active'
+        } & set(update_fields)
+        
+        with transaction.atomic(using=kwargs.get('using')):
+            creating = self._state.adding
+            super().save(*args, **kwargs)
+            self._record_change(update_fields)
+            self._count_metrics(creating)
+            counters = NotificationCounter.objects.db_manager(self._state.db)
+            if tracks_counters:
+                previous = getattr(self, '_counter_state', None)
+                was_shown = previous is not None and previous[0] and previous[3]
+                now_shown = self.is_global and self.is_active
+                if was_shown != now_shown:
+                    counters.shift_global_reads([self.pk], 1 if now_shown else -1)
+                deltas = self._counter_deltas()
+                self._remember_counter_state()
+            else:
+                # Nothing counted changed, but the owner's version still moves on
+                deltas = {}
+                _add_counter_contribution(deltas, self.is_global, self.user_id, self.is_read, self.is_active, rows=0)
+            counters.apply_deltas(deltas)
+    
+    def _count_metrics(self, creating):
+        """Count this save in the notification metrics once it commits"""
+        previous = getattr(self, '_counter_state', None)
+        if creating:
+            metrics.notifications_created.inc_on_commit(using=self._state.db)
+        if previous is not None and not previous[2] and self.is_read:
+            metrics.notifications_read.inc_on_commit(using=self._state.db)
+        if previous is not None and previous[3] and not self.is_active:
+            metrics.notifications_expired.inc_on_commit(using=self._state.db)
+    
+    def _record_change(self, update_fields):
+        """Append this save to the delta-sync change log"""
+        changes = NotificationChange.objects.db_manager(self._state.db)
+        previous = getattr(self, '_counter_state', None)
+        if previous is not None and previous[:2] != (self.is_global, self.user_id):
+            # Moved to another audience: the old one sees it disappear
+            changes.record(self.pk, previous[0], previous[1], NotificationChange.DELETE)
+        
+        if not self.is_active:
+            change_type = NotificationChange.EXPIRE
+        elif update_fields is not None and set(update_fields) <= {'is_read', 'read_at'}:
+            change_type = NotificationChange.READ
+        else:
+            change_type = NotificationChange.UPSERT
+        changes.record(self.pk, self.is_global, self.user_id, change_type)
 
 
 class NotificationTemplate(models.Model):
@@ -116,9 +494,22 @@ class NotificationTemplate(models.Model):
         return self.name
     
     def create_notification(self, **kwargs):
-        """Create a notification from this template"""
-        title = self.title_template.format(**kwargs)
-        message = self.message_template.format(**kwargs)
+        """
+        Create a notification from this template
+        
+        Keyword arguments named in the template fill in its variables; the
+        rest are passed on as ``Notification`` fields.
+        """
+        from .notification_templates import template_cache
+        
+        compiled = template_cache.compile(self)
+        variables = {name: kwargs[name] for name in compiled.fields if name in kwargs}
+        title, message = compiled.render(variables)
+        
+        notification_fields = {field.name for field in Notification._meta.concrete_fields}
+        for name in variables:
+            if name not in notification_fields:
+                del kwargs[name]
         
         return Notification.objects.create(
             title=title,
@@ -142,3 +533,396 @@ class ServiceCard(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class NotificationCounterManager(models.Manager):
+    def apply_deltas(self, deltas, create_missing=True, global_reads=None):
+        """
+        Add ``(unread, total)`` deltas to the counters of the given owners
+        
+        Every owner listed gets its ``version`` bumped, even for a zero
+        delta, since the notifications it sees have changed.
+        
+        Args:
+            deltas (dict): Maps a user id (None for global notifications) to
+                an ``(unread_delta, total_delta)`` tuple
+            create_missing (bool): Create counters that do not exist yet. Off
+                for deletions, which may come from the owner being deleted.
+            global_reads (dict, optional): Maps a user id to a change in the
+                number of global notifications they have read
+        """
+        global_reads = global_reads or {}
+        db = _write_db(self)
+        now = timezone.now()
+        owners = set(deltas) | set(global_reads)
+        for user_id in owners:
+            unread, total = deltas.get(user_id, (0, 0))
+            updated = self.filter(user_id=user_id).update(
+                unread_count=F('unread_count') + unread,
+                total_count=F('total_count') + total,
+                global_read_count=F('global_read_count') + global_reads.get(user_id, 0),
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            if not updated and create_missing:
+                # First change for this owner: count from the table, which
+                # already includes the change being applied.
+                self._create_counter(user_id)
+        
+        if owners:
+            owners = frozenset(owners)
+            transaction.on_commit(
+                lambda: notifications_changed.send(sender=NotificationCounter, owners=owners),
+                using=db,
+            )
+    
+    def shift_global_reads(self, notification_ids, sign):
+        """
+        Add (``sign=1``) or remove (``sign=-1``) the read receipts on the
+        given global notifications from their readers' ``global_read_count``
+        
+        Used when global notifications start or stop being shown. Runs as a
+        single UPDATE however many users have read them.
+        """
+        if not notification_ids:
+            return
+        receipts = NotificationReceipt.objects.using(self.db).filter(notification_id__in=notification_ids)
+        per_user = Subquery(
+            receipts.filter(user_id=OuterRef('user_id'))
+            .order_by().values('user_id')
+            .annotate(read=Count('pk')).values('read'),
+            output_field=models.IntegerField(),
+        )
+        self.filter(user_id__in=receipts.values('user_id')).update(
+            global_read_count=F('global_read_count') + Value(sign) * per_user
+        )
+    
+    def _create_counter(self, user_id):
+        # Count and look up on the primary, even when called from a read
+        counters = self.db_manager(_write_db(self))
+        counts = counters.compute_counts(user_id)
+        try:
+            with transaction.atomic(using=counters.db):
+                return counters.create(user_id=user_id, **counts)
+        except IntegrityError:
+            return counters.get(user_id=user_id)
+    
+    def compute_counts(self, user_id):
+        """Count an owner's active notifications straight from the table"""
+        if user_id is None:
+            notifications = Notification.objects.using(self.db).filter(is_global=True)
+        else:
+            notifications = Notification.objects.using(self.db).filter(user_id=user_id, is_global=False)
+        counts = notifications.filter(is_active=True).aggregate(
+            unread_count=Count('pk', filter=Q(is_read=False)),
+            total_count=Count('pk'),
+        )
+        if user_id is not None:
+            counts['global_read_count'] = NotificationReceipt.objects.using(self.db).filter(
+                user_id=user_id,
+                notification__is_global=True,
+                notification__is_active=True,
+            ).count()
+        return counts
+    
+    def for_user(self, user):
+        """
+        Get the counters that make up a user's view of their notifications
+        
+        Returns:
+            tuple: ``(user_counter, global_counter)``
+        """
+        counters = {
+            counter.user_id: counter
+            for counter in self.filter(Q(user=user) | Q(user__isnull=True))
+        }
+        return tuple(
+            counters.get(user_id) or self._create_counter(user_id)
+            for user_id in (user.pk, None)
+        )
+    
+    def global_version(self):
+        """Version of the global counter, or None before there is one"""
+        return self.filter(user__isnull=True).values_list('version', flat=True).first()
+    
+    def badge_counts(self, user):
+        """
+        Get the badge counts for a user, including global notifications
+        
+        Returns:
+            tuple: ``(unread_count, total_count)``
+        """
+        return self.combine(*self.for_user(user))
+    
+    def combine(self, user_counter, global_counter):
+        """
+        Badge counts from a user's counter and the global counter
+        
+        Returns:
+            tuple: ``(unread_count, total_count)``
+        """
+        unread_global = max(global_counter.unread_count - user_counter.global_read_count, 0)
+        return (
+            user_counter.unread_count + unread_global,
+            user_counter.total_count + global_counter.total_count,
+        )
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread/total notification counts for badges
+    
+    There is one row per user for their own notifications and one row with
+    ``user=None`` for global notifications. Only active notifications are
+    counted; expired ones drop out when ``cleanup_expired_notifications``
+    deactivates them. A user's row also counts the active global
+    notifications they have read receipts for.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='notification_counter',
+                                help_text="Counter owner (null for global notifications)")
+    unread_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
+    global_read_count = models.IntegerField(default=0,
+                                            help_text="Active global notifications this user has read")
+    version = models.PositiveBigIntegerField(default=0,
+                                             help_text="Bumped on every change to the owner's notifications")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = NotificationCounterManager()
+    
+    def __str__(self):
+        owner = self.user or 'global'
+        return f"{owner}: {self.unread_count}/{self.total_count}"
+
+
+class NotificationReceiptManager(models.Manager):
+    def add_receipts(self, user, notifications, read_at=None):
+        """
+        Record that ``user`` has read global notifications
+        
+        Args:
+            user (User): The reader
+            notifications (list): ``(notification_id, is_active)`` tuples
+            read_at (datetime, optional): Defaults to now
+        """
+        already_read = set(
+            self.filter(user=user, notification_id__in=[pk for pk, _ in notifications])
+            .values_list('notification_id', flat=True)
+        )
+        notifications = [n for n in notifications if n[0] not in already_read]
+        if not notifications:
+            return
+        read_at = read_at or timezone.now()
+        with transaction.atomic(using=self.db):
+            self.bulk_create(
+                [
+                    self.model(user=user, notification_id=notification_id, read_at=read_at)
+                    for notification_id, _ in notifications
+                ],
+                ignore_conflicts=True,
+            )
+            active = sum(1 for _, is_active in notifications if is_active)
+            NotificationCounter.objects.db_manager(self.db).apply_deltas({}, global_reads={user.pk: active})
+            metrics.notifications_read.inc_on_commit(len(notifications), using=self.db)
+            # Logged against the reader: the read state is theirs alone
+            NotificationChange.objects.db_manager(self.db).record_many(
+                [(notification_id, False, user.pk) for notification_id, _ in notifications],
+                NotificationChange.READ,
+            )
+    
+    def remove_receipts(self, user, notification_ids):
+        """
+        Forget that ``user`` has read global notifications
+        
+        Returns:
+            int: Number of receipts removed
+        """
+        with transaction.atomic(using=self.db):
+            receipts = list(
+                self.filter(user=user, notification_id__in=notification_ids)
+                .values_list('pk', 'notification_id', 'notification__is_active')
+            )
+            if not receipts:
+                return 0
+            self.filter(pk__in=[pk for pk, _, _ in receipts]).delete()
+            active = sum(1 for _, _, is_active in receipts if is_active)
+            NotificationCounter.objects.db_manager(self.db).apply_deltas({}, global_reads={user.pk: -active})
+            NotificationChange.objects.db_manager(self.db).record_many(
+                [(notification_id, False, user.pk) for _, notification_id, _ in receipts],
+                NotificationChange.READ,
+            )
+        return len(receipts)
+
+
+class NotificationReceipt(models.Model):
+    """
+    A user's read receipt for a global notification
+    
+    Global notifications are shared by every user, so their read state is
+    kept here per user instead of in ``Notification.is_read``.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, db_constraint=False,
+                                     related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_receipts')
+    read_at = models.DateTimeField(default=timezone.now)
+    
+    objects = NotificationReceiptManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='unique_notification_receipt'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} read {self.notification_id}"
+
+
+class NotificationChangeManager(models.Manager):
+    def record(self, notification_id, is_global, user_id, change_type):
+        """Log a change to one notification"""
+        self.record_many([(notification_id, is_global, user_id)], change_type)
+    
+    def record_many(self, notifications, change_type, batch_size=1000):
+        """
+        Log the same kind of change for several notifications
+        
+        Args:
+            notifications (list): ``(notification_id, is_global, user_id)`` tuples
+            change_type (str): One of ``NotificationChange.CHANGE_TYPES``
+        """
+        self.bulk_create(
+            [
+                self.model(
+                    notification_id=notification_id,
+                    user_id=None if is_global else user_id,
+                    change_type=change_type,
+                )
+                for notification_id, is_global, user_id in notifications
+                # Notifications without an audience are never synced
+                if is_global or user_id is not None
+            ],
+            batch_size=batch_size,
+        )
+    
+    def for_user(self, user):
+        """Changes visible to a user: their own and global ones"""
+        return self.filter(Q(user=user) | Q(user__isnull=True))
+    
+    def changes_since(self, user, cursor, limit):
+        """
+        The first ``limit`` changes visible to a user after ``cursor``
+        
+        The user's own entries and the global ones are read with two range
+        scans on the ``(user, id)`` index and merged here, which avoids the
+        sort an ``OR`` across both would need.
+        
+        Returns:
+            list: ``(id, notification_id, change_type, created_at)`` tuples
+            in id order
+        """
+        fields = ('id', 'notification_id', 'change_type', 'created_at')
+        own = self.filter(user=user, id__gt=cursor).order_by('id').values_list(*fields)[:limit]
+        shared = self.filter(user__isnull=True, id__gt=cursor).order_by('id').values_list(*fields)[:limit]
+        return list(islice(heapq.merge(own, shared), limit))
+    
+    def settled_cutoff(self):
+        """
+        Entries created before this time are assumed committed
+        
+        Ids are handed out at insert time, so a later id can become visible
+        before an earlier one commits. Cursors never move past entries newer
+        than the cutoff; those are sent again on the next sync.
+        """
+        return timezone.now() - timezone.timedelta(seconds=settings.NOTIFICATIONS_SYNC_SETTLE_SECONDS)
+    
+    def current_cursor(self):
+        """Cursor for a client that has just taken a full snapshot"""
+        return self.filter(created_at__lte=self.settled_cutoff()).aggregate(cursor=Max('id'))['cursor'] or 0
+    
+    def is_cursor_expired(self, cursor):
+        """
+        Whether a client at ``cursor`` has to start over from a snapshot
+
+        That is when entries after it may already have been pruned, or when
+        it is ahead of ``current_cursor()`` (after restoring a backup, or a
+        cursor the client made up), where it would never see a change.
+        """
+        bounds = self.aggregate(
+            oldest=Min('id'),
+            newest=Max('id', filter=Q(created_at__lte=self.settled_cutoff())),
+        )
+        if bounds['oldest'] is None:
+            return cursor > 0
+        return bounds['oldest'] > cursor + 1 or cursor > (bounds['newest'] or 0)
+    
+    def prune(self, days):
+        """
+        Delete change log entries older than ``days``
+        
+        Returns:
+            int: Number of entries deleted
+        """
+        deleted, _ = self.filter(created_at__lt=timezone.now() - timezone.timedelta(days=days)).delete()
+        return deleted
+
+
+class NotificationChange(models.Model):
+    """
+    Append-only log of notification changes for delta sync
+    
+    The auto-increment ``id`` is the sync cursor. Entries outlive the
+    notifications they describe, so deletions can be sent as tombstones.
+    """
+    UPSERT = 'upsert'
+    READ = 'read'
+    DELETE = 'delete'
+    EXPIRE = 'expire'
+    CHANGE_TYPES = [
+        (UPSERT, 'Created or updated'),
+        (READ, 'Read state changed'),
+        (DELETE, 'Deleted'),
+        (EXPIRE, 'Expired or deactivated'),
+    ]
+    
+    notification_id = models.UUIDField()
+    # No database constraint: entries are written while the owner's rows are
+    # being deleted, and are pruned by age rather than by cascade
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False,
+                             null=True, blank=True, related_name='+',
+                             help_text="Owner (null for global notifications)")
+    change_type = models.CharField(max_length=10, choices=CHANGE_TYPES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    objects = NotificationChangeManager()
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.change_type} {self.notification_id}"
+
+
+@receiver(pre_delete, sender=Notification)
+def release_receipts_on_delete(sender, instance, using, **kwargs):
+    """Take a deleted global notification out of its readers' counters while the receipts still exist"""
+    state = getattr(instance, '_counter_state', None)
+    if state is not None and state[0] and state[3]:
+        NotificationCounter.objects.db_manager(using).shift_global_reads([instance.pk], -1)
+
+
+@receiver(post_delete, sender=Notification)
+def update_counters_on_delete(sender, instance, using, **kwargs):
+    """Drop a deleted notification from its owner's counters"""
+    state = getattr(instance, '_counter_state', None)
+    if state is None:
+        return
+    deltas = {}
+    _add_counter_contribution(deltas, *state, rows=-1)
+    NotificationCounter.objects.db_manager(using).apply_deltas(deltas, create_missing=False)
+    NotificationChange.objects.db_manager(using).record(
+        instance.pk, state[0], state[1], NotificationChange.DELETE
+    )
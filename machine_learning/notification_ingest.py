@@ -0,0 +1,167 @@
+"""
+Write-behind buffer for notifications created through the API
+
+With ``NOTIFICATIONS_INGEST_MODE = 'buffered'`` the create API validates a
+notification, queues it here and answers straight away; a writer thread
+inserts queued notifications in batches with ``bulk_create``. A batch is
+written when ``NOTIFICATIONS_INGEST_BATCH_SIZE`` notifications are waiting
+or ``NOTIFICATIONS_INGEST_FLUSH_INTERVAL`` seconds after the first one
+arrived, whichever comes first.
+
+The queue lives in the web process: notifications still queued when the
+process is killed without a normal exit are lost. The buffer is drained
+at interpreter exit. Queue depth and flush latency are also exported at
+``/metrics``.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBuffer:
+    """
+    Bounded queue of unsaved notifications and the thread that writes them
+    """
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._stopping = False
+        self._stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+            'last_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+            'total_flush_seconds': 0.0,
+        }
+
+    def submit(self, notification):
+        """
+        Queue a validated, unsaved notification
+
+        Returns:
+            bool: False if the buffer is full or shutting down
+        """
+        if self._stopping:
+            return False
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        self._count('accepted')
+        return True
+
+    def stats(self):
+        """Queue depth, counters and flush latency"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_flush_seconds'] = (
+            stats['total_flush_seconds'] / stats['flushes'] if stats['flushes'] else 0.0
+        )
+        return stats
+
+    def shutdown(self, timeout=10):
+        """Stop accepting notifications and write out what is queued"""
+        self._stopping = True
+        writer = self._writer
+        if writer is not None:
+            writer.join(timeout)
+        # Whatever the writer did not get to (or if it never started)
+        while not self._queue.empty():
+            self._flush(self._take_batch(block=False))
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run, name='notification-ingest-writer', daemon=True
+                )
+                self._writer.start()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _run(self):
+        while not self._stopping or not self._queue.empty():
+            batch = self._take_batch(block=True)
+            if batch:
+                self._flush(batch)
+
+    def _take_batch(self, block):
+        """Collect up to ``batch_size`` notifications, waiting at most ``flush_interval``"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if block and remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        from .models import Notification
+
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            Notification.objects.bulk_create_tracked(batch, batch_size=self.batch_size)
+            self._count('written', len(batch))
+        except Exception:
+            # One bad row (say, its user was deleted meanwhile) should not
+            # take the rest of the batch with it
+            logger.warning('Buffered batch of %d failed, writing one at a time', len(batch), exc_info=True)
+            for notification in batch:
+                try:
+                    Notification.objects.bulk_create_tracked([notification])
+                    self._count('written')
+                except Exception:
+                    self._count('failed')
+                    logger.exception('Dropped buffered notification %s', notification.id)
+        finally:
+            close_old_connections()
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['last_flush_seconds'] = elapsed
+            self._stats['total_flush_seconds'] += elapsed
+            self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+        metrics.ingest_flush_duration.observe(elapsed)
+
+
+ingest_buffer = IngestBuffer(
+    max_size=settings.NOTIFICATIONS_INGEST_MAX_QUEUE,
+    batch_size=settings.NOTIFICATIONS_INGEST_BATCH_SIZE,
+    flush_interval=settings.NOTIFICATIONS_INGEST_FLUSH_INTERVAL,
+)
+atexit.register(ingest_buffer.shutdown)
+metrics.ingest_queue_depth.set_function(ingest_buffer._queue.qsize)
@@ -0,0 +1,277 @@
+"""
+In-process pub/sub hub behind the notification Server-Sent Events stream
+
+Every committed change to a notification has a ``NotificationChange`` log
+entry, whichever process wrote it: a web worker, the scheduler or the
+ingest writer. ``ChangeLogPoller`` reads new entries every
+``NOTIFICATIONS_STREAM_POLL_INTERVAL`` seconds on a thread, while this
+process has streams open. The hub turns each batch into numbered events and
+fans them out to the connected streams of the affected users (every stream,
+for global notifications). A short history of events is kept so a client
+that reconnects with ``Last-Event-ID`` receives what it missed.
+
+The stream only works under ASGI. A WSGI worker would be held by each open
+stream for good, so there the view answers 204, which stops EventSource
+from reconnecting; the page then keeps polling.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from itertools import count
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+
+logger = logging.getLogger(__name__)
+
+# Event ids are "<boot>-<seq>" so ids from a previous process are recognised
+BOOT_ID = secrets.token_hex(4)
+
+
+class Subscription:
+    """A single connected stream waiting for events"""
+
+    def __init__(self, user_id, loop, max_pending):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def offer(self, event):
+        """Queue an event; runs on the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client fell behind; it will be told to refetch instead
+            self.overflowed = True
+
+
+class NotificationHub:
+    """
+    Fan out notification change events to connected streams
+    """
+
+    def __init__(self, history_size=1000, max_pending=100):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._history = deque(maxlen=history_size)
+        self._sequence = count(1)
+        self.max_pending = max_pending
+
+    def subscribe(self, user_id):
+        """Register a stream for ``user_id``; must be called from its event loop"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def publish(self, owner, data):
+        """
+        Publish an event to the streams of ``owner`` (None for everyone)
+
+        Safe to call from any thread.
+        """
+        with self._lock:
+            event = (next(self._sequence), owner, data)
+            self._history.append(event)
+            if owner is None:
+                targets = [s for subscriptions in self._subscribers.values() for s in subscriptions]
+            else:
+                targets = list(self._subscribers.get(owner, ()))
+
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Event loop already closed; the stream is going away
+                pass
+
+    def events_since(self, user_id, last_event_id):
+        """
+        Events for ``user_id`` published after ``last_event_id``
+
+        Returns:
+            list: The missed events, or None if they are no longer known
+            (another process, or older than the kept history)
+        """
+        boot, _, sequence = (last_event_id or '').partition('-')
+        if boot != BOOT_ID or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+
+        with self._lock:
+            history = list(self._history)
+        if history and history[0][0] > sequence + 1:
+            return None
+        return [
+            event for event in history
+            if event[0] > sequence and event[1] in (None, user_id)
+        ]
+
+    def handle_change(self, sender, owners, **kwargs):
+        """Publish one event per owner whose notifications changed"""
+        for owner in owners:
+            self.publish(owner, {'scope': 'global' if owner is None else 'user'})
+
+
+class ChangeLogPoller:
+    """
+    Publish the owners of new ``NotificationChange`` entries to a hub
+
+    Ids are handed out at insert time, so an entry can commit after one
+    with a higher id. The poller therefore re-reads entries newer than
+    ``settled_cutoff()`` on each poll and remembers which of them it has
+    published already.
+    """
+
+    def __init__(self, hub, interval=1.0, batch_size=1000):
+        self.hub = hub
+        self.interval = interval
+        self.batch_size = batch_size
+        self.cursor = None
+        self._published = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Start polling on a daemon thread, unless it runs already
+
+        The thread stops once the hub has no subscribers, so call this after
+        subscribing: either the thread sees the new subscriber, or it has
+        stopped and a new one is started.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notification-stream-poller', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self.hub.connection_count():
+                    # The cursor is kept: a restart publishes what happened
+                    # meanwhile, for clients that reconnect with Last-Event-ID
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Reading the notification change log failed')
+            finally:
+                close_old_connections()
+            time.sleep(self.interval)
+
+    def poll(self):
+        """
+        Publish changes logged since the last poll
+
+        The first poll only finds where the log ends.
+
+        Returns:
+            set: Owners published to (None for global notifications)
+        """
+        from .models import NotificationChange
+
+        changes = NotificationChange.objects
+        if self.cursor is None:
+            self.cursor = changes.aggregate(last=Max('id'))['last'] or 0
+            return set()
+
+        entries = list(
+            changes.filter(id__gt=self.cursor).order_by('id')
+            .values_list('id', 'user_id', 'created_at')[:self.batch_size]
+        )
+        cutoff = changes.settled_cutoff()
+        owners = set()
+        settled = True
+        for change_id, user_id, created_at in entries:
+            if change_id not in self._published:
+                owners.add(user_id)
+                self._published.add(change_id)
+            settled = settled and created_at <= cutoff
+            if settled:
+                # Nothing at or below this id can still appear
+                self.cursor = change_id
+        self._published = {change_id for change_id in self._published if change_id > self.cursor}
+
+        self.hub.handle_change(sender=ChangeLogPoller, owners=owners)
+        return owners
+
+
+hub = NotificationHub(
+    history_size=settings.NOTIFICATIONS_STREAM_HISTORY,
+    max_pending=settings.NOTIFICATIONS_STREAM_MAX_PENDING,
+)
+poller = ChangeLogPoller(hub, interval=settings.NOTIFICATIONS_STREAM_POLL_INTERVAL)
+
+
+def format_event(event):
+    """Encode a hub event in the text/event-stream format"""
+    sequence, _, data = event
+    return f"id: {BOOT_ID}-{sequence}\nevent: notifications\ndata: {json.dumps(data)}\n\n"
+
+
+def format_resync():
+    """Tell the client its copy is stale and it should refetch"""
+    return f"event: resync\ndata: {json.dumps({'reason': 'history_unavailable'})}\n\n"
+
+
+async def event_stream(user_id, last_event_id=None):
+    """
+    Async iterator producing the SSE body for one connected user
+    """
+    subscription = hub.subscribe(user_id)
+    poller.start()
+    try:
+        yield f"retry: {settings.NOTIFICATIONS_STREAM_RETRY_MS}\n\n"
+
+        last_sequence = 0
+        if last_event_id:
+            missed = hub.events_since(user_id, last_event_id)
+            if missed is None:
+                yield format_resync()
+            else:
+                for event in missed:
+                    last_sequence = event[0]
+                    yield format_event(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=settings.NOTIFICATIONS_STREAM_HEARTBEAT,
+                )
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies and the browser from timing out
+                yield ": ping\n\n"
+                continue
+
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield format_resync()
+            if event[0] <= last_sequence:
+                # Already sent while replaying history
+                continue
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,339 @@
+"""
+Compiled notification templates and the variables they are rendered with
+
+``NotificationTemplate`` titles and messages use ``str.format`` fields such
+as ``{accuracy}``. Each template is parsed once into a ``CompiledTemplate``
+that knows which variables it references, so only those values are
+computed when it is rendered. Compiled templates are cached in-process and
+dropped when a template is saved or deleted; ``NOTIFICATIONS_TEMPLATE_CACHE_TTL``
+bounds how long another process can keep using an edited one.
+
+Variable values come from provider functions registered with
+``variable_provider``.
+"""
+import random
+import re
+import string
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+_formatter = string.Formatter()
+_field_root = re.compile(r'[^.\[]*')
+
+
+class VariableProvider:
+    """Produces the value of one template variable"""
+
+    def __init__(self, name, func, description='', sample=None):
+        self.name = name
+        self.func = func
+        self.description = description
+        self.sample = sample
+
+
+VARIABLE_PROVIDERS = {}
+
+
+def variable_provider(name, description='', sample=None):
+    """
+    Register a function producing values for the template variable ``name``
+
+    The function is called with a ``random.Random``-like object and returns
+    the value. ``sample`` is the fixed value shown in admin previews.
+    """
+    def decorator(func):
+        VARIABLE_PROVIDERS[name] = VariableProvider(name, func, description, sample)
+        return func
+    return decorator
+
+
+@variable_provider('accuracy', 'Model accuracy (85-95%)', '94.2')
+def _accuracy(rng):
+    return f"{85 + (rng.random() * 10):.1f}"
+
+
+@variable_provider('records', 'Number of records (1000-11000)', '5000')
+def _records(rng):
+    return rng.randint(1000, 11000)
+
+
+@variable_provider('duration', 'Processing time in minutes (5-65)', '30')
+def _duration(rng):
+    return rng.randint(5, 65)
+
+
+@variable_provider('cpu_usage', 'CPU usage percentage (70-90)', '75')
+def _cpu_usage(rng):
+    return rng.randint(70, 90)
+
+
+@variable_provider('confidence', 'Confidence score (0.7-1.0)', '0.87')
+def _confidence(rng):
+    return f"{rng.random() * 0.3 + 0.7:.2f}"
+
+
+@variable_provider('improvement', 'Accuracy improvement (0.5-2.5%)', '1.5')
+def _improvement(rng):
+    return f"{rng.random() * 2 + 0.5:.1f}"
+
+
+@variable_provider('file_size', 'File size in MB (10-60)', '25')
+def _file_size(rng):
+    return rng.randint(10, 60)
+
+
+@variable_provider('record_count', 'Record count (10000-110000)', '50000')
+def _record_count(rng):
+    return rng.randint(10000, 110000)
+
+
+@variable_provider('model_version', 'Model version (1-10)', '3')
+def _model_version(rng):
+    return rng.randint(1, 10)
+
+
+@variable_provider('predictor_version', 'Predictor version (1-3)', '2')
+def _predictor_version(rng):
+    return rng.randint(1, 3)
+
+
+@variable_provider('production_version', 'Production version (1-3)', '1')
+def _production_version(rng):
+    return rng.randint(1, 3)
+
+
+@variable_provider('anomaly_confidence', 'Anomaly confidence (0.8-1.0)', '0.92')
+def _anomaly_confidence(rng):
+    return f"{rng.random() * 0.2 + 0.8:.2f}"
+
+
+@variable_provider('neural_net_version', 'Neural net version (1-5)', '4')
+def _neural_net_version(rng):
+    return rng.randint(1, 5)
+
+
+def sample_variables():
+    """The fixed sample value of every registered variable"""
+    return {name: provider.sample for name, provider in VARIABLE_PROVIDERS.items()}
+
+
+def resolve_variables(names, rng=random):
+    """
+    Compute values for the given variables only
+
+    Names without a provider are left out, so rendering a template that
+    uses them raises ``KeyError``.
+    """
+    return {
+        name: VARIABLE_PROVIDERS[name].func(rng)
+        for name in names if name in VARIABLE_PROVIDERS
+    }
+
+
+class CompiledFormat:
+    """A ``str.format`` string parsed into literal text and fields"""
+
+    def __init__(self, text):
+        self.parts = []
+        self.fields = set()
+        for literal, field_name, format_spec, conversion in _formatter.parse(text):
+            if field_name is None:
+                self.parts.append((literal, None, None, None))
+                continue
+            root = _field_root.match(field_name).group()
+            if not root or root.isdigit():
+                raise ValueError(f"Positional field '{{{field_name}}}' is not supported")
+            self.fields.add(root)
+            # Format specs may nest fields of their own, e.g. {value:{width}}
+            for _, nested, _, _ in _formatter.parse(format_spec or ''):
+                if nested is not None:
+                    self.fields.add(_field_root.match(nested).group())
+            self.parts.append((literal, field_name, format_spec, conversion))
+
+    def render(self, variables):
+        out = []
+        for literal, field_name, format_spec, conversion in self.parts:
+            out.append(literal)
+            if field_name is None:
+                continue
+            value, _ = _formatter.get_field(field_name, (), variables)
+            value = _formatter.convert_field(value, conversion)
+            if format_spec and '{' in format_spec:
+                format_spec = format_spec.format_map(variables)
+            out.append(format(value, format_spec or ''))
+        return ''.join(out)
+
+
+# Model name and action button for generated notifications, picked by the
+# template's type and a word in its name: (type, word, model_name, text, url)
+ACTION_RULES = [
+    ('training', None, 'NeuralNet_v{neural_net_version}', 'View Progress', '/models/training/'),
+    ('prediction', None, 'Predictor_{predictor_version}', 'View Prediction', '/predictions/'),
+    ('success', 'model', 'Model_v{model_version}', 'View Model', '/models/'),
+    ('info', 'data', '', 'View Results', '/data/processing/'),
+    ('warning', 'system', '', 'View Metrics', '/system/metrics/'),
+    ('warning', 'anomaly', '', 'Investigate', '/anomalies/'),
+    ('success', 'deployment', 'Production_Model_v{production_version}', 'Deploy Now', '/deploy/'),
+    ('info', 'dataset', '', 'View Dataset', '/datasets/'),
+]
+
+
+class CompiledTemplate:
+    """
+    A ``NotificationTemplate`` ready to render
+
+    Attributes:
+        fields (frozenset): Variables used by the title and message
+        variables (frozenset): ``fields`` plus those used for the model name
+        error (str): Why the template cannot be rendered, or None
+    """
+
+    def __init__(self, template):
+        self.pk = template.pk
+        self.name = template.name
+        self.notification_type = template.notification_type
+        self.priority = template.priority
+        self.source = (template.title_template, template.message_template)
+        self.error = None
+
+        self.model_name, self.action_text, self.action_url = CompiledFormat(''), '', ''
+        for notification_type, word, model_name, action_text, action_url in ACTION_RULES:
+            if notification_type == template.notification_type and (word is None or word in template.name):
+                self.model_name = CompiledFormat(model_name)
+                self.action_text, self.action_url = action_text, action_url
+                break
+
+        try:
+            self.title = CompiledFormat(template.title_template)
+            self.message = CompiledFormat(template.message_template)
+        except ValueError as e:
+            self.title = self.message = None
+            self.error = str(e)
+            self.fields = self.variables = frozenset()
+            return
+
+        self.fields = frozenset(self.title.fields | self.message.fields)
+        self.variables = self.fields | self.model_name.fields
+        missing = sorted(self.variables - set(VARIABLE_PROVIDERS))
+        if missing:
+            self.error = f"Missing variable: {', '.join(missing)}"
+
+    @property
+    def is_renderable(self):
+        """Whether the providers can fill in every variable"""
+        return self.error is None
+
+    def render(self, variables):
+        """
+        Render the title and message
+
+        Raises:
+            KeyError: If a referenced variable is not in ``variables``
+            ValueError: If the template could not be parsed
+        """
+        if self.title is None:
+            raise ValueError(self.error)
+        return self.title.render(variables), self.message.render(variables)
+
+    def render_notification(self, rng=random):
+        """
+        Compute this template's variables and render a notification's fields
+
+        Returns:
+            dict: ``Notification`` field values
+        """
+        variables = resolve_variables(self.variables, rng)
+        title, message = self.render(variables)
+        return {
+            'title': title,
+            'message': message,
+            'notification_type': self.notification_type,
+            'priority': self.priority,
+            'model_name': self.model_name.render(variables),
+            'action_text': self.action_text,
+            'action_url': self.action_url,
+        }
+
+
+class TemplateCache:
+    """
+    In-process cache of compiled templates
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._compiled = {}
+        self._active = None
+        self._loaded_at = 0
+        # Moved by every invalidation; a load only stores its result when
+        # no invalidation happened while it was reading
+        self._generation = 0
+
+    def invalidate(self, sender=None, using=None, **kwargs):
+        """
+        Drop everything; also a ``post_save``/``post_delete`` receiver
+
+        Inside a transaction the templates are dropped again once it
+        commits, since a load running until then still reads the old rows.
+        """
+        self._clear()
+        if sender is not None:
+            transaction.on_commit(self._clear, using=using)
+
+    def _clear(self):
+        with self._lock:
+            self._generation += 1
+            self._compiled.clear()
+            self._active = None
+
+    def compile(self, template):
+        """Compiled form of a template, reused while its content is unchanged"""
+        if template.pk is None:
+            return CompiledTemplate(template)
+
+        compiled = self._compiled.get(template.pk)
+        if (compiled is None
+                or compiled.source != (template.title_template, template.message_template)
+                or (compiled.name, compiled.notification_type, compiled.priority)
+                != (template.name, template.notification_type, template.priority)):
+            compiled = CompiledTemplate(template)
+            with self._lock:
+                self._compiled[template.pk] = compiled
+        return compiled
+
+    def active(self):
+        """Compiled forms of all active templates, loaded once"""
+        active = self._active
+        if active is None or time.monotonic() - self._loaded_at > self.ttl:
+            from .models import NotificationTemplate
+
+            generation = self._generation
+            active = [
+                CompiledTemplate(template)
+                for template in NotificationTemplate.objects.filter(is_active=True)
+            ]
+            with self._lock:
+                if generation == self._generation:
+                    self._compiled.update((compiled.pk, compiled) for compiled in active)
+                    self._active = active
+                    self._loaded_at = time.monotonic()
+        return active
+
+    def render_random(self, count, rng=random):
+        """
+        Pick up to ``count`` renderable active templates at random and render
+        only those
+
+        Returns:
+            list: ``Notification`` field values, one dict per template
+        """
+        candidates = [compiled for compiled in self.active() if compiled.is_renderable]
+        chosen = rng.sample(candidates, min(count, len(candidates)))
+        return [compiled.render_notification(rng) for compiled in chosen]
+
+
+template_cache = TemplateCache(ttl=settings.NOTIFICATIONS_TEMPLATE_CACHE_TTL)
@@ -1,11 +1,18 @@
 """
 Utility functions for creating and managing notifications
 """
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db.models import Q
 from datetime import timedelta
-from .models import Notification, NotificationTemplate
+import random
+from . import metrics
+from .models import Notification, NotificationTemplate, NotificationChange, NotificationCounter
+from .global_notifications import global_notifications
+from .notification_templates import template_cache
+from .pagination import KeysetPaginator
 
 def create_notification(title, message, notification_type='info', priority='medium', 
                        user=None, is_global=False, action_url='', action_text='', 
@@ -52,6 +59,138 @@ def create_notification(title, message, notification_type='info', priority='medi
         expiry_date=expiry_date
     )
 
+BULK_FIELDS = {
+    'title', 'message', 'notification_type', 'priority', 'user', 'user_id', 'is_global',
+    'action_url', 'action_text', 'model_name', 'operation_id', 'metadata',
+    'auto_expire', 'expiry_days',
+}
+
+def build_notification(item, now=None):
+    """
+    Validate one notification payload and build the unsaved notification
+    
+    Args:
+        item (dict): The keyword arguments of ``create_notification``; the
+            user may be given as ``user`` or ``user_id`` and is not checked
+            against the database
+        now (datetime, optional): Time the expiry is counted from
+    
+    Returns:
+        tuple: ``(notification, errors)``; ``notification`` is None and
+        ``errors`` maps field names to messages when the payload is invalid
+    """
+    if not isinstance(item, dict):
+        return None, {'__all__': ['Expected an object']}
+    
+    unknown = set(item) - BULK_FIELDS
+    if unknown:
+        return None, {field: ['Unknown field'] for field in sorted(unknown)}
+    
+    fields = dict(item)
+    expiry_days = fields.pop('expiry_days', 7)
+    try:
+        notification = Notification(**fields)
+    except (TypeError, ValueError) as e:
+        return None, {'__all__': [str(e)]}
+    
+    errors = {}
+    try:
+        notification.full_clean(exclude=['user'], validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors = e.message_dict
+    if not isinstance(notification.metadata, dict):
+        errors.setdefault('metadata', []).append('Must be an object')
+    if not isinstance(expiry_days, int) or isinstance(expiry_days, bool) or expiry_days < 1:
+        errors.setdefault('expiry_days', []).append('Must be a positive whole number of days')
+    if errors:
+        return None, errors
+    
+    if notification.auto_expire:
+        notification.expiry_date = (now or timezone.now()) + timedelta(days=expiry_days)
+    return notification, {}
+
+def create_notifications_bulk(items, user=None, chunk_size=500):
+    """
+    Validate and create many notifications in one transaction
+    
+    Args:
+        items (list): One dict per notification, taking the keyword arguments
+            of ``create_notification``; the user may be given as ``user`` or
+            ``user_id``
+        user (User, optional): Target user for personal items that name none
+        chunk_size (int): Rows per INSERT statement
+    
+    Returns:
+        list: One result per item, in order: ``{'index': i, 'id': '...'}``
+        when created or ``{'index': i, 'errors': {...}}`` when rejected.
+        Rejected items do not stop the valid ones from being created.
+    """
+    now = timezone.now()
+    results = []
+    pending = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and 'user' not in item and 'user_id' not in item and not item.get('is_global'):
+            item = dict(item, user=user)
+        notification, errors = build_notification(item, now)
+        
+        result = {'index': index}
+        results.append(result)
+        if errors:
+            result['errors'] = errors
+        else:
+            pending.append((result, notification))
+    
+    # Check every referenced user with a single query
+    user_ids = {notification.user_id for _, notification in pending if notification.user_id is not None}
+    existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    valid = []
+    for result, notification in pending:
+        if notification.user_id is not None and notification.user_id not in existing:
+            result['errors'] = {'user': ['User does not exist']}
+        else:
+            valid.append((result, notification))
+    
+    Notification.objects.bulk_create_tracked(
+        [notification for _, notification in valid], batch_size=chunk_size
+    )
+    for result, notification in valid:
+        result['id'] = str(notification.id)
+    
+    return results
+
+def create_dynamic_notifications(user_ids, count=1, generated_by='system', rng=random, batch_size=500):
+    """
+    Create notifications from randomly chosen active templates
+    
+    Args:
+        user_ids (iterable): Users to create notifications for
+        count (int): Notifications per user
+        generated_by (str): Recorded in the notification metadata
+        rng (random.Random): Source of the template choice and variables
+        batch_size (int): Rows per INSERT statement
+    
+    Returns:
+        list: The created notifications
+    """
+    generated_at = timezone.now().isoformat()
+    notifications = [
+        Notification(
+            user_id=user_id,
+            metadata={
+                'isDynamic': True,
+                'generated_at': generated_at,
+                'generated_by': generated_by,
+                'source': 'dynamic_generator'
+            },
+            **fields
+        )
+        for user_id in user_ids
+        for fields in template_cache.render_random(count, rng)
+    ]
+    created = Notification.objects.bulk_create_tracked(notifications, batch_size=batch_size)
+    metrics.notifications_generated.inc_on_commit(len(created), generated_by=generated_by)
+    return created
+
 def create_ml_training_notification(user, model_name, status, accuracy=None, 
                                   duration=None, error_message=None, operation_id=None):
     """
@@ -210,7 +349,7 @@ def create_notification_from_template(template_name, user=None, **kwargs):
     except NotificationTemplate.DoesNotExist:
         raise ValueError(f"Template '{template_name}' not found or not active")
 
-def get_user_notifications(user, unread_only=False, limit=None):
+def get_user_notifications(user, unread_only=False, limit=None, cursor=None):
     """
     Get notifications for a specific user
     
@@ -218,24 +357,38 @@ def get_user_notifications(user, unread_only=False, limit=None):
         user (User): The user to get notifications for
         unread_only (bool): Whether to return only unread notifications
         limit (int, optional): Maximum number of notifications to return
+            (the page size when paginating, 20 by default)
+        cursor (str, optional): Keyset cursor from a previous page; pass an
+            empty string for the first page
     
     Returns:
-        QuerySet: Notifications for the user
+        list: Notifications for the user, newest first, or a ``KeysetPage``
+        when ``cursor`` is given. Each one carries the user's read state as
+        ``user_has_read``.
     """
-    notifications = Notification.objects.filter(
-        Q(user=user) | Q(is_global=True),
+    # The user's own rows come from the database, the global ones from the
+    # in-process cache (see global_notifications.py)
+    own = Notification.objects.retained().owned_by(user).filter(
         is_active=True
     ).exclude(
         Q(expiry_date__lt=timezone.now()) & Q(auto_expire=True)
-    ).order_by('-created_at')
+    ).order_by('-created_at', '-id')
+    global_ones = global_notifications.for_user(user, NotificationCounter.objects.global_version())
     
     if unread_only:
-        notifications = notifications.filter(is_read=False)
+        own = own.filter(is_read=False)
+        global_ones = [notification for notification in global_ones if not notification.user_has_read]
+    
+    if cursor is not None:
+        return KeysetPaginator(own, limit or 20, extra_rows=global_ones).page(cursor)
     
     if limit:
-        notifications = notifications[:limit]
+        own = own[:limit]
     
-    return notifications
+    notifications = sorted(
+        [*own, *global_ones], key=lambda n: (n.created_at, str(n.pk)), reverse=True
+    )
+    return notifications[:limit] if limit else notifications
 
 def mark_notifications_read(user, notification_ids=None):
     """
@@ -248,26 +401,26 @@ def mark_notifications_read(user, notification_ids=None):
     Returns:
         int: Number of notifications marked as read
     """
-    notifications = Notification.objects.filter(
+    notifications = Notification.objects.retained().filter(
         Q(user=user) | Q(is_global=True),
-        is_read=False,
         is_active=True
     )
     
     if notification_ids:
         notifications = notifications.filter(id__in=notification_ids)
     
-    updated_count = notifications.update(
-        is_read=True,
-        read_at=timezone.now()
-    )
-    
-    return updated_count
+    # Global notifications are marked with a read receipt for this user only
+    return notifications.mark_read_for(user)
 
 def cleanup_expired_notifications():
     """
     Clean up expired notifications
     
+    Expired notifications are deactivated, which also removes them from the
+    badge counters and sends delta-sync clients a tombstone for each. Change
+    log entries older than ``NOTIFICATIONS_CHANGE_LOG_RETENTION_DAYS`` are
+    pruned at the same time.
+    
     Returns:
         int: Number of notifications cleaned up
     """
@@ -277,7 +430,7 @@ def cleanup_expired_notifications():
         is_active=True
     )
     
-    count = expired_notifications.count()
-    expired_notifications.update(is_active=False)
+    count = expired_notifications.update_tracked(is_active=False)
+    NotificationChange.objects.prune(settings.NOTIFICATIONS_CHANGE_LOG_RETENTION_DAYS)
     
     return count
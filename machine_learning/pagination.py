@@ -0,0 +1,176 @@
+"""
+Keyset (cursor) pagination for notification lists
+
+Pages are found by seeking to the ``(created_at, id)`` of the last row seen
+instead of using OFFSET, so deep pages cost the same as the first one and
+no COUNT query is needed.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, created_at, pk):
+    """Build an opaque cursor pointing before (``'prev'``) or after (``'next'``) a row"""
+    raw = json.dumps([direction, created_at.isoformat(), str(pk)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by ``encode_cursor``
+
+    Returns:
+        tuple: ``(direction, created_at, pk)``
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        created_at = datetime.fromisoformat(created_at)
+        if timezone.is_naive(created_at):
+            raise ValueError(created_at)
+        return direction, created_at, str(uuid.UUID(pk))
+    except (AttributeError, TypeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+class KeysetPage:
+    """
+    One page of results, usable in templates like a ``Paginator`` page
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first by ``(created_at, id)``
+
+    Args:
+        queryset (QuerySet): Rows to paginate; any ordering is replaced. A
+            ``.values()`` queryset must include ``id`` and ``created_at``.
+        per_page (int): Rows per page
+        total (int, optional): Row count to show alongside the pages, for
+            example from the notification counters. Never computed here.
+        extra_rows (list, optional): Rows held in memory (of the same kind as
+            the queryset's), merged into the pages by ``(created_at, id)``
+    """
+
+    def __init__(self, queryset, per_page, total=None, extra_rows=()):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.total = total
+        self.extra_rows = extra_rows
+
+    def page(self, cursor=None):
+        """
+        Get the page a cursor points to, or the first page
+
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded
+        """
+        if not cursor:
+            return self._page_after(None)
+
+        direction, created_at, pk = decode_cursor(cursor)
+        if direction == 'next':
+            return self._page_after((created_at, pk))
+        return self._page_before((created_at, pk))
+
+    def get_page(self, cursor=None):
+        """Like ``page()`` but falls back to the first page on a bad cursor"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _page_after(self, key):
+        """Rows older than ``key`` (newest first)"""
+        rows = self.queryset
+        if key is not None:
+            created_at, pk = key
+            rows = rows.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        rows = list(rows.order_by('-created_at', '-id')[:self.per_page + 1])
+        if self.extra_rows:
+            rows += [
+                row for row in self.extra_rows
+                if key is None or self._sort_key(row) < self._sort_key(key)
+            ]
+            rows = sorted(rows, key=self._sort_key, reverse=True)[:self.per_page + 1]
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._make_page(rows, has_next=has_more, has_previous=key is not None)
+
+    def _page_before(self, key):
+        """Rows newer than ``key``, returned newest first"""
+        created_at, pk = key
+        rows = list(
+            self.queryset
+            .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:self.per_page + 1]
+        )
+        if self.extra_rows:
+            rows += [row for row in self.extra_rows if self._sort_key(row) > self._sort_key(key)]
+            rows = sorted(rows, key=self._sort_key)[:self.per_page + 1]
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._make_page(rows, has_next=True, has_previous=has_more)
+
+    def _make_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor('next', *self._key(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor('prev', *self._key(rows[0]))
+        return KeysetPage(rows, next_cursor, previous_cursor, total=self.total)
+
+    @staticmethod
+    def _key(row):
+        if isinstance(row, dict):
+            return row['created_at'], row['id']
+        return row.created_at, row.pk
+
+    @classmethod
+    def _sort_key(cls, row):
+        """
+        ``_key`` of a row, or of a decoded cursor, comparable in Python the
+        way the database orders it: cursors carry the id as a string, and
+        hex UUIDs sort as strings the same as the CHAR(32) column
+        """
+        created_at, pk = row if isinstance(row, tuple) else cls._key(row)
+        return created_at, str(pk)
@@ -0,0 +1,127 @@
+"""
+Monthly RANGE partitions of the notification table (MySQL only)
+
+Notifications are partitioned on ``created_at`` with one partition per
+calendar month (UTC), named ``pYYYYMM``, plus a ``pmax`` catch-all. Old
+months are removed by dropping their partition instead of deleting rows,
+once none of their notifications is active and not due to expire.
+
+MySQL requires the partitioning column in every unique key and does not
+allow foreign keys on partitioned tables, so the table's primary key is
+``(id, created_at)`` and the foreign keys to and from it exist in Django
+only (``db_constraint=False``). Django still treats ``id`` as the primary key.
+
+Other databases keep a plain table; nothing here applies to them.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+TABLE = 'machine_learning_notification'
+MAXVALUE_PARTITION = 'pmax'
+_partition_name = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def month_start(value):
+    """First instant of the UTC month containing ``value``"""
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    """``month`` (a month start) moved by ``months``, which may be negative"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def retention_start(now=None):
+    """
+    Oldest month whose notifications are kept and shown
+
+    ``NOTIFICATIONS_RETENTION_MONTHS`` months are kept, counting the current
+    one, plus notifications that do not expire. Filtering on ``created_at``
+    lets MySQL prune the older partitions from a query.
+    """
+    return add_months(month_start(now or timezone.now()), -(settings.NOTIFICATIONS_RETENTION_MONTHS - 1))
+
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+
+def partition_month(name):
+    """The month a ``pYYYYMM`` partition holds, or None for other partitions"""
+    match = _partition_name.match(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+
+
+def partition_definition(month):
+    upper = add_months(month, 1)
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper:%Y-%m-%d %H:%M:%S}')"
+
+
+def months_between(first, last):
+    """Month starts from ``first`` to ``last`` inclusive"""
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def is_partitioned(connection):
+    return connection.vendor == 'mysql' and bool(list_partitions(connection))
+
+
+def list_partitions(connection):
+    """
+    The table's partitions in order
+
+    Returns:
+        list: ``(name, month or None, estimated rows)`` tuples; empty when the
+        table is not partitioned
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT PARTITION_NAME, TABLE_ROWS
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            [TABLE],
+        )
+        return [(name, partition_month(name), rows or 0) for name, rows in cursor.fetchall()]
+
+
+def partition_table_sql(months):
+    """Statements that turn the plain table into monthly partitions"""
+    definitions = [partition_definition(month) for month in months]
+    definitions.append(f'PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)')
+    return [
+        f'ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)',
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE COLUMNS(created_at) ({', '.join(definitions)})",
+    ]
+
+
+def unpartition_table_sql():
+    return [
+        f'ALTER TABLE {TABLE} REMOVE PARTITIONING',
+        f'ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id)',
+    ]
+
+
+def add_partitions_sql(months):
+    """Split new monthly partitions off the (empty) ``pmax`` partition"""
+    definitions = [partition_definition(month) for month in months]
+    definitions.append(f'PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)')
+    return f"ALTER TABLE {TABLE} REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ({', '.join(definitions)})"
+
+
+def drop_partitions_sql(names):
+    return f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(names)}"
@@ -0,0 +1,130 @@
+"""
+Signed polling tokens for the notification feed
+
+The dashboard polls ``/api/notifications/`` every 30 seconds. With a
+session, each poll reads the session row and the ``auth_user`` row before
+the view starts. Pages built on ``layout.master.html`` therefore embed a
+short-lived token instead: the user id and the time of issue, signed with
+``SECRET_KEY`` (HMAC, via ``django.core.signing``). ``poll_token_auth``
+accepts it from the ``X-Poll-Token`` header without reading the session.
+It loads only the user's ``is_active``, and answers 401 for a user who
+was deactivated or deleted.
+
+Tokens expire after ``POLL_TOKEN_MAX_AGE`` seconds. Past half of that, the
+response carries a fresh token in ``X-Poll-Token`` for the page to use
+(rotation). Logging out, changing the password, deactivation and deletion
+record the time in ``POLL_TOKEN_CACHE``, and tokens issued up to then are
+refused (revocation). That cache has to be
+shared by every process, or other processes keep accepting the user's
+tokens until they expire.
+
+A missing, expired or revoked token is not an error: the request falls
+back to the session, and gets a new token if the session is valid.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.http import JsonResponse
+
+HEADER = 'X-Poll-Token'
+SALT = 'machine_learning.poll_token'
+
+
+def _signer():
+    return signing.TimestampSigner(salt=SALT)
+
+
+def _revoked_key(user_id):
+    return f'poll_token:revoked:{user_id}'
+
+
+def issue(user_id):
+    """A new token for ``user_id``"""
+    return _signer().sign(str(user_id))
+
+
+def issue_for_request(request):
+    """Token for the request's user, or '' for anonymous requests"""
+    if not request.user.is_authenticated:
+        return ''
+    return issue(request.user.pk)
+
+
+def verify(token):
+    """
+    Check a token
+
+    Returns:
+        tuple: ``(user_id, issued_at)``, or None if the token is forged,
+        malformed, expired or revoked
+    """
+    try:
+        user_id = int(_signer().unsign(token, max_age=settings.POLL_TOKEN_MAX_AGE))
+        issued_at = signing.b62_decode(token.rsplit(':', 2)[1])
+    except (signing.BadSignature, ValueError):
+        return None
+    revoked_at = caches[settings.POLL_TOKEN_CACHE].get(_revoked_key(user_id))
+    if revoked_at is not None and issued_at <= revoked_at:
+        return None
+    return user_id, issued_at
+
+
+def revoke(user_id):
+    """Refuse every token issued to ``user_id`` so far"""
+    # Kept only as long as the tokens it refuses could still be valid
+    caches[settings.POLL_TOKEN_CACHE].set(
+        _revoked_key(user_id), int(time.time()), timeout=settings.POLL_TOKEN_MAX_AGE + 1
+    )
+
+
+def revoke_on_change(sender, instance, update_fields=None, **kwargs):
+    """
+    ``pre_save`` receiver for ``User``: revoke the user's tokens when the
+    password changes or the account is deactivated
+    """
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'password', 'is_active'} & set(update_fields):
+        return
+    stored = sender._default_manager.filter(pk=instance.pk).values('password', 'is_active').first()
+    if stored is None:
+        return
+    if stored['password'] != instance.password or (stored['is_active'] and not instance.is_active):
+        revoke(instance.pk)
+
+
+def revoke_on_delete(sender, instance, **kwargs):
+    """``post_delete`` receiver for ``User``"""
+    revoke(instance.pk)
+
+
+def poll_token_auth(view_func):
+    """
+    Authenticate a request by its polling token, before the session
+
+    The view sees a ``User`` with only ``pk`` and ``is_active`` loaded, so
+    it should not use anything else of ``request.user``. Put it outside
+    ``login_required``.
+    """
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        token = request.headers.get(HEADER)
+        identity = verify(token) if token else None
+        if identity is not None:
+            user = User.objects.only('pk', 'is_active').filter(pk=identity[0]).first()
+            if user is None or not user.is_active:
+                return JsonResponse({'error': 'Not authenticated'}, status=401)
+            request.user = user
+
+        response = view_func(request, *args, **kwargs)
+
+        rotate_after = settings.POLL_TOKEN_MAX_AGE / 2
+        if identity is None or time.time() - identity[1] > rotate_after:
+            if request.user.is_authenticated:
+                response[HEADER] = issue(request.user.pk)
+        return response
+    return wrapped_view
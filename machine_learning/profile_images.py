@@ -0,0 +1,249 @@
+"""
+Profile image uploads: validation, content-addressed storage and resized
+variants
+
+``store_upload`` copies an upload to a temporary file chunk by chunk,
+hashing it on the way and refusing it past ``PROFILE_IMAGE_MAX_BYTES``,
+then checks with Pillow that it is a JPEG, PNG, WebP or GIF of at most
+``PROFILE_IMAGE_MAX_PIXELS``. It is stored as
+``profile_pics/<h[:2]>/<h>/original.<ext>``, ``h`` being the SHA-256 of
+its content, so a picture uploaded twice (or by two users) is stored once
+and a name never changes content.
+
+``process_in_background`` writes square WebP and JPEG copies at each of
+``PROFILE_IMAGE_SIZES`` next to the original (``<size>.webp``,
+``<size>.jpg``) on a thread pool; Pillow releases the GIL while resizing
+and encoding. The ``profile_picture`` template tag offers them through
+``srcset``. Until they exist, and for pictures stored before this layout,
+it shows the original; ``process_profile_images`` converts those.
+
+Since names never change content, a web server in front of ``MEDIA_ROOT``
+can cache ``profile_pics/`` for a year.
+"""
+import hashlib
+import io
+import logging
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Pillow format -> extension of the stored original
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+_original_name = re.compile(r'^profile_pics/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})/original\.[a-z]+$')
+
+_executor = None
+_executor_lock = threading.Lock()
+# Digests whose variants are known to be written; they never change
+_processed = set()
+
+
+def original_name(digest, extension):
+    return f'profile_pics/{digest[:2]}/{digest}/original.{extension}'
+
+
+def variant_name(name, size, extension):
+    """Name of one variant of the original ``name``"""
+    return f'{name.rsplit("/", 1)[0]}/{size}.{extension}'
+
+
+def variant_formats():
+    """``(extension, Pillow format, content type)`` of the variants written, preferred first"""
+    formats = [('jpg', 'JPEG', 'image/jpeg')]
+    if features.check('webp'):
+        formats.insert(0, ('webp', 'WEBP', 'image/webp'))
+    return formats
+
+
+def is_content_addressed(name):
+    return bool(name and _original_name.match(name))
+
+
+def store_upload(upload, storage=None):
+    """
+    Validate an uploaded image and store it under the hash of its content
+
+    Args:
+        upload (File): The upload, e.g. from ``request.FILES``
+        storage (Storage, optional): Defaults to ``default_storage``
+
+    Returns:
+        str: The stored name, for ``User.profile_image``
+
+    Raises:
+        ValidationError: If the file is too large or not an accepted image
+    """
+    storage = storage or default_storage
+    max_bytes = settings.PROFILE_IMAGE_MAX_BYTES
+    too_large = ValidationError(f'Profile images may be at most {filesizeformat(max_bytes)}')
+    if upload.size is not None and upload.size > max_bytes:
+        raise too_large
+
+    digest = hashlib.sha256()
+    received = 0
+    with tempfile.TemporaryFile() as copy:
+        for chunk in upload.chunks():
+            # Counted as it arrives: the declared size may be missing or wrong
+            received += len(chunk)
+            if received > max_bytes:
+                raise too_large
+            digest.update(chunk)
+            copy.write(chunk)
+
+        copy.seek(0)
+        extension = _validate(copy)
+        name = original_name(digest.hexdigest(), extension)
+        if storage.exists(name):
+            return name
+
+        copy.seek(0)
+        stored = storage.save(name, File(copy))
+        if stored != name:
+            # Another request stored the same picture in the meantime
+            storage.delete(stored)
+        return name
+
+
+def _validate(f):
+    """
+    Check that ``f`` is an image we accept
+
+    Returns:
+        str: Extension to store it with
+    """
+    try:
+        with Image.open(f) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        raise ValidationError('Upload a valid image file') from e
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError('Profile images must be JPEG, PNG, WebP or GIF')
+    if width * height > settings.PROFILE_IMAGE_MAX_PIXELS:
+        raise ValidationError(f'Profile images may be at most {settings.PROFILE_IMAGE_MAX_PIXELS:,} pixels')
+    return ALLOWED_FORMATS[image_format]
+
+
+def make_variants(name, storage=None):
+    """
+    Write the missing square variants of the stored original ``name``
+
+    Returns:
+        int: Number of files written
+    """
+    storage = storage or default_storage
+    with storage.open(name) as f, Image.open(f) as image:
+        image.seek(0)  # the first frame of an animation
+        # JPEGs decode straight at a fraction of their size, still large enough
+        largest = max(settings.PROFILE_IMAGE_SIZES)
+        image.draft('RGB', (largest, largest))
+        # Phones store the orientation in EXIF; the variants carry no metadata
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+        written = 0
+        for size in sorted(settings.PROFILE_IMAGE_SIZES):
+            resized = None
+            for extension, image_format, _ in variant_formats():
+                target = variant_name(name, size, extension)
+                if storage.exists(target):
+                    continue
+                if resized is None:
+                    resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+                data = io.BytesIO()
+                if image_format == 'JPEG':
+                    _flatten(resized).save(data, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                else:
+                    resized.save(data, 'WEBP', quality=WEBP_QUALITY, method=6)
+                stored = storage.save(target, ContentFile(data.getvalue()))
+                if stored != target:
+                    storage.delete(stored)
+                else:
+                    written += 1
+    return written
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: put transparent pictures on white"""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PROFILE_IMAGE_WORKERS, thread_name_prefix='profile-images'
+            )
+        return _executor
+
+
+def process_in_background(name):
+    """Queue ``make_variants(name)`` on the pool; failures are logged"""
+    future = _pool().submit(make_variants, name)
+
+    def report(future):
+        if future.exception() is not None:
+            logger.error('Could not resize profile image %s', name, exc_info=future.exception())
+
+    future.add_done_callback(report)
+    return future
+
+
+def is_processed(name, storage=None):
+    """Whether all variants of the content-addressed original ``name`` exist"""
+    match = _original_name.match(name or '')
+    if match is None:
+        return False
+    digest = match['digest']
+    if digest in _processed:
+        return True
+    storage = storage or default_storage
+    # make_variants writes the largest size last, JPEG after WebP
+    last = variant_name(name, max(settings.PROFILE_IMAGE_SIZES), variant_formats()[-1][0])
+    if not storage.exists(last):
+        return False
+    _processed.add(digest)
+    return True
+
+
+def srcsets(name):
+    """
+    Variant ``srcset`` values of a processed original
+
+    Returns:
+        list: ``(content_type, srcset)`` per format, preferred first
+    """
+    return [
+        (content_type, ', '.join(
+            f'{default_storage.url(variant_name(name, size, extension))} {size}w'
+            for size in sorted(settings.PROFILE_IMAGE_SIZES)
+        ))
+        for extension, _, content_type in variant_formats()
+    ]
+
+
+def fallback_url(name, display_size):
+    """JPEG variant for browsers without ``srcset``: the smallest that is large enough"""
+    sizes = sorted(settings.PROFILE_IMAGE_SIZES)
+    size = next((size for size in sizes if size >= display_size), sizes[-1])
+    return default_storage.url(variant_name(name, size, 'jpg'))
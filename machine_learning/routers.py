@@ -0,0 +1,131 @@
+"""
+Read replica routing for the notification models
+
+With a ``REPLICA_DATABASE`` alias in ``DATABASES``, ``PrimaryReplicaRouter``
+sends the reads of ``REPLICA_MODELS`` made while answering GET and HEAD
+requests to the replica. Everything else uses ``default``: writes, reads in
+other requests (which tend to read rows they then change), reads inside a
+transaction and all reads outside requests, such as management commands
+and the scheduler.
+
+The counters and the change log are read from the replica as well, so a
+feed's ETag or sync cursor is never newer than the rows served with it.
+
+Reads stick to the primary for ``REPLICA_STICKY_SECONDS`` after a client
+writes, so a user sees their own changes (a notification marked as read,
+deleted or created) even while the replica lags. The rest of the request
+that wrote reads from the primary too. ``ReplicaRoutingMiddleware`` tracks
+both. Only committed changes to what the replica serves count as writes:
+notifications (``notifications_changed``), templates and service cards.
+Bookkeeping such as creating a missing counter on a GET does not.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .signals import notifications_changed
+
+REPLICA_MODELS = {
+    'machine_learning.notification',
+    'machine_learning.notificationtemplate',
+    'machine_learning.servicecard',
+    'machine_learning.notificationcounter',
+    'machine_learning.notificationchange',
+}
+STICKY_COOKIE = 'primary_until'
+
+
+class RequestState:
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_request = ContextVar('replica_routing', default=None)
+
+
+def start_request():
+    """Begin tracking a request; returns the token for ``end_request``"""
+    return _request.set(RequestState())
+
+
+def end_request(token):
+    state = _request.get()
+    _request.reset(token)
+    return state
+
+
+def read_from_replica():
+    """Let the current request read from the replica"""
+    state = _request.get()
+    if state is not None:
+        state.use_replica = True
+
+
+def note_write(sender=None, **kwargs):
+    """
+    Record that the current request changed rows the replica serves
+
+    A ``notifications_changed`` receiver (sent once the change is
+    committed) and a ``post_save``/``post_delete`` receiver, which waits
+    for the commit.
+    """
+    state = _request.get()
+    if state is None:
+        return
+    if kwargs.get('signal') is notifications_changed:
+        state.wrote = True
+    else:
+        transaction.on_commit(lambda: setattr(state, 'wrote', True), using=kwargs.get('using'))
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def is_sticky(request):
+    """Whether the client wrote recently enough to need the primary"""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def use_primary(view_func):
+    """
+    Keep a GET view on the primary, for views that write what they read
+    (e.g. marking a notification as read when it is shown)
+    """
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        return view_func(*args, **kwargs)
+    wrapped_view.use_primary = True
+    return wrapped_view
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction belong with its writes
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from replication
+        return db != replica_alias()
@@ -0,0 +1,287 @@
+"""
+Deterministic synthetic users, templates and notifications at scale
+
+Rows are generated in chunks. Each chunk has its own random generator,
+seeded from the seed and the chunk's number, so the same seed (and chunk
+size) always gives the same rows, whether the chunks run in one process or
+in a pool of them. Timestamps are relative to a fixed ``now``.
+
+Users and templates go through ``bulk_create``. Notifications, by far the
+most rows, are sorted into primary key order within their month (the
+table's partition, see partitions.py) and inserted straight into the table
+with ``executemany``, skipping model instances. That also skips the badge
+counters, the change log and the metrics, so the seeder rebuilds the
+counters afterwards and clients resync from scratch.
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from .models import Notification, NotificationTemplate
+from .notification_templates import VARIABLE_PROVIDERS
+from .partitions import month_start
+
+SEED_TAG = 'synthetic-seed'
+USERNAME_PREFIX = 'seed_user_'
+TEMPLATE_PREFIX = 'seed_template_'
+UNUSABLE_PASSWORD = f'{UNUSABLE_PASSWORD_PREFIX}synthetic-seed'
+
+# Shares seen on the live site
+TYPE_WEIGHTS = {
+    'info': 35, 'success': 18, 'warning': 12, 'error': 5,
+    'training': 13, 'prediction': 13, 'system': 4,
+}
+PRIORITY_WEIGHTS = {'low': 30, 'medium': 45, 'high': 20, 'urgent': 5}
+SOURCES = ['dynamic_generator', 'training', 'prediction', 'upload', 'system']
+STATUSES = ['queued', 'running', 'completed', 'failed', 'cancelled']
+# Higher means a few users get most of the notifications
+ACTIVITY_SKEW = 2.0
+
+# Only variables with a ``variable_provider`` (notification_templates.py),
+# so the generator can render the seeded templates
+TEMPLATE_PATTERNS = [
+    ('Model Training Completed: v{model_version}', 'Model v{model_version} finished training with '
+                                                   '{accuracy}% accuracy after {duration} minutes.'),
+    ('Model Training Failed: v{model_version}', 'Training of model v{model_version} stopped. Check the logs.'),
+    ('Prediction Ready', 'Your prediction finished with a confidence of {confidence}.'),
+    ('Dataset Upload Complete', 'The dataset was validated: {record_count} records, {file_size} MB.'),
+    ('Data Processing Complete', 'Processed {records} records in {duration} minutes.'),
+    ('System Performance Alert', 'CPU usage is at {cpu_usage}%. Consider scaling resources.'),
+    ('Model Accuracy Improved', 'Neural net v{neural_net_version} gained {improvement}% accuracy.'),
+    ('Model Deployment Ready', 'Predictor v{predictor_version} is ready to replace '
+                               'production v{production_version}.'),
+]
+MODEL_NAMES = ['ImageClassifier', 'SentimentAnalyzer', 'FraudDetector', 'ChurnPredictor', 'Recommender']
+
+
+class _RandomValues(dict):
+    """Template variables, from their providers as they are asked for"""
+
+    def __init__(self, rng):
+        super().__init__()
+        self.rng = rng
+
+    def __missing__(self, key):
+        # Kept, so the title and message show the same value
+        self[key] = VARIABLE_PROVIDERS[key].func(self.rng)
+        return self[key]
+
+
+def chunk_rng(seed, kind, index):
+    # Seeding with a string is stable across runs and processes, unlike hash()
+    return random.Random(f'{seed}-{kind}-{index}')
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+def make_templates(count, seed):
+    """``count`` NotificationTemplate instances cycling through the patterns"""
+    rng = chunk_rng(seed, 'templates', 0)
+    templates = []
+    for i in range(count):
+        title, message = TEMPLATE_PATTERNS[i % len(TEMPLATE_PATTERNS)]
+        templates.append(NotificationTemplate(
+            name=f'{TEMPLATE_PREFIX}{i:04d}',
+            title_template=title,
+            message_template=message,
+            notification_type=weighted(rng, TYPE_WEIGHTS),
+            priority=weighted(rng, PRIORITY_WEIGHTS),
+        ))
+    return templates
+
+
+def seed_users(start, count, seed, now, password, batch_size, using='default'):
+    """
+    Insert users ``start`` to ``start + count`` (one chunk)
+
+    Returns:
+        int: Users inserted
+    """
+    rng = chunk_rng(seed, 'users', start)
+    users = [
+        User(
+            username=f'{USERNAME_PREFIX}{i:07d}',
+            email=f'{USERNAME_PREFIX}{i:07d}@example.com',
+            password=password,
+            date_joined=now - timedelta(days=rng.uniform(0, 730)),
+        )
+        for i in range(start, start + count)
+    ]
+    with transaction.atomic(using=using):
+        User.objects.using(using).bulk_create(users, batch_size=batch_size)
+    return count
+
+
+class NotificationFactory:
+    """
+    Builds notification rows with realistic distributions
+
+    Args:
+        user_ids (list): Ids of the users notifications are spread over
+        templates (list): ``(title, message, type, priority)`` to fill in
+        now (datetime): The moment the data set ends at
+        months (int): How far back notifications go
+        global_ratio (float): Share of global notifications
+        read_ratio (float): Share of users' notifications that are read
+        expired_ratio (float): Share of notifications whose expiry passed
+            (inactive, as the expiry sweep leaves them)
+    """
+
+    def __init__(self, user_ids, templates, now, months, global_ratio, read_ratio, expired_ratio):
+        self.user_ids = user_ids
+        self.templates = templates
+        self.now = now
+        self.window = timedelta(days=30 * months).total_seconds()
+        self.global_ratio = global_ratio
+        self.read_ratio = read_ratio
+        self.expired_ratio = expired_ratio
+
+    def make(self, rng):
+        """One notification as a dict of attribute values"""
+        is_global = not self.user_ids or rng.random() < self.global_ratio
+        user_id = None
+        if not is_global:
+            # Low indices are the busy users
+            user_id = self.user_ids[int(len(self.user_ids) * rng.random() ** ACTIVITY_SKEW)]
+
+        # Recent months are busier than old ones
+        age = self.window * rng.random() ** 1.5
+        created_at = self.now - timedelta(seconds=age)
+        is_read = not is_global and rng.random() < self.read_ratio
+        auto_expire = rng.random() < 0.9
+        if rng.random() < self.expired_ratio:
+            is_active = False
+            expiry_date = created_at + timedelta(seconds=age * rng.random())
+        else:
+            is_active = True
+            expiry_date = self.now + timedelta(hours=rng.uniform(1, 24 * 7)) if auto_expire else None
+
+        title, message, notification_type, priority = rng.choice(self.templates)
+        values = _RandomValues(rng)
+        metadata = {'source': rng.choice(SOURCES)}
+        if rng.random() < 0.3:
+            metadata['isDynamic'] = True
+        if rng.random() < 0.4:
+            metadata['status'] = rng.choice(STATUSES)
+        if rng.random() < 0.4:
+            metadata['confidence'] = round(rng.random(), 4)
+
+        return {
+            'id': uuid.UUID(int=rng.getrandbits(128), version=4),
+            'title': title.format_map(values),
+            'message': message.format_map(values),
+            'notification_type': notification_type,
+            'priority': priority,
+            'user_id': user_id,
+            'is_global': is_global,
+            'is_read': is_read,
+            'is_active': is_active,
+            'auto_expire': auto_expire,
+            'expiry_date': expiry_date,
+            'action_url': '',
+            'action_text': '',
+            'created_at': created_at,
+            'updated_at': created_at,
+            'read_at': created_at + timedelta(seconds=(age * rng.random())) if is_read else None,
+            'model_name': rng.choice(MODEL_NAMES) if 'model_version' in values else '',
+            'operation_id': SEED_TAG,
+            'metadata': metadata,
+        }
+
+
+def notification_fields():
+    """The columns an INSERT writes; the database computes the generated ones"""
+    return [field for field in Notification._meta.concrete_fields if not field.generated]
+
+
+def insert_rows(model, fields, rows, batch_size, using='default'):
+    """
+    INSERT ``rows`` (tuples of database values in ``fields`` order) into
+    ``model``'s table, ``batch_size`` rows per ``executemany``
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            # MySQLdb turns this into multi-row INSERT statements
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def seed_notifications(index, count, seed, factory, batch_size, using='default'):
+    """
+    Insert one chunk of ``count`` notifications
+
+    Returns:
+        int: Notifications inserted
+    """
+    rng = chunk_rng(seed, 'notifications', index)
+    notifications = [factory.make(rng) for _ in range(count)]
+    # Append to each month's partition in primary key order instead of
+    # splitting pages all over the clustered index
+    notifications.sort(key=lambda row: (month_start(row['created_at']), row['id'].hex))
+
+    connection = connections[using]
+    fields = notification_fields()
+    rows = [
+        tuple(field.get_db_prep_save(row[field.attname], connection) for field in fields)
+        for row in notifications
+    ]
+    with transaction.atomic(using=using):
+        insert_rows(Notification, fields, rows, batch_size, using)
+    return count
+
+
+# Set in each pool worker by init_worker, so it is not pickled per chunk
+_factory = None
+
+
+def init_worker(factory):
+    global _factory
+    _factory = factory
+    # Never share the parent's database connections
+    connections.close_all()
+
+
+def seed_notifications_in_worker(index, count, seed, batch_size):
+    return seed_notifications(index, count, seed, _factory, batch_size)
+
+
+def seed_users_in_worker(start, count, seed, now, password, batch_size):
+    return seed_users(start, count, seed, now, password, batch_size)
+
+
+class Throughput:
+    """Rows per second of one seeding phase"""
+
+    def __init__(self, name, total):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = self.finished = time.perf_counter()
+
+    def add(self, rows):
+        self.done += rows
+        self.finished = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return self.finished - self.started
+
+    @property
+    def rate(self):
+        return self.done / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f'{self.name}: {self.done}/{self.total} rows, {self.rate:,.0f} rows/s'
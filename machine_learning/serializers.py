@@ -0,0 +1,90 @@
+"""
+JSON output of the notification API views
+
+Each endpoint has a projection: the columns it sends, loaded with
+``.values()`` so no model instances are built and ``metadata`` and other
+unused columns never leave the database. Rows are encoded in one pass with
+``orjson`` when it is installed (the standard ``json`` module otherwise),
+which converts datetimes and UUIDs itself.
+"""
+import json
+import uuid
+from datetime import date, datetime
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+class Projection:
+    """
+    Columns an endpoint sends and the keys they are sent under
+
+    Args:
+        fields (list): Queryset field or annotation names
+        renames (dict, optional): Maps a field name to its key in the output
+    """
+
+    def __init__(self, fields, renames=None):
+        self.fields = list(fields)
+        self.renames = renames or {}
+
+    def extend(self, *fields):
+        return Projection(self.fields + list(fields), self.renames)
+
+    def rows(self, queryset):
+        """The queryset as dicts of just these fields"""
+        return queryset.values(*self.fields)
+
+    def row(self, instance):
+        """A notification already in memory as a row, like ``rows()`` gives"""
+        return {field: getattr(instance, field) for field in self.fields}
+
+    def output(self, row):
+        """A row (dict) in the shape sent to clients"""
+        return {self.renames.get(field, field): row[field] for field in self.fields}
+
+    def from_instance(self, instance):
+        """Same shape for a notification already in memory"""
+        return self.output(self.row(instance))
+
+
+# Notification lists; ``user_has_read`` comes from ``with_read_state()``
+FEED = Projection(
+    ['id', 'title', 'message', 'notification_type', 'priority', 'user_has_read',
+     'created_at', 'action_url', 'action_text', 'model_name'],
+    renames={'notification_type': 'type', 'user_has_read': 'is_read'},
+)
+
+# Delta sync also tells clients when a notification expires
+DELTA = FEED.extend('expiry_date')
+
+# Notifications just generated for the dashboard, which shows their metadata
+GENERATED = Projection(
+    ['id', 'title', 'message', 'notification_type', 'priority', 'created_at',
+     'action_url', 'action_text', 'model_name', 'metadata'],
+    renames={'notification_type': 'type'},
+)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Encode to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200):
+    """Like ``JsonResponse`` but encoded with ``dumps``"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
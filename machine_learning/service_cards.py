@@ -0,0 +1,83 @@
+"""
+Cached service cards for the dashboard
+
+The card list and the rendered card grid are kept in Django's cache under
+keys that include a version number. Saving or deleting a ``ServiceCard``
+bumps the version, so every process switches to fresh keys at once and the
+stale entries simply expire. A version read before a card is saved can
+only ever store under the old key, so a slow request cannot put stale
+cards back.
+
+With a cache that is not shared between processes (the default
+local-memory cache), other processes only see a change when their entries
+reach ``SERVICE_CARDS_CACHE_TIMEOUT``.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'service_cards:version'
+GRID_TEMPLATE = 'layout/service_cards.html'
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate(sender=None, **kwargs):
+    """Move to a new version; also a ``post_save``/``post_delete`` receiver"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not set yet (or evicted): any version nobody has used will do
+        cache.set(VERSION_KEY, current_version() + 1, timeout=None)
+
+
+def get_cards(version=None):
+    """All service cards, from the cache when possible"""
+    from .models import ServiceCard
+
+    version = version or current_version()
+    key = f'service_cards:list:{version}'
+    cards = cache.get(key)
+    if cards is None:
+        cards = list(ServiceCard.objects.all())
+        cache.set(key, cards, settings.SERVICE_CARDS_CACHE_TIMEOUT)
+    return cards
+
+
+def get_grid():
+    """
+    The rendered card grid and the cards it shows
+
+    Returns:
+        tuple: ``(html, cards)``; on a cache hit ``cards`` is not loaded and
+        is None
+    """
+    version = current_version()
+    key = f'service_cards:grid:{version}'
+    html = cache.get(key)
+    if html is not None:
+        return html, None
+    cards = get_cards(version)
+    html = render_to_string(GRID_TEMPLATE, {'services': cards})
+    cache.set(key, html, settings.SERVICE_CARDS_CACHE_TIMEOUT)
+    return html, cards
+
+
+def warm():
+    """Fill the cache at process start so the first dashboard hit is a hit too"""
+    try:
+        get_grid()
+    except DatabaseError:
+        # The table may not exist yet, e.g. before the first migrate
+        logger.warning('Could not warm the service card cache', exc_info=True)
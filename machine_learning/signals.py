@@ -0,0 +1,9 @@
+"""
+Custom signals for the notification system
+"""
+from django.dispatch import Signal
+
+# Sent once a change to notifications has been committed.
+# ``owners`` is a set of user ids whose notifications changed; ``None`` in
+# the set means global notifications changed, which affects every user.
+notifications_changed = Signal()
@@ -0,0 +1,684 @@
+// URLs come from the <script> tag in layout.master.html
+const dashboardScript = document.currentScript;
+const NOTIFICATION_STREAM_URL = dashboardScript.dataset.streamUrl;
+const GENERATE_NOTIFICATIONS_URL = dashboardScript.dataset.generateUrl;
+// Signed token the feed is polled with instead of the session; the server
+// sends a fresh one in X-Poll-Token before it expires
+let pollToken = dashboardScript.dataset.pollToken;
+
+// ===== Card Interactions =====
+const cards = document.querySelectorAll('.morph-card');
+
+// Card hover effect
+cards.forEach(card => {
+    card.addEventListener('mousemove', (e) => {
+        const rect = card.getBoundingClientRect();
+        const x = ((e.clientX - rect.left) / rect.width) * 100;
+        const y = ((e.clientY - rect.top) / rect.height) * 100;
+        card.style.setProperty('--mouse-x', x + '%');
+        card.style.setProperty('--mouse-y', y + '%');
+    });
+
+    card.addEventListener('click', function() {
+        const service = this.getAttribute('data-service');
+        const title = this.querySelector('.card-title').textContent;
+        console.log('Opening:', service);
+        // Django redirect: window.location.href = `/service/${service}`;
+        alert(`Opening ${title}...`);
+    });
+});
+
+// Graph animation
+const graphBars = document.querySelectorAll('.graph-bar');
+graphBars.forEach((bar, i) => {
+    bar.style.animationDelay = i * 0.1 + 's';
+});
+
+// Magnetic effect for cards
+cards.forEach(card => {
+    card.addEventListener('mouseenter', function() {
+        const icon = this.querySelector('.card-icon');
+        icon.style.transform = 'scale(1.2) rotate(5deg)';
+    });
+
+    card.addEventListener('mouseleave', function() {
+        const icon = this.querySelector('.card-icon');
+        icon.style.transform = 'scale(1) rotate(0deg)';
+    });
+});
+
+// Parallax scroll effect
+let scrollY = 0;
+window.addEventListener('scroll', () => {
+    scrollY = window.scrollY;
+    cards.forEach((card, i) => {
+        const speed = (i % 3 + 1) * 0.1;
+    });
+});
+
+// Card interaction ripple effect
+cards.forEach(card => {
+    card.addEventListener('click', function(e) {
+        const ripple = document.createElement('div');
+        const rect = this.getBoundingClientRect();
+        const size = Math.max(rect.width, rect.height);
+        const x = e.clientX - rect.left - size / 2;
+        const y = e.clientY - rect.top - size / 2;
+
+        ripple.style.width = ripple.style.height = size + 'px';
+        ripple.style.left = x + 'px';
+        ripple.style.top = y + 'px';
+        ripple.style.position = 'absolute';
+        ripple.style.borderRadius = '50%';
+        ripple.style.background = 'rgba(255, 255, 255, 0.4)';
+        ripple.style.transform = 'scale(0)';
+        ripple.style.animation = 'ripple-effect 0.6s ease-out';
+        ripple.style.pointerEvents = 'none';
+
+        this.appendChild(ripple);
+
+        setTimeout(() => ripple.remove(), 600);
+    });
+});
+
+// Add ripple animation
+const rippleStyle = document.createElement('style');
+rippleStyle.textContent = `
+    @keyframes ripple-effect {
+        to {
+            transform: scale(2);
+            opacity: 0;
+        }
+    }
+`;
+document.head.appendChild(rippleStyle);
+
+// Contextual help system
+let helpTimeout;
+document.addEventListener('mousemove', () => {
+    clearTimeout(helpTimeout);
+    helpTimeout = setTimeout(() => {
+        const hint = document.createElement('div');
+        hint.textContent = '';
+        hint.style.position = 'fixed';
+        hint.style.bottom = '120px';
+        hint.style.left = '50%';
+        hint.style.transform = 'translateX(-50%)';
+        hint.style.background = 'rgba(0, 0, 0, 0.8)';
+        hint.style.padding = '15px 30px';
+        hint.style.borderRadius = '50px';
+        hint.style.fontSize = '14px';
+        hint.style.zIndex = '1000';
+        hint.style.animation = 'fadeInUp 0.5s ease';
+        document.body.appendChild(hint);
+
+        setTimeout(() => {
+            hint.style.animation = 'fadeOut 0.5s ease';
+            setTimeout(() => hint.remove(), 500);
+        }, 3000);
+    }, 5000);
+});
+
+// Double click for quick actions
+cards.forEach(card => {
+    card.addEventListener('dblclick', function() {
+        const service = this.getAttribute('data-service');
+        alert(`Quick Action Menu for ${service}:\n\n1. View Details\n2. Start Service\n3. View History\n4. Settings\n5. Share`);
+    });
+});
+
+// ===== Notification System =====
+let notificationContainer = null;
+let unreadCount = 0;
+let nextNotificationTime = Date.now() + 2000;
+let notificationInterval = null;
+
+// Global configuration
+let NOTIFICATIONS_PER_CYCLE = 1;
+let CYCLE_INTERVAL_MINUTES = 60;
+let notificationsFetchFailures = 0;
+const NOTIFICATIONS_MAX_FAILURES = 6;
+let notificationsAutoRefreshIntervalId = null;
+let notificationsBackoffUntil = 0;
+let notificationsErrorBanner = null;
+let notificationsETag = null;
+let seenNotificationIds = null;
+let notificationStream = null;
+let notificationStreamConnected = false;
+let notificationsLastLoaded = 0;
+// While the push stream is up, still poll now and then for changes
+// made in other server processes
+const NOTIFICATIONS_STREAM_POLL_MS = 5 * 60 * 1000;
+
+function initNotificationSystem() {
+    notificationContainer = document.createElement('div');
+    notificationContainer.id = 'notification-container';
+    notificationContainer.style.position = 'fixed';
+    notificationContainer.style.top = '20px';
+    notificationContainer.style.right = '20px';
+    notificationContainer.style.zIndex = '10000';
+    notificationContainer.style.maxWidth = '400px';
+    document.body.appendChild(notificationContainer);
+
+    loadNotifications();
+    connectNotificationStream();
+    setInterval(() => {
+        if (!notificationStreamConnected || Date.now() - notificationsLastLoaded > NOTIFICATIONS_STREAM_POLL_MS) {
+            loadNotifications();
+        }
+    }, 30000);
+    // Dynamic notifications are generated on the server by the
+    // run_notification_scheduler command; startDynamicNotificationSystem()
+    // is kept for local testing only
+}
+
+function connectNotificationStream() {
+    if (!window.EventSource) return;
+    // EventSource reconnects by itself and sends Last-Event-ID so missed
+    // events are replayed
+    notificationStream = new EventSource(NOTIFICATION_STREAM_URL);
+    notificationStream.addEventListener('open', () => {
+        notificationStreamConnected = true;
+    });
+    notificationStream.addEventListener('error', () => {
+        notificationStreamConnected = false;
+    });
+    notificationStream.addEventListener('notifications', () => loadNotifications());
+    notificationStream.addEventListener('resync', () => loadNotifications());
+}
+
+function showNotificationsError(message) {
+    if (notificationsErrorBanner) return;
+    notificationsErrorBanner = document.createElement('div');
+    notificationsErrorBanner.style.position = 'fixed';
+    notificationsErrorBanner.style.bottom = '20px';
+    notificationsErrorBanner.style.left = '20px';
+    notificationsErrorBanner.style.background = 'rgba(200,50,50,0.95)';
+    notificationsErrorBanner.style.color = 'white';
+    notificationsErrorBanner.style.padding = '10px 16px';
+    notificationsErrorBanner.style.borderRadius = '8px';
+    notificationsErrorBanner.style.zIndex = '10001';
+    notificationsErrorBanner.style.fontSize = '14px';
+    notificationsErrorBanner.textContent = message;
+    document.body.appendChild(notificationsErrorBanner);
+    setTimeout(() => {
+        if (notificationsErrorBanner && notificationsErrorBanner.parentNode) {
+            notificationsErrorBanner.remove();
+        }
+        notificationsErrorBanner = null;
+    }, 10000);
+}
+
+async function loadNotifications() {
+    const now = Date.now();
+    if (notificationsBackoffUntil && now < notificationsBackoffUntil) {
+        return;
+    }
+
+    try {
+        const controller = new AbortController();
+        const timeout = setTimeout(() => controller.abort(), 8000);
+
+        const headers = {};
+        if (notificationsETag) {
+            headers['If-None-Match'] = notificationsETag;
+        }
+        if (pollToken) {
+            headers['X-Poll-Token'] = pollToken;
+        }
+        const response = await fetch('/api/notifications/', {
+            signal: controller.signal,
+            headers: headers,
+            cache: 'no-store'
+        });
+        clearTimeout(timeout);
+        pollToken = response.headers.get('X-Poll-Token') || pollToken;
+
+        if (response.status === 304) {
+            // Nothing changed since the last poll
+            notificationsLastLoaded = Date.now();
+            notificationsFetchFailures = 0;
+            return;
+        }
+
+        if (!response.ok) {
+            console.warn('Notifications fetch returned non-ok status:', response.status);
+            notificationsFetchFailures += 1;
+            if (notificationsFetchFailures >= NOTIFICATIONS_MAX_FAILURES) {
+                notificationsBackoffUntil = Date.now() + 60000;
+                showNotificationsError('Notification service unreachable — backing off retries.');
+            }
+            return;
+        }
+
+        const data = await response.json();
+        notificationsLastLoaded = Date.now();
+        notificationsETag = response.headers.get('ETag');
+        notificationsFetchFailures = 0;
+        unreadCount = data.unread_count;
+        displayNotifications(data.notifications);
+    } catch (err) {
+        console.warn('Error loading notifications:', err && err.name ? err.name : err);
+        notificationsFetchFailures += 1;
+        if (notificationsFetchFailures >= NOTIFICATIONS_MAX_FAILURES) {
+            notificationsBackoffUntil = Date.now() + 60000;
+            showNotificationsError('Notification service unreachable — backing off retries.');
+        }
+    }
+}
+
+function displayNotifications(notifications) {
+    if (!notificationContainer) return;
+    notificationContainer.innerHTML = '';
+
+    // Pop up unread notifications that arrived since the last load
+    if (seenNotificationIds) {
+        notifications
+            .filter(notification => !notification.is_read && !seenNotificationIds.has(notification.id))
+            .forEach((notification, index) => {
+                setTimeout(() => showNotificationPopup(notification), index * 1000);
+            });
+    } else {
+        seenNotificationIds = new Set();
+    }
+    notifications.forEach(notification => seenNotificationIds.add(notification.id));
+}
+
+function startDynamicNotificationSystem() {
+    NOTIFICATIONS_PER_CYCLE = 1;
+    CYCLE_INTERVAL_MINUTES = 60;
+    const INITIAL_DELAY_SECONDS = 10;
+
+    const CYCLE_INTERVAL_MS = CYCLE_INTERVAL_MINUTES * 60 * 1000;
+    const INITIAL_DELAY_MS = INITIAL_DELAY_SECONDS * 1000;
+
+    setTimeout(() => {
+        generateDynamicNotifications();
+        nextNotificationTime = Date.now() + CYCLE_INTERVAL_MS;
+    }, INITIAL_DELAY_MS);
+
+    notificationInterval = setInterval(() => {
+        generateDynamicNotifications();
+        nextNotificationTime = Date.now() + CYCLE_INTERVAL_MS;
+    }, CYCLE_INTERVAL_MS);
+
+    console.log(`Notification System Started:`);
+    console.log(`- ${NOTIFICATIONS_PER_CYCLE} notifications every ${CYCLE_INTERVAL_MINUTES} minutes`);
+    console.log(`- ${(NOTIFICATIONS_PER_CYCLE * 60 / CYCLE_INTERVAL_MINUTES).toFixed(1)} notifications per hour`);
+}
+
+function generateDynamicNotifications() {
+    console.log(`Generating ${NOTIFICATIONS_PER_CYCLE} notification(s)...`);
+
+    fetch(GENERATE_NOTIFICATIONS_URL, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            count: NOTIFICATIONS_PER_CYCLE
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            data.notifications.forEach((notification, index) => {
+                setTimeout(() => {
+                    showNotificationPopup(notification);
+                }, index * 1000);
+            });
+        } else {
+            console.error('Error generating dynamic notifications:', data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error generating dynamic notifications:', error);
+    });
+}
+
+function showNotificationPopup(notification) {
+    if (notification.id && notification.id.startsWith('legacy-')) {
+        return;
+    }
+
+    const popup = document.createElement('div');
+    popup.className = 'notification-popup';
+    popup.setAttribute('data-notification-id', notification.id);
+    popup.style.background = `linear-gradient(135deg, ${getNotificationColor(notification.type)}, ${getNotificationColor(notification.type)}cc)`;
+    popup.style.color = '#fff';
+    popup.style.padding = '15px 20px';
+    popup.style.borderRadius = '10px';
+    popup.style.marginBottom = '10px';
+    popup.style.boxShadow = '0 5px 20px rgba(0, 0, 0, 0.3)';
+    popup.style.animation = 'slideInRight 0.5s ease';
+    popup.style.cursor = 'pointer';
+    popup.style.position = 'relative';
+
+    popup.innerHTML = `
+        <div style="display: flex; align-items: flex-start; gap: 10px;">
+            <div style="font-size: 20px;">${getNotificationIcon(notification.type)}</div>
+            <div style="flex: 1;">
+                <div style="font-weight: bold; margin-bottom: 5px;">${notification.title}</div>
+                <div style="font-size: 14px; opacity: 0.9;">${notification.message}</div>
+                <div style="font-size: 12px; opacity: 0.7; margin-top: 5px;">
+                    ${new Date(notification.created_at).toLocaleTimeString()}
+                </div>
+            </div>
+            <button onclick="closeNotificationPopup('${notification.id}')" style="background: none; border: none; color: white; font-size: 16px; cursor: pointer; padding: 5px;">✕</button>
+        </div>
+    `;
+
+    popup.addEventListener('click', (e) => {
+        if (e.target.tagName === 'BUTTON') return;
+        showNotificationDetails(notification);
+    });
+
+    notificationContainer.appendChild(popup);
+
+    setTimeout(() => {
+        if (popup.parentNode) {
+            popup.style.animation = 'slideOutRight 0.5s ease';
+            setTimeout(() => popup.remove(), 500);
+        }
+    }, 5000);
+}
+
+function getNotificationColor(type) {
+    const colors = {
+        info: '#3a86ff',
+        success: '#06ffa5',
+        warning: '#ffbe0b',
+        error: '#ff006e',
+        training: '#8b5cf6',
+        prediction: '#06b6d4',
+        system: '#6b7280'
+    };
+    return colors[type] || colors.info;
+}
+
+function getNotificationIcon(type) {
+    const icons = {
+        info: 'ℹ️',
+        success: '✅',
+        warning: '⚠️',
+        error: '❌',
+        training: '🤖',
+        prediction: '🧠',
+        system: '⚙️'
+    };
+    return icons[type] || icons.info;
+}
+
+function markNotificationAsRead(notificationId) {
+    if (notificationId.startsWith('legacy-') || !notificationId.includes('-')) {
+        console.log('Skipping legacy notification:', notificationId);
+        return;
+    }
+
+    fetch(`/notifications/${notificationId}/read/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            loadNotifications();
+        }
+    })
+    .catch(error => console.error('Error marking notification as read:', error));
+}
+
+function closeNotificationPopup(notificationId) {
+    const popup = document.querySelector(`[data-notification-id="${notificationId}"]`);
+    if (popup) {
+        popup.style.animation = 'slideOutRight 0.5s ease';
+        setTimeout(() => popup.remove(), 500);
+    }
+}
+
+function showNotificationDetails(notification) {
+    const modal = document.createElement('div');
+    modal.id = 'notification-modal';
+    modal.style.position = 'fixed';
+    modal.style.top = '0';
+    modal.style.left = '0';
+    modal.style.width = '100%';
+    modal.style.height = '100%';
+    modal.style.backgroundColor = 'rgba(0, 0, 0, 0.8)';
+    modal.style.zIndex = '20000';
+    modal.style.display = 'flex';
+    modal.style.alignItems = 'center';
+    modal.style.justifyContent = 'center';
+    modal.style.cursor = 'pointer';
+    modal.style.animation = 'fadeIn 0.3s ease';
+
+    const modalContent = document.createElement('div');
+    modalContent.style.backgroundColor = '#1a1a1a';
+    modalContent.style.borderRadius = '15px';
+    modalContent.style.padding = '30px';
+    modalContent.style.maxWidth = '600px';
+    modalContent.style.width = '90%';
+    modalContent.style.maxHeight = '80vh';
+    modalContent.style.overflowY = 'auto';
+    modalContent.style.cursor = 'default';
+    modalContent.style.border = '2px solid #333';
+    modalContent.style.boxShadow = '0 20px 60px rgba(0, 0, 0, 0.5)';
+    modalContent.style.animation = 'slideInUp 0.3s ease';
+
+    const priorityColor = getNotificationColor(notification.type);
+    const icon = getNotificationIcon(notification.type);
+    const isDynamic = notification.metadata && notification.metadata.isDynamic;
+
+    if (notification.id && notification.id.startsWith('legacy-')) {
+        closeNotificationModal();
+        return;
+    }
+
+    modalContent.innerHTML = `
+        <div style="display: flex; align-items: center; margin-bottom: 20px;">
+            <div style="font-size: 32px; margin-right: 15px;">${icon}</div>
+            <div style="flex: 1;">
+                <h2 style="margin: 0; color: #fff; font-size: 24px;">${notification.title}</h2>
+                <div style="display: flex; gap: 10px; margin-top: 5px; flex-wrap: wrap;">
+                    <span style="background: ${priorityColor}; color: white; padding: 4px 8px; border-radius: 12px; font-size: 12px; text-transform: uppercase;">
+                        ${notification.priority}
+                    </span>
+                    <span style="background: rgba(255, 255, 255, 0.1); color: #ccc; padding: 4px 8px; border-radius: 12px; font-size: 12px; text-transform: uppercase;">
+                        ${notification.type}
+                    </span>
+                    ${isDynamic ? '<span style="background: #06ffa5; color: #000; padding: 4px 8px; border-radius: 12px; font-size: 12px; text-transform: uppercase;">Dynamic</span>' : ''}
+                </div>
+            </div>
+        </div>
+
+        <div style="margin-bottom: 20px;">
+            <h4 style="color: #fff; margin-bottom: 10px;">Message</h4>
+            <p style="color: #ccc; line-height: 1.6; margin: 0; background: rgba(255, 255, 255, 0.05); padding: 15px; border-radius: 8px;">${notification.message}</p>
+        </div>
+
+        ${notification.model_name ? `
+            <div style="margin-bottom: 20px;">
+                <h4 style="color: #fff; margin-bottom: 10px;">Model Information</h4>
+                <div style="background: rgba(255, 255, 255, 0.05); padding: 15px; border-radius: 8px;">
+                    <p style="color: #ccc; margin: 0;"><strong>Model:</strong> ${notification.model_name}</p>
+                </div>
+            </div>
+        ` : ''}
+
+        <div style="margin-bottom: 20px;">
+            <h4 style="color: #fff; margin-bottom: 10px;">Details</h4>
+            <div style="background: rgba(255, 255, 255, 0.05); padding: 15px; border-radius: 8px;">
+                <p style="color: #ccc; margin: 5px 0;"><strong>Created:</strong> ${new Date(notification.created_at).toLocaleString()}</p>
+                <p style="color: #ccc; margin: 5px 0;"><strong>Type:</strong> ${notification.type}</p>
+                <p style="color: #ccc; margin: 5px 0;"><strong>Priority:</strong> ${notification.priority}</p>
+                ${isDynamic ? '<p style="color: #06ffa5; margin: 5px 0;"><strong>Status:</strong> Auto-generated</p>' : ''}
+                ${notification.metadata && Object.keys(notification.metadata).length > 0 ? `
+                    <p style="color: #ccc; margin: 5px 0;"><strong>Metadata:</strong></p>
+                    <pre style="color: #ccc; font-size: 12px; background: rgba(0, 0, 0, 0.3); padding: 10px; border-radius: 4px; overflow-x: auto;">${JSON.stringify(notification.metadata, null, 2)}</pre>
+                ` : ''}
+            </div>
+        </div>
+
+        ${notification.action_url && notification.action_text ? `
+            <div style="margin-bottom: 20px;">
+                <a href="${notification.action_url}" style="
+                    display: inline-block;
+                    background: ${priorityColor};
+                    color: white;
+                    padding: 12px 24px;
+                    border-radius: 8px;
+                    text-decoration: none;
+                    font-weight: bold;
+                    transition: all 0.3s ease;
+                " onmouseover="this.style.transform='scale(1.05)'" onmouseout="this.style.transform='scale(1)'">
+                    ${notification.action_text}
+                </a>
+            </div>
+        ` : ''}
+
+        <div style="text-align: right; display: flex; gap: 10px; justify-content: flex-end;">
+            ${!isDynamic ? `
+                <button onclick="markNotificationAsRead('${notification.id}')" style="
+                    background: #007bff;
+                    color: white;
+                    border: none;
+                    padding: 10px 20px;
+                    border-radius: 8px;
+                    cursor: pointer;
+                    font-size: 14px;
+                ">Mark as Read</button>
+            ` : ''}
+            <button onclick="closeNotificationModal()" style="
+                background: #333;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 8px;
+                cursor: pointer;
+                font-size: 14px;
+            ">Close</button>
+        </div>
+    `;
+
+    modal.appendChild(modalContent);
+    document.body.appendChild(modal);
+
+    modal.addEventListener('click', (e) => {
+        if (e.target === modal) {
+            closeNotificationModal();
+        }
+    });
+
+    window.currentNotificationModal = modal;
+}
+
+function closeNotificationModal() {
+    if (window.currentNotificationModal) {
+        window.currentNotificationModal.style.animation = 'fadeOut 0.3s ease';
+        setTimeout(() => {
+            window.currentNotificationModal.remove();
+            window.currentNotificationModal = null;
+        }, 300);
+    }
+}
+
+// Add slide animations
+const slideStyle = document.createElement('style');
+slideStyle.textContent = `
+    @keyframes slideInRight {
+        from {
+            transform: translateX(400px);
+            opacity: 0;
+        }
+        to {
+            transform: translateX(0);
+            opacity: 1;
+        }
+    }
+    @keyframes slideOutRight {
+        from {
+            transform: translateX(0);
+            opacity: 1;
+        }
+        to {
+            transform: translateX(400px);
+            opacity: 0;
+        }
+    }
+    @keyframes fadeIn {
+        from {
+            opacity: 0;
+        }
+        to {
+            opacity: 1;
+        }
+    }
+    @keyframes fadeOut {
+        from {
+            opacity: 1;
+        }
+        to {
+            opacity: 0;
+        }
+    }
+    @keyframes slideInUp {
+        from {
+            opacity: 0;
+        }
+        to {
+            opacity: 1;
+        }
+    }
+`;
+document.head.appendChild(slideStyle);
+
+// Initialize notification system
+initNotificationSystem();
+
+// Global functions
+function updateNotificationFrequency(notificationsPerCycle, cycleIntervalMinutes) {
+    if (notificationInterval) {
+        clearInterval(notificationInterval);
+    }
+
+    NOTIFICATIONS_PER_CYCLE = notificationsPerCycle;
+    CYCLE_INTERVAL_MINUTES = cycleIntervalMinutes;
+
+    const CYCLE_INTERVAL_MS = cycleIntervalMinutes * 60 * 1000;
+
+    notificationInterval = setInterval(() => {
+        generateDynamicNotifications();
+        nextNotificationTime = Date.now() + CYCLE_INTERVAL_MS;
+    }, CYCLE_INTERVAL_MS);
+
+    console.log(`Notification frequency updated:`);
+    console.log(`- ${notificationsPerCycle} notifications every ${cycleIntervalMinutes} minutes`);
+    console.log(`- ${(notificationsPerCycle * 60 / cycleIntervalMinutes).toFixed(1)} notifications per hour`);
+}
+
+function createTestNotification() {
+    generateDynamicNotifications();
+}
+
+window.generateDynamicNotifications = generateDynamicNotifications;
+window.updateNotificationFrequency = updateNotificationFrequency;
+window.createTestNotification = createTestNotification;
+
+// Performance metrics tracker
+const metrics = {
+    loadTime: performance.now(),
+    interactions: 0,
+    mostUsedService: null
+};
+
+cards.forEach(card => {
+    card.addEventListener('click', () => {
+        metrics.interactions++;
+        const service = card.getAttribute('data-service');
+        console.log('Metrics:', { ...metrics, lastService: service });
+    });
+});
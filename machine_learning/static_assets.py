@@ -0,0 +1,151 @@
+"""
+Hashed, precompressed static files and a view that serves them
+
+``CompressedManifestStaticFilesStorage`` is ``ManifestStaticFilesStorage``
+(file names carry a hash of their content, e.g. ``js/base.3f2a9c1d0b7e.js``)
+that also writes ``.gz`` and, when the optional ``brotli`` package is
+installed, ``.br`` copies of text files during ``collectstatic``.
+
+Before ``collectstatic`` has run (a fresh checkout, the test runner, which
+turns ``DEBUG`` off) there is no manifest; templates then link the
+unhashed names instead of failing.
+
+``serve`` answers ``STATIC_URL`` requests from ``STATIC_ROOT``, picking
+the best precompressed variant the client accepts. Hashed names never
+change content, so they are cached for a year. Putting a web server or CDN
+in front of ``STATIC_ROOT`` with the same rules works just as well.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import views as staticfiles_views
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml')
+MIN_COMPRESS_SIZE = 256
+# ManifestStaticFilesStorage inserts the first 12 hex digits of the MD5
+_hashed_name = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+
+def encodings():
+    """Precompressed variants written, best first, as ``(encoding, suffix)``"""
+    available = [('gzip', '.gz')]
+    if brotli is not None:
+        available.insert(0, ('br', '.br'))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Not collected yet: nothing to map the name to
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Unhashed originals are compressed too; DEBUG pages link to them
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                for compressed in self.compress(name):
+                    yield name, compressed, True
+
+    def compress(self, name):
+        """Write the compressed variants of ``name`` that make it smaller"""
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+
+        written = []
+        for encoding, suffix in encodings():
+            if encoding == 'br':
+                data = brotli.compress(content, mode=brotli.MODE_TEXT)
+            else:
+                # mtime=0 keeps the output identical between runs
+                data = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(data) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            written.append(self._save(name + suffix, ContentFile(data)))
+        return written
+
+
+def accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve a collected static file, precompressed when the client allows it
+
+    With ``DEBUG`` on, files that have not been collected yet are served
+    from the app directories instead, like ``runserver`` does.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path) if settings.STATIC_ROOT else None
+    except SuspiciousFileOperation:  # path escapes STATIC_ROOT
+        raise Http404('Static file not found')
+    if fullpath is None or not os.path.isfile(fullpath):
+        if settings.DEBUG:
+            return staticfiles_views.serve(request, path)
+        raise Http404('Static file not found')
+
+    stat = os.stat(fullpath)
+    cache_control = IMMUTABLE_CACHE_CONTROL if _hashed_name.search(path) else DEFAULT_CACHE_CONTROL
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = accepted_encodings(request)
+    chosen, encoding = fullpath, None
+    for candidate_encoding, suffix in encodings():
+        if candidate_encoding in accepted and os.path.isfile(fullpath + suffix):
+            chosen, encoding = fullpath + suffix, candidate_encoding
+            break
+
+    response = FileResponse(open(chosen, 'rb'), content_type=content_type or 'application/octet-stream')
+    # FileResponse would otherwise describe the .gz/.br file itself
+    response.headers.pop('Content-Disposition', None)
+    response['Content-Length'] = os.path.getsize(chosen)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if path.endswith(COMPRESSIBLE_EXTENSIONS):
+        response['Vary'] = 'Accept-Encoding'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,39 @@
+"""
+``{% profile_picture user 120 class="avatar" %}``: a user's profile image
+at 120 CSS pixels, from resized variants when they exist
+
+See machine_learning/profile_images.py.
+"""
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from .. import profile_images
+
+register = template.Library()
+
+
+@register.simple_tag
+def profile_picture(user, size, **attrs):
+    """
+    ``<picture>`` with a WebP and a JPEG ``srcset``, or a plain ``<img>`` of
+    the original while the variants are not written yet
+
+    Extra keyword arguments become attributes of the ``<img>``.
+    """
+    name = user.profile_image.name
+    attrs.setdefault('alt', '')
+    attrs.update(width=size, height=size)
+    if not profile_images.is_processed(name):
+        return format_html('<img src="{}"{}>', user.profile_image.url, flatatt(attrs))
+
+    srcsets = profile_images.srcsets(name)
+    sizes = f'{size}px'
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((content_type, srcset, sizes) for content_type, srcset in srcsets[:-1]),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        sources, profile_images.fallback_url(name, size), srcsets[-1][1], sizes, flatatt(attrs),
+    )
@@ -1,7 +1,1120 @@
-from django.test import TestCase
+"""
+Run with ``python manage.py test machine_learning --settings=django_ml.test_settings``
+"""
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models import Q, QuerySet
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.http import Http404
+from django.template import Context, Template
+from django.templatetags.static import static
 from django.urls import path 
+from django.utils import timezone
+from PIL import Image
+
+from . import static_assets
+from . import (
+    load_testing, metrics, models, notification_templates, partitions, poll_tokens, profile_images, routers,
+    seeding, serializers, service_cards, throttling,
+)
+from .admin import NotificationTemplateAdmin
+from .global_notifications import GlobalNotificationCache
+from .models import Notification, NotificationCounter, NotificationReceipt, NotificationTemplate, ServiceCard
+from .notification_ingest import IngestBuffer
+from .notification_stream import ChangeLogPoller
+from .notification_utils import (
+    cleanup_expired_notifications, create_notification, create_notifications_bulk, mark_notifications_read
+)
 from .views import index
 
 urlpatterns = [
     path('', index, name='index'),
-]
\ No newline at end of file
+]
+
+
+class StaticAssetTests(TestCase):
+    def test_pages_render_before_collectstatic(self):
+        # The test runner turns DEBUG off; an empty STATIC_ROOT (which also
+        # resets the storage and its manifest) means nothing was collected
+        user = User.objects.create_user('reader', password='pw')
+        self.client.force_login(user)
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            self.assertEqual(self.client.get('/notifications/').status_code, 200)
+            self.assertEqual(static('css/layout.master.css'), '/static/css/layout.master.css')
+
+    def test_serves_precompressed_variant(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            content = b'body { color: red; }\n' * 50
+            with open(f'{root}/site.0123456789ab.css', 'wb') as f:
+                f.write(content)
+            with open(f'{root}/site.0123456789ab.css.gz', 'wb') as f:
+                f.write(gzip.compress(content))
+
+            request = RequestFactory().get('/static/site.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, br')
+            response = static_assets.serve(request, 'site.0123456789ab.css')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], static_assets.IMMUTABLE_CACHE_CONTROL)
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), content)
+            response.close()
+
+    def test_path_outside_static_root_is_not_found(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, DEBUG=False):
+            request = RequestFactory().get('/static/../settings.py')
+            with self.assertRaises(Http404):
+                static_assets.serve(request, '../../django_ml/settings.py')
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+
+    def assertCountersMatchTable(self):
+        for user_id in (self.user.pk, self.other.pk, None):
+            counter = NotificationCounter.objects.get(user_id=user_id)
+            counts = NotificationCounter.objects.compute_counts(user_id)
+            self.assertEqual(
+                (counter.unread_count, counter.total_count, counter.global_read_count),
+                (counts['unread_count'], counts['total_count'], counts.get('global_read_count', 0)),
+                f'counter of {user_id}',
+            )
+
+    def test_counters_follow_create_read_delete_and_expire(self):
+        NotificationCounter.objects.for_user(self.user)
+        NotificationCounter.objects.for_user(self.other)
+        own = [create_notification(f'n{i}', 'm', user=self.user) for i in range(3)]
+        create_notification('theirs', 'm', user=self.other)
+        announcement = create_notification('all', 'm', is_global=True)
+        self.assertCountersMatchTable()
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.user), (4, 4))
+
+        own[0].mark_as_read(self.user)
+        announcement.mark_as_read(self.user)
+        self.assertCountersMatchTable()
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.user), (2, 4))
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.other), (2, 2))
+
+        own[1].delete()
+        self.assertCountersMatchTable()
+
+        Notification.objects.filter(pk=own[2].pk).update(expiry_date=timezone.now() - timedelta(days=1))
+        self.assertEqual(cleanup_expired_notifications(), 1)
+        self.assertCountersMatchTable()
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.user), (0, 2))
+
+        mark_notifications_read(self.other)
+        self.assertCountersMatchTable()
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.other), (0, 2))
+
+    def test_every_change_moves_the_version(self):
+        user_counter, _ = NotificationCounter.objects.for_user(self.user)
+        notification = create_notification('n', 'm', user=self.user)
+        notification.title = 'edited'
+        notification.save()
+        user_counter.refresh_from_db()
+        self.assertEqual(user_counter.version, 2)
+
+
+class ConditionalPollTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        create_notification('first', 'm', user=self.user)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get('/api/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_change_gives_a_new_etag(self):
+        etag = self.client.get('/api/notifications/')['ETag']
+        create_notification('second', 'm', user=self.user)
+
+        response = self.client.get('/api/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['notifications'][0]['title'], 'second')
+
+
+class NotificationStreamTests(TestCase):
+    class RecordingHub:
+        def __init__(self):
+            self.owners = []
+
+        def handle_change(self, sender, owners, **kwargs):
+            self.owners.append(owners)
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_wsgi_requests_are_told_to_poll(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_poller_publishes_logged_changes_once(self):
+        hub = self.RecordingHub()
+        poller = ChangeLogPoller(hub)
+        poller.poll()
+
+        create_notification('own', 'm', user=self.user)
+        create_notification('all', 'm', is_global=True)
+        self.assertEqual(poller.poll(), {self.user.pk, None})
+        # Still unsettled, so read again, but not published twice
+        self.assertEqual(poller.poll(), set())
+
+    @override_settings(NOTIFICATIONS_SYNC_SETTLE_SECONDS=0)
+    def test_poller_moves_past_settled_changes(self):
+        poller = ChangeLogPoller(self.RecordingHub())
+        poller.poll()
+        create_notification('own', 'm', user=self.user)
+        poller.poll()
+        self.assertGreater(poller.cursor, 0)
+        self.assertEqual(poller._published, set())
+
+    def test_poller_runs_only_while_streams_are_open(self):
+        hub = self.RecordingHub()
+        hub.connection_count = mock.Mock(return_value=1)
+        poller = ChangeLogPoller(hub, interval=0.01)
+        with mock.patch.object(poller, 'poll') as poll:
+            poller.start()
+            thread = poller._thread
+            deadline = time.monotonic() + 5
+            while not poll.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(poll.called)
+
+            hub.connection_count.return_value = 0
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+            self.assertIsNone(poller._thread)
+
+            # The next stream starts it again
+            hub.connection_count.return_value = 1
+            poller.start()
+            restarted = poller._thread
+            self.assertIsNot(restarted, thread)
+            hub.connection_count.return_value = 0
+            restarted.join(timeout=5)
+
+
+@override_settings(NOTIFICATIONS_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        self.kept = create_notification('kept', 'm', user=self.user)
+        self.doomed = create_notification('doomed', 'm', user=self.user)
+
+    def sync(self, cursor):
+        response = self.client.get('/api/notifications/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_delta_carries_new_read_and_removed_notifications(self):
+        cursor = self.client.get('/api/notifications/').json()['cursor']
+
+        added = create_notification('added', 'm', user=self.user)
+        self.kept.mark_as_read(self.user)
+        doomed_id = self.doomed.pk
+        self.doomed.delete()
+        create_notification('not mine', 'm', user=User.objects.create_user('bob'))
+
+        delta = self.sync(cursor)
+        self.assertEqual([n['id'] for n in delta['notifications']], [str(added.pk)])
+        self.assertEqual(delta['read_state'], [{'id': str(self.kept.pk), 'is_read': True}])
+        self.assertEqual(delta['removed'], [str(doomed_id)])
+        self.assertEqual(delta['unread_count'], 1)
+
+        # Nothing new since the returned cursor
+        again = self.sync(delta['cursor'])
+        self.assertEqual((again['notifications'], again['read_state'], again['removed']), ([], [], []))
+
+    @override_settings(NOTIFICATIONS_SYNC_SETTLE_SECONDS=3600)
+    def test_cursor_stays_behind_unsettled_changes(self):
+        cursor = self.client.get('/api/notifications/').json()['cursor']
+        added = create_notification('added', 'm', user=self.user)
+        delta = self.sync(cursor)
+        self.assertIn(str(added.pk), [n['id'] for n in delta['notifications']])
+        self.assertEqual(delta['cursor'], cursor)
+
+    def test_cursor_ahead_of_the_log_starts_over(self):
+        current = self.client.get('/api/notifications/').json()['cursor']
+        snapshot = self.sync(int(current) + 1000)
+        self.assertTrue(snapshot['reset'])
+        self.assertEqual(snapshot['cursor'], current)
+        self.assertEqual({n['title'] for n in snapshot['notifications']}, {'kept', 'doomed'})
+        self.assertNotIn('reset', self.sync(current))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        for i in range(12):
+            create_notification(f'n{i}', 'm', user=self.user)
+
+    @staticmethod
+    def forge(*parts):
+        return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode().rstrip('=')
+
+    def test_pages_do_not_overlap(self):
+        first = self.client.get('/api/notifications/').json()
+        second = self.client.get('/api/notifications/', {'cursor': first['next_cursor']}).json()
+        ids = [n['id'] for n in first['notifications'] + second['notifications']]
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_tampered_cursor_is_rejected(self):
+        tampered = [
+            'not base64 !',
+            self.forge('next', '2026-01-01T00:00:00+00:00', 'zzz'),
+            self.forge('next', '2026-01-01', None),
+            self.forge('next', '2026-01-01T00:00:00', '4f0c8c4e-2f57-4a55-9d3e-3a1d1f3b9a10'),
+            self.forge('next', '2026-01-01T00:00:00+00:00', 7),
+            self.forge('sideways', '2026-01-01T00:00:00+00:00', '4f0c8c4e-2f57-4a55-9d3e-3a1d1f3b9a10'),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/notifications/', {'cursor': cursor}).status_code, 400)
+                # The page starts over from the first page instead
+                self.assertEqual(self.client.get('/notifications/', {'cursor': cursor}).status_code, 200)
+
+
+class ReadReceiptTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        self.announcement = create_notification('all', 'm', is_global=True)
+
+    def read_state(self, user):
+        return Notification.objects.with_read_state(user).values_list('user_has_read', flat=True).get(
+            pk=self.announcement.pk
+        )
+
+    def test_reading_a_global_notification_is_per_user(self):
+        self.announcement.mark_as_read(self.alice)
+        self.assertTrue(self.read_state(self.alice))
+        self.assertFalse(self.read_state(self.bob))
+
+        self.announcement.refresh_from_db()
+        self.assertFalse(self.announcement.is_read)
+        self.assertFalse(Notification.objects.unread_for(self.alice).filter(pk=self.announcement.pk).exists())
+        self.assertTrue(Notification.objects.unread_for(self.bob).filter(pk=self.announcement.pk).exists())
+
+    def test_mark_all_read_and_unread(self):
+        own = create_notification('own', 'm', user=self.alice)
+        self.assertEqual(Notification.objects.mark_read_for(self.alice), 2)
+        self.assertEqual(Notification.objects.mark_read_for(self.alice), 0)
+        self.assertEqual(NotificationReceipt.objects.filter(user=self.alice).count(), 1)
+        own.refresh_from_db()
+        self.assertTrue(own.is_read)
+
+        self.assertEqual(Notification.objects.mark_unread_for(self.alice), 2)
+        self.assertFalse(self.read_state(self.alice))
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.alice), (2, 2))
+
+
+class ExplainCommandTests(TestCase):
+    def test_mysql_plans_with_scans_or_sorts_fail(self):
+        from .management.commands.explain_notification_queries import Command
+
+        plan = {'query_block': {'ordering_operation': {
+            'using_filesort': True,
+            'table': {'table_name': 'machine_learning_notification', 'access_type': 'ALL'},
+        }}}
+        self.assertEqual(
+            Command().mysql_issues(plan), ['filesort', 'full scan of machine_learning_notification']
+        )
+
+    def test_runs_on_sqlite(self):
+        user = User.objects.create_user('alice')
+        create_notification('own', 'm', user=user)
+        create_notification('all', 'm', is_global=True)
+        out = io.StringIO()
+        call_command('explain_notification_queries', user='alice', stdout=out)
+        self.assertIn('queries', out.getvalue().splitlines()[-1])
+
+
+class BulkCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_invalid_items_do_not_stop_valid_ones(self):
+        results = create_notifications_bulk([
+            {'title': 'ok', 'message': 'm'},
+            {'message': 'no title'},
+            {'title': 'nobody', 'message': 'm', 'user_id': 999999},
+            {'title': 'all', 'message': 'm', 'is_global': True},
+            {'title': 'typo', 'message': 'm', 'colour': 'red'},
+        ], user=self.user, chunk_size=2)
+
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual([('id' in result) for result in results], [True, False, False, True, False])
+        self.assertIn('title', results[1]['errors'])
+        self.assertEqual(results[2]['errors'], {'user': ['User does not exist']})
+        self.assertEqual(results[4]['errors'], {'colour': ['Unknown field']})
+        self.assertEqual(
+            set(Notification.objects.values_list('title', flat=True)), {'ok', 'all'}
+        )
+        counter = NotificationCounter.objects.get(user=self.user)
+        self.assertEqual((counter.unread_count, counter.total_count), (1, 1))
+
+    def test_api_reports_results_and_limits_the_size(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/notifications/bulk/', {
+            'notifications': [{'title': 'a', 'message': 'm'}, {'title': '', 'message': 'm'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['created'], response.json()['failed']), (1, 1))
+
+        with override_settings(NOTIFICATIONS_BULK_MAX_ITEMS=1):
+            response = self.client.post('/api/notifications/bulk/', {
+                'notifications': [{'title': 'a', 'message': 'm'}] * 2,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+
+
+class TemplateCacheTests(TestCase):
+    def setUp(self):
+        self.cache = notification_templates.TemplateCache(ttl=300)
+        self.template = NotificationTemplate.objects.create(
+            name='done', title_template='Done', message_template='Finished', notification_type='info'
+        )
+
+    def test_load_overlapping_an_invalidation_is_not_kept(self):
+        compiled_template = notification_templates.CompiledTemplate
+
+        def compile_during_invalidation(template):
+            # A template is saved while the load is still reading
+            self.cache.invalidate()
+            return compiled_template(template)
+
+        with mock.patch.object(notification_templates, 'CompiledTemplate', compile_during_invalidation):
+            self.assertEqual(len(self.cache.active()), 1)
+        self.assertIsNone(self.cache._active)
+
+        NotificationTemplate.objects.filter(pk=self.template.pk).update(is_active=False)
+        self.assertEqual(self.cache.active(), [])
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(len(self.cache.active()), 1)
+        NotificationTemplate.objects.filter(pk=self.template.pk).update(is_active=False)
+        self.assertEqual(len(self.cache.active()), 1)
+        self.cache.invalidate()
+        self.assertEqual(self.cache.active(), [])
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        NotificationTemplate.objects.create(
+            name='done', title_template='Done', message_template='Finished', notification_type='info'
+        )
+        NotificationTemplate.objects.create(
+            name='update', title_template='Update', message_template='Still running', notification_type='info'
+        )
+        self.active = User.objects.create_user('alice', last_login=timezone.now())
+        self.idle = User.objects.create_user('bob', last_login=timezone.now() - timedelta(days=90))
+
+    def run_cycle(self, **options):
+        call_command('run_notification_scheduler', once=True, stdout=io.StringIO(), **options)
+
+    def test_only_recent_users_get_notifications_up_to_the_cap(self):
+        for _ in range(3):
+            self.run_cycle(max_per_user=2)
+
+        self.assertEqual(Notification.objects.filter(user=self.active).count(), 2)
+        self.assertFalse(Notification.objects.filter(user=self.idle).exists())
+        notification = Notification.objects.filter(user=self.active).first()
+        self.assertEqual(notification.metadata['generated_by'], 'scheduler')
+
+        self.run_cycle(max_per_user=5, per_cycle=2, active_days=0)
+        self.assertEqual(Notification.objects.filter(user=self.active).count(), 4)
+        self.assertEqual(Notification.objects.filter(user=self.idle).count(), 2)
+
+
+class IngestBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        # Written on the test's thread, inside its transaction
+        patcher = mock.patch.object(IngestBuffer, '_ensure_writer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def notification(self, title):
+        return Notification(title=title, message='m', user=self.user)
+
+    def test_full_queue_rejects_and_shutdown_writes_the_rest(self):
+        buffer = IngestBuffer(max_size=2, batch_size=10, flush_interval=0.01)
+        self.assertTrue(buffer.submit(self.notification('a')))
+        self.assertTrue(buffer.submit(self.notification('b')))
+        self.assertFalse(buffer.submit(self.notification('c')))
+        self.assertEqual(buffer.stats()['queue_depth'], 2)
+
+        buffer.shutdown()
+        self.assertFalse(buffer.submit(self.notification('d')))
+        self.assertEqual(set(Notification.objects.values_list('title', flat=True)), {'a', 'b'})
+        stats = buffer.stats()
+        self.assertEqual(
+            (stats['accepted'], stats['rejected'], stats['written'], stats['flushes'], stats['queue_depth']),
+            (2, 1, 2, 1, 0),
+        )
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.user), (2, 2))
+
+    def test_a_bad_row_does_not_drop_its_batch(self):
+        existing = create_notification('existing', 'm', user=self.user)
+        buffer = IngestBuffer(max_size=10, batch_size=10, flush_interval=0.01)
+        buffer.submit(self.notification('good'))
+        buffer.submit(Notification(id=existing.id, title='duplicate', message='m', user=self.user))
+        with self.assertLogs('machine_learning.notification_ingest', 'WARNING'):
+            buffer.shutdown()
+        self.assertEqual(set(Notification.objects.values_list('title', flat=True)), {'existing', 'good'})
+        self.assertEqual((buffer.stats()['written'], buffer.stats()['failed']), (1, 1))
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.now = timezone.now()
+        self.start = partitions.retention_start(self.now)
+        self.old_month = partitions.add_months(self.start, -2)
+        models._kept_since_cache.clear()
+        self.addCleanup(models._kept_since_cache.clear)
+
+    def old(self, title, **fields):
+        notification = create_notification(title, 'm', user=self.user)
+        fields.setdefault('created_at', self.old_month + timedelta(days=3))
+        Notification.objects.filter(pk=notification.pk).update(**fields)
+        return notification
+
+    def rotation(self):
+        from .management.commands.rotate_notification_partitions import Command
+
+        return Command(stdout=io.StringIO())
+
+    def test_lasting_notifications_outlive_the_window(self):
+        recent = create_notification('recent', 'm', user=self.user)
+        lasting = self.old('lasting', auto_expire=False)
+        not_yet = self.old('not yet', expiry_date=self.now + timedelta(days=1))
+        self.old('expired', expiry_date=self.now - timedelta(days=1))
+        self.old('inactive', auto_expire=False, is_active=False)
+
+        self.assertEqual(
+            set(Notification.objects.retained().values_list('pk', flat=True)),
+            {recent.pk, lasting.pk, not_yet.pk},
+        )
+
+    def test_rotation_keeps_months_with_lasting_notifications(self):
+        command = self.rotation()
+        self.old('lasting', auto_expire=False)
+        self.old('expired', expiry_date=self.now - timedelta(days=1))
+        self.assertEqual(command.lasting_rows(self.old_month, self.now), 1)
+
+        Notification.objects.update(auto_expire=True, expiry_date=self.now - timedelta(days=1))
+        self.assertEqual(command.lasting_rows(self.old_month, self.now), 0)
+
+    def test_release_deactivates_in_batches(self):
+        for i in range(5):
+            self.old(f'expired {i}', expiry_date=self.now - timedelta(days=1))
+        create_notification('recent', 'm', user=self.user)
+
+        self.assertEqual(self.rotation().release(self.old_month, batch_size=2), 5)
+        self.assertEqual(Notification.objects.filter(is_active=True).count(), 1)
+        self.assertEqual(NotificationCounter.objects.badge_counts(self.user), (1, 1))
+
+
+class MetadataColumnTests(TestCase):
+    METADATA = [
+        {},
+        {'isDynamic': True, 'source': 'training', 'confidence': 0.95},
+        {'isDynamic': False, 'source': 'upload', 'confidence': 0.5},
+        {'isDynamic': 'yes', 'status': 'failed', 'confidence': '0.99'},
+        {'isDynamic': None, 'status': 'queued', 'confidence': 1},
+        {'isDynamic': True, 'source': 'x' * 120, 'status': 'failed'},
+        {'source': 'training', 'confidence': 0.9},
+        {'isDynamic': 1, 'source': 42},
+    ]
+
+    def setUp(self):
+        for metadata in self.METADATA:
+            create_notification('n', 'm', is_global=True, metadata=metadata)
+
+    def ids(self, queryset):
+        return set(queryset.values_list('pk', flat=True))
+
+    def test_filter_and_exclude_are_the_plain_json_lookups(self):
+        plain = QuerySet(Notification)
+        cases = [
+            ((), {'metadata__isDynamic': True}),
+            ((~Q(metadata__isDynamic=True),), {}),
+            ((Q(metadata__isDynamic=True) | Q(metadata__source='upload'),), {}),
+            ((), {'metadata__confidence__gte': 0.9}),
+        ]
+        for args, kwargs in cases:
+            with self.subTest(args=args, kwargs=kwargs):
+                self.assertEqual(self.ids(Notification.objects.filter(*args, **kwargs)),
+                                 self.ids(plain.filter(*args, **kwargs)))
+                self.assertEqual(self.ids(Notification.objects.exclude(*args, **kwargs)),
+                                 self.ids(plain.exclude(*args, **kwargs)))
+
+    def test_filter_metadata_matches_the_json_lookups(self):
+        lookups = [
+            {'metadata__isDynamic': True},
+            {'metadata__isDynamic': False},
+            {'metadata__isDynamic__isnull': True},
+            {'metadata__source': 'training'},
+            {'metadata__source__in': ['training', 'upload']},
+            {'metadata__source': 'x' * 120},
+            {'metadata__status': 'failed', 'metadata__isDynamic': True},
+            {'metadata__confidence': 1},
+            {'metadata__confidence__in': [0.5, 0.9]},
+        ]
+        for kwargs in lookups:
+            with self.subTest(kwargs=kwargs):
+                self.assertEqual(self.ids(Notification.objects.filter_metadata(**kwargs)),
+                                 self.ids(Notification.objects.filter(**kwargs)))
+
+    def test_range_lookups_match_numbers_only(self):
+        self.assertEqual(
+            sorted(Notification.objects.filter_metadata(metadata__confidence__gte=0.9)
+                   .values_list('meta_confidence', flat=True)),
+            [0.9, 0.95, 1.0],
+        )
+
+
+class ServiceCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.card = ServiceCard.objects.create(
+            service_key='predict', icon='P', title='Predict', description='Run a model'
+        )
+
+    def test_grid_is_cached_until_a_card_changes(self):
+        html, cards = service_cards.get_grid()
+        self.assertIn('Predict', html)
+        self.assertEqual(cards, [self.card])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(service_cards.get_grid(), (html, None))
+
+        self.card.title = 'Forecast'
+        self.card.save()
+        html, _ = service_cards.get_grid()
+        self.assertIn('Forecast', html)
+
+        self.card.delete()
+        self.assertEqual(service_cards.get_cards(), [])
+
+    def test_load_with_an_old_version_cannot_store_stale_cards(self):
+        version = service_cards.current_version()
+        ServiceCard.objects.create(service_key='analyze', icon='A', title='Analyze', description='d')
+        # A request that read the version before the save stores under the old key
+        service_cards.get_cards(version)
+        self.assertEqual(len(service_cards.get_cards()), 2)
+
+    def test_version_survives_eviction(self):
+        service_cards.get_grid()
+        cache.delete(service_cards.VERSION_KEY)
+        service_cards.invalidate()
+        self.assertEqual(cache.get(service_cards.VERSION_KEY), 2)
+
+
+class SerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.notification = create_notification(
+            'Done', 'Finished', user=self.user, model_name='resnet', metadata={'isDynamic': True}
+        )
+
+    def test_rows_and_instances_give_the_same_output(self):
+        queryset = Notification.objects.with_read_state(self.user).filter(pk=self.notification.pk)
+        from_row = serializers.FEED.output(serializers.FEED.rows(queryset).get())
+        from_instance = serializers.FEED.from_instance(queryset.get())
+        self.assertEqual(from_row, from_instance)
+        self.assertEqual(from_row['type'], 'info')
+        self.assertIs(from_row['is_read'], False)
+        self.assertNotIn('metadata', from_row)
+
+    def test_json_and_orjson_encode_alike(self):
+        data = {'notifications': [serializers.GENERATED.from_instance(self.notification)]}
+        encoded = json.loads(serializers.dumps(data))
+        with mock.patch.object(serializers, 'orjson', None):
+            self.assertEqual(json.loads(serializers.dumps(data)), encoded)
+        self.assertEqual(encoded['notifications'][0]['id'], str(self.notification.pk))
+        self.assertEqual(encoded['notifications'][0]['metadata'], {'isDynamic': True})
+
+
+class MetricsTests(TestCase):
+    def test_idle_process_still_writes_its_samples(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registry = metrics.Registry(directory, flush_interval=0.05)
+            counter = metrics.Counter(registry, 'jobs_total', 'Jobs')
+            counter.inc(3)
+            # Nothing else is recorded; the flusher thread writes it anyway
+            deadline = time.monotonic() + 5
+            while not registry.path.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(json.loads(registry.path.read_text()), [['jobs_total', [], 3]])
+
+    def test_exited_processes_keep_their_counts_but_not_their_gauges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            registry = metrics.Registry(directory)
+            metrics.Counter(registry, 'jobs_total', 'Jobs')
+            metrics.Gauge(registry, 'queue_depth', 'Queued')
+            # Another worker, still running: its lock is held
+            running = metrics.Registry(directory)
+            metrics.Counter(running, 'jobs_total', 'Jobs').inc(2)
+            metrics.Gauge(running, 'queue_depth', 'Queued', function=lambda: 4)
+            running.flush()
+            # Two exited workers, one of them with a pid now in use again
+            for name in (f'metrics-{os.getpid()}-0badf00d', 'metrics-99999999-0badf00d'):
+                (directory / f'{name}.json').write_text(json.dumps([['jobs_total', [], 5], ['queue_depth', [], 9]]))
+                (directory / f'{name}.lock').touch()
+
+            expected = {('jobs_total', ()): 12, ('queue_depth', ()): 4}
+            self.assertEqual(registry.collect(), expected)
+            self.assertEqual(
+                sorted(path.name for path in directory.glob('metrics-*.json')), [running.path.name],
+            )
+            # Folded once, however often it is scraped
+            self.assertEqual(registry.collect(), expected)
+            self.assertNotEqual(registry.path, running.path)
+
+    def test_exposition(self):
+        registry = metrics.Registry()
+        depth = metrics.Gauge(registry, 'queue_depth', 'Queued', function=lambda: 7)
+        latency = metrics.Histogram(registry, 'flush_seconds', 'Flushes', buckets=[0.1, 1])
+        latency.observe(0.5)
+        self.assertEqual(depth.collect(), {('queue_depth', ()): 7})
+        self.assertEqual(registry.exposition().splitlines(), [
+            '# HELP queue_depth Queued',
+            '# TYPE queue_depth gauge',
+            'queue_depth 7',
+            '# HELP flush_seconds Flushes',
+            '# TYPE flush_seconds histogram',
+            'flush_seconds_bucket{le="0.1"} 0',
+            'flush_seconds_bucket{le="1"} 1',
+            'flush_seconds_bucket{le="+Inf"} 1',
+            'flush_seconds_count 1',
+            'flush_seconds_sum 0.5',
+        ])
+
+    def test_ingest_queue_is_exported(self):
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('\nnotification_ingest_queue_depth 0\n', body)
+        self.assertIn('# TYPE notification_ingest_flush_seconds histogram', body)
+
+
+class BenchCommandTests(TestCase):
+    def bench(self, **options):
+        call_command(
+            'bench_notifications', users=2, per_user=5, global_count=2, iterations=2, warmup=0,
+            deep_page=1, stdout=io.StringIO(), stderr=io.StringIO(), **options
+        )
+
+    def test_report_and_regressions_against_a_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = f'{directory}/baseline.json'
+            self.bench(output=baseline)
+            with open(baseline) as f:
+                report = json.load(f)
+            self.assertTrue(report['scenarios'])
+            for result in report['scenarios'].values():
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries'], 0)
+
+            # Same code against itself; timings on a test database are noise
+            self.bench(baseline=baseline, threshold=1000)
+
+            name = next(iter(report['scenarios']))
+            report['scenarios'][name]['queries'] -= 1
+            with open(baseline, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, 'regressions'):
+                self.bench(baseline=baseline, threshold=1000)
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def stage(self, tabs, p95_ms, error_rate=0.0, poll_rps=None):
+        return {'tabs': tabs, 'client': {
+            'p95_ms': p95_ms, 'error_rate': error_rate,
+            'poll_rps': tabs / 30 if poll_rps is None else poll_rps,
+        }}
+
+    def test_metrics_are_added_up_across_labels(self):
+        registry = metrics.Registry()
+        duration = metrics.Histogram(registry, 'http_request_duration_seconds', 'd', ['view'], buckets=[1])
+        duration.observe(0.25, view='a')
+        duration.observe(0.5, view='b')
+        totals = load_testing.parse_metrics(registry.exposition())
+        self.assertEqual(totals['http_request_duration_seconds_count'], 2)
+        self.assertEqual(totals['http_request_duration_seconds_sum'], 0.75)
+        self.assertNotIn('http_request_duration_seconds_bucket', totals)
+
+        before = {'http_request_duration_seconds_count': 10, 'http_request_db_queries_sum': 40}
+        after = {'http_request_duration_seconds_count': 30, 'http_request_db_queries_sum': 100}
+        delta = load_testing.server_delta(before, after, elapsed=10)
+        self.assertEqual((delta['requests'], delta['throughput_rps'], delta['queries_per_request']), (20, 2.0, 3.0))
+
+    def test_first_stage_past_a_limit_is_the_saturation_point(self):
+        results = [self.stage(50, 80), self.stage(100, 120), self.stage(200, 900), self.stage(400, 2000)]
+        saturated = load_testing.find_saturation(results, slo_ms=500, max_error_rate=0.01)
+        self.assertEqual(saturated['tabs'], 200)
+        self.assertIn('p95 900 ms', saturated['reason'])
+
+        results[1]['client']['error_rate'] = 0.05
+        self.assertEqual(load_testing.find_saturation(results, 500, 0.01)['tabs'], 100)
+
+        results = [self.stage(50, 80), self.stage(100, 90, poll_rps=2.0)]
+        self.assertIsNone(load_testing.find_saturation(results, 500, 0.01))
+        self.assertEqual(load_testing.find_saturation(results, 500, 0.01, poll_interval=30)['tabs'], 100)
+
+    def test_stage_summary(self):
+        stats = load_testing.StageStats()
+        for i in range(10):
+            stats.record('poll', 0.01 * (i + 1), ok=i != 9, size=1000)
+        stats.record('page', 0.5, ok=True)
+        summary = stats.summary(elapsed=2)
+        self.assertEqual((summary['requests'], summary['poll_rps'], summary['error_rate']), (11, 5.0, 0.0909))
+        self.assertEqual(summary['by_kind']['poll']['errors'], 1)
+        self.assertEqual(summary['by_kind']['page']['p50_ms'], 500.0)
+
+
+class SeedingTests(TestCase):
+    def test_seeded_templates_render(self):
+        templates = seeding.make_templates(len(seeding.TEMPLATE_PATTERNS), seed=1)
+        for template in templates:
+            compiled = notification_templates.CompiledTemplate(template)
+            with self.subTest(template=template.title_template):
+                self.assertTrue(compiled.is_renderable, compiled.error)
+
+    def test_same_seed_same_rows(self):
+        templates = [
+            (template.title_template, template.message_template, template.notification_type, template.priority)
+            for template in seeding.make_templates(4, seed=1)
+        ]
+        factory = seeding.NotificationFactory(
+            [1, 2, 3], templates, timezone.now(), months=3,
+            global_ratio=0.1, read_ratio=0.5, expired_ratio=0.1,
+        )
+        first = [factory.make(seeding.chunk_rng(7, 'notifications', 0)) for _ in range(3)]
+        again = [factory.make(seeding.chunk_rng(7, 'notifications', 0)) for _ in range(3)]
+        self.assertEqual(first, again)
+        self.assertNotIn('{', first[0]['title'] + first[0]['message'])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The router keeps migrations off the replica; replication brings the schema in production
+        cls.replica_models = [User, *apps.get_app_config('machine_learning').get_models()]
+        with connections['replica'].schema_editor() as editor:
+            for model in cls.replica_models:
+                editor.create_model(model)
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        Notification.objects.create(user=self.user, title='On the primary', message='m')
+        User.objects.using('replica').bulk_create([User(pk=self.user.pk, username='alice')])
+        Notification.objects.using('replica').bulk_create([
+            Notification(user_id=self.user.pk, title='On the replica', message='m'),
+        ])
+
+    def tearDown(self):
+        with connections['replica'].cursor() as cursor:
+            for model in reversed(self.replica_models):
+                cursor.execute(f'DELETE FROM {model._meta.db_table}')
+
+    def titles(self):
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        return [n['title'] for n in response.json()['notifications']]
+
+    def test_get_reads_from_the_replica(self):
+        self.assertEqual(self.titles(), ['On the replica'])
+        # The counter created on that GET is bookkeeping, not a write
+        self.assertNotIn(routers.STICKY_COOKIE, self.client.cookies)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.post('/notifications/mark-all-read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.titles(), ['On the primary'])
+
+    def test_a_write_that_is_rolled_back_does_not_stick(self):
+        state = routers.RequestState()
+        token = routers._request.set(state)
+        try:
+            with transaction.atomic():
+                NotificationTemplate.objects.create(
+                    name='t', title_template='t', message_template='m', notification_type='info',
+                )
+                transaction.set_rollback(True)
+        finally:
+            routers._request.reset(token)
+        self.assertFalse(state.wrote)
+
+
+class PollTokenTests(TestCase):
+    def setUp(self):
+        caches[settings.POLL_TOKEN_CACHE].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+        create_notification('for alice', 'm', user=self.user)
+
+    def poll(self, token):
+        return self.client.get('/api/notifications/', HTTP_X_POLL_TOKEN=token)
+
+    def issued_ago(self, seconds):
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - seconds):
+            return poll_tokens.issue(self.user.pk)
+
+    def test_token_authenticates_without_a_session(self):
+        response = self.poll(poll_tokens.issue(self.user.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notifications'][0]['title'], 'for alice')
+        self.assertNotIn(poll_tokens.HEADER, response)
+
+    def test_tampered_token_is_refused(self):
+        _, issued, signature = poll_tokens.issue(self.user.pk).split(':')
+        self.assertIsNone(poll_tokens.verify(f'{self.other.pk}:{issued}:{signature}'))
+        self.assertIsNone(poll_tokens.verify('garbage'))
+        response = self.poll(f'{self.other.pk}:{issued}:{signature}')
+        self.assertEqual(response.status_code, 302)
+
+    def test_tokens_expire_and_rotate(self):
+        max_age = settings.POLL_TOKEN_MAX_AGE
+        self.assertIsNone(poll_tokens.verify(self.issued_ago(max_age + 10)))
+
+        response = self.poll(self.issued_ago(max_age * 0.75))
+        self.assertEqual(response.status_code, 200)
+        fresh = response[poll_tokens.HEADER]
+        self.assertEqual(poll_tokens.verify(fresh)[0], self.user.pk)
+
+        # A session without a token gets one as well
+        self.client.force_login(self.user)
+        self.assertIn(poll_tokens.HEADER, self.client.get('/api/notifications/'))
+
+    def test_logout_revokes_issued_tokens(self):
+        token = self.issued_ago(5)
+        self.client.force_login(self.user)
+        self.client.get('/accounts/logout/')
+        self.assertIsNone(poll_tokens.verify(token))
+        self.assertEqual(self.poll(token).status_code, 302)
+        # Other users' tokens are unaffected
+        self.assertIsNotNone(poll_tokens.verify(poll_tokens.issue(self.other.pk)))
+
+    def test_inactive_or_deleted_users_are_refused(self):
+        token = self.issued_ago(5)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(poll_tokens.verify(token))
+        # Refused even if the revocation is lost, e.g. evicted from the cache
+        caches[settings.POLL_TOKEN_CACHE].clear()
+        self.assertEqual(self.poll(token).status_code, 401)
+
+        token = poll_tokens.issue(self.other.pk)
+        self.other.delete()
+        self.assertIsNone(poll_tokens.verify(token))
+        caches[settings.POLL_TOKEN_CACHE].clear()
+        self.assertEqual(self.poll(token).status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        token = self.issued_ago(5)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertIsNotNone(poll_tokens.verify(token))
+
+        self.user.set_password('new')
+        self.user.save()
+        self.assertIsNone(poll_tokens.verify(token))
+
+
+class ThrottlingTests(TestCase):
+    url = '/api/notifications/generate-dynamic/'
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+        NotificationTemplate.objects.create(
+            name='done', title_template='Model {model_version} trained',
+            message_template='Accuracy {accuracy}', notification_type='success',
+        )
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_bucket_refuses_after_the_burst(self):
+        bucket = throttling.TokenBucket('rate_limit:test:1', per_minute=6, burst=3)
+        self.assertEqual([bucket.take(now=100) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.take(now=100), 10)
+        self.assertEqual(bucket.take(now=110), 0)
+
+        self.client.force_login(self.user)
+        statuses = [self.client.post(self.url, '{}', content_type='application/json') for _ in range(4)]
+        self.assertEqual([response.status_code for response in statuses], [200, 200, 200, 429])
+        self.assertIn('Retry-After', statuses[-1])
+
+    def test_rate_limit_inside_single_flight_uses_other_locks(self):
+        # Both keys of user 451 posting {"count": 2} hash to the same stripe
+        digest = hashlib.sha1(b'{"count": 2}').hexdigest()
+        flight = f'single_flight:generate_dynamic:451:POST:{self.url}:{digest}'
+        with throttling.file_lock(flight):
+            with throttling.try_file_lock('rate_limit:generate_dynamic:451', wait=0) as (acquired, _):
+                self.assertTrue(acquired)
+
+    def test_admin_template_test_is_not_rate_limited(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        request = RequestFactory().post('/admin/')
+        request.user = self.user
+        model_admin = NotificationTemplateAdmin(NotificationTemplate, admin.site)
+        with mock.patch.object(model_admin, 'message_user') as message_user:
+            for _ in range(5):
+                model_admin.test_template(request, NotificationTemplate.objects.all())
+        messages = [call.args[1] for call in message_user.call_args_list]
+        self.assertEqual(messages, ['Template "done" tested successfully!'] * 5)
+
+
+class GlobalNotificationMergeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        # Own and global rows alternate by age: n0 (newest) is own, n1 global, ...
+        for i in range(13):
+            is_global = bool(i % 2)
+            notification = create_notification(f'n{i}', 'm', user=None if is_global else self.user, is_global=is_global)
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=i))
+        create_notification('for bob', 'm', user=self.other)
+
+    def test_pages_merge_globals_by_date(self):
+        first = self.client.get('/api/notifications/').json()
+        second = self.client.get('/api/notifications/', {'cursor': first['next_cursor']}).json()
+        titles = [n['title'] for n in first['notifications'] + second['notifications']]
+        self.assertEqual(titles, [f'n{i}' for i in range(13)])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_read_state_is_per_user(self):
+        notification = Notification.objects.get(title='n1')
+        mark_notifications_read(self.user, [notification.pk])
+        unread = {n['title']: n['is_read'] for n in self.client.get('/api/notifications/').json()['notifications']}
+        self.assertTrue(unread['n1'])
+        self.assertFalse(unread['n3'])
+
+        self.client.force_login(self.other)
+        titles = {n['title']: n['is_read'] for n in self.client.get('/api/notifications/').json()['notifications']}
+        self.assertFalse(titles['n1'])
+        self.assertNotIn('n0', titles)
+
+    def test_cache_is_kept_until_the_version_moves(self):
+        cache = GlobalNotificationCache()
+        rows = cache.get(1)
+        self.assertEqual(len(rows), 6)
+        # Inside the test's transaction nothing is cached: the rows may be rolled back
+        self.assertEqual(cache._entry, (None, ()))
+
+        # As stored by a request outside a transaction
+        cache._entry = (1, rows)
+        Notification.objects.filter(title='n1').update(is_active=False)
+        Notification.objects.filter(title='n3').update(expiry_date=timezone.now() - timedelta(days=1))
+        with self.assertNumQueries(0):
+            self.assertEqual(len(cache.get(1)), 6)
+        self.assertEqual(len(cache.get(2)), 5)
+        self.assertEqual([n.title for n in cache.visible(2)], ['n5', 'n7', 'n9', 'n11'])
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.addCleanup(profile_images._processed.clear)
+
+    @staticmethod
+    def upload(size=(300, 200), image_format='PNG', mode='RGB', color='red'):
+        data = io.BytesIO()
+        Image.new(mode, size, color).save(data, image_format)
+        return SimpleUploadedFile(f'me.{image_format.lower()}', data.getvalue())
+
+    def test_identical_uploads_are_stored_once(self):
+        name = profile_images.store_upload(self.upload())
+        self.assertTrue(profile_images.is_content_addressed(name))
+        self.assertTrue(name.endswith('/original.png'))
+        self.assertEqual(profile_images.store_upload(self.upload()), name)
+        self.assertEqual(default_storage.listdir(name.rsplit('/', 1)[0]), ([], ['original.png']))
+        self.assertNotEqual(profile_images.store_upload(self.upload(color='blue')), name)
+
+    def test_uploads_are_validated(self):
+        with self.settings(PROFILE_IMAGE_MAX_BYTES=100):
+            with self.assertRaisesMessage(ValidationError, 'at most 100'):
+                profile_images.store_upload(self.upload())
+        with self.settings(PROFILE_IMAGE_MAX_PIXELS=1000):
+            with self.assertRaisesMessage(ValidationError, 'pixels'):
+                profile_images.store_upload(self.upload())
+        with self.assertRaisesMessage(ValidationError, 'JPEG, PNG, WebP or GIF'):
+            profile_images.store_upload(self.upload(image_format='BMP'))
+        with self.assertRaisesMessage(ValidationError, 'valid image'):
+            profile_images.store_upload(SimpleUploadedFile('me.png', b'not an image'))
+
+    def test_variants_are_square_and_written_once(self):
+        name = profile_images.store_upload(self.upload(mode='RGBA', color=(0, 0, 0, 0)))
+        self.assertFalse(profile_images.is_processed(name))
+
+        formats = profile_images.variant_formats()
+        self.assertEqual(profile_images.make_variants(name), len(settings.PROFILE_IMAGE_SIZES) * len(formats))
+        self.assertTrue(profile_images.is_processed(name))
+        for size in settings.PROFILE_IMAGE_SIZES:
+            with default_storage.open(profile_images.variant_name(name, size, 'jpg')) as f, Image.open(f) as image:
+                self.assertEqual(image.size, (size, size))
+                # Transparency is flattened onto white
+                self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+        self.assertEqual(profile_images.make_variants(name), 0)
+
+    def test_tag_offers_variants_once_written(self):
+        template = Template('{% load profile_images %}{% profile_picture user 64 class="avatar" %}')
+        user = User(username='alice')
+        user.profile_image = profile_images.store_upload(self.upload())
+        html = template.render(Context({'user': user}))
+        self.assertTrue(html.startswith('<img src="/media/profile_pics/'))
+        self.assertIn('original.png', html)
+        self.assertIn('class="avatar"', html)
+
+        profile_images.make_variants(user.profile_image.name)
+        html = template.render(Context({'user': user}))
+        self.assertTrue(html.startswith('<picture>'))
+        self.assertIn('/64.jpg 64w', html)
+        self.assertIn('src="/media/' + profile_images.variant_name(user.profile_image.name, 64, 'jpg'), html)
+        self.assertIn('sizes="64px"', html)
+        if len(profile_images.variant_formats()) > 1:
+            self.assertIn('<source type="image/webp"', html)
@@ -0,0 +1,194 @@
+"""
+Per-user rate limits and single-flight execution for expensive views
+
+``rate_limit`` keeps a token bucket per user and scope in
+``RATE_LIMIT_CACHE``. ``RATE_LIMITS[scope]`` is ``(per_minute, burst)``:
+up to ``burst`` requests back to back, then ``per_minute`` on average;
+None turns the limit off. Refused requests get 429 with ``Retry-After``.
+
+``single_flight`` runs concurrent identical requests of one user (same
+method, path and body) once. The first one executes the view; the others
+wait for it and are answered with a copy of its response.
+
+Both must work across worker processes. The cache is the file-based
+``shared`` alias, so every process on the host sees the same buckets and
+results. Read-modify-write steps are serialized with file locks in
+``SHARED_LOCK_DIR``, since the file-based cache has no atomic operations.
+Names are hashed onto ``LOCK_STRIPES`` files, so the directory does not
+grow with every user; two names rarely share a file, and then only wait
+for each other. Each kind of lock (the part of the name before the first
+``:``) has its own stripes: ``single_flight`` holds its lock while the
+rate limit inside it takes one, and a process that locks a file it
+already holds waits for itself.
+"""
+import hashlib
+import math
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files import locks
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+
+LOCK_STRIPES = 1024
+
+
+def _cache():
+    return caches[settings.RATE_LIMIT_CACHE]
+
+
+def _lock_path(name):
+    directory = os.path.join(settings.SHARED_LOCK_DIR, name.split(':', 1)[0])
+    os.makedirs(directory, exist_ok=True)
+    stripe = int(hashlib.sha1(name.encode()).hexdigest(), 16) % LOCK_STRIPES
+    return os.path.join(directory, f'{stripe:04d}.lock')
+
+
+@contextmanager
+def file_lock(name):
+    """Exclusive lock on ``name`` shared by all processes on this host"""
+    with open(_lock_path(name), 'a') as f:
+        locks.lock(f, locks.LOCK_EX)
+        try:
+            yield
+        finally:
+            locks.unlock(f)
+
+
+@contextmanager
+def try_file_lock(name, wait):
+    """
+    Like ``file_lock``, but give up after ``wait`` seconds
+
+    Yields:
+        tuple: ``(acquired, waited)``: whether the lock is held, and whether
+        another process held it when we arrived
+    """
+    with open(_lock_path(name), 'a') as f:
+        deadline = time.monotonic() + wait
+        acquired = locks.lock(f, locks.LOCK_EX | locks.LOCK_NB)
+        waited = not acquired
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.05)
+            acquired = locks.lock(f, locks.LOCK_EX | locks.LOCK_NB)
+        try:
+            yield acquired, waited
+        finally:
+            if acquired:
+                locks.unlock(f)
+
+
+class TokenBucket:
+    """
+    Args:
+        key (str): Cache key of the bucket
+        per_minute (float): Tokens added per minute
+        burst (int): Tokens the bucket holds at most
+    """
+
+    def __init__(self, key, per_minute, burst):
+        self.key = key
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    def take(self, now=None):
+        """
+        Take one token
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+        now = time.time() if now is None else now
+        cache = _cache()
+        with file_lock(self.key):
+            tokens, updated = cache.get(self.key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                wait = 0.0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            # A bucket left alone until it is full again is the same as none
+            cache.set(self.key, (tokens, now), timeout=math.ceil(self.burst / self.rate) + 1)
+        return wait
+
+
+def rate_limit(scope):
+    """
+    Refuse a user's requests to the view beyond ``RATE_LIMITS[scope]``
+
+    Put it inside ``login_required``; anonymous requests are not limited,
+    nor are requests built in-process with ``_dont_enforce_rate_limits``
+    set, as ``_dont_enforce_csrf_checks`` skips the CSRF check.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            limit = settings.RATE_LIMITS.get(scope)
+            enforce = not getattr(request, '_dont_enforce_rate_limits', False)
+            if limit is not None and enforce and request.user.is_authenticated:
+                per_minute, burst = limit
+                wait = TokenBucket(f'rate_limit:{scope}:{request.user.pk}', per_minute, burst).take()
+                if wait:
+                    metrics.rate_limited_requests.inc(scope=scope)
+                    response = JsonResponse({'error': 'Too many requests, slow down'}, status=429)
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapped_view
+    return decorator
+
+
+def single_flight(scope, wait=10):
+    """
+    Run concurrent identical requests of one user only once
+
+    The first request runs the view while holding a lock; identical requests
+    arriving meanwhile wait up to ``wait`` seconds for it and get a copy of
+    its response (status, body, content type and ``Retry-After``). A request
+    that waits longer runs the view itself.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            digest = hashlib.sha1(request.body).hexdigest()
+            key = f'single_flight:{scope}:{request.user.pk}:{request.method}:{request.path}:{digest}'
+            arrived = time.time()
+            cache = _cache()
+            with try_file_lock(key, wait) as (acquired, waited):
+                if acquired and waited:
+                    shared = cache.get(key)
+                    if shared is not None and shared['finished'] >= arrived:
+                        # Finished while we waited: it ran for us too
+                        metrics.coalesced_requests.inc(scope=scope)
+                        return _rebuild(shared)
+                response = view_func(request, *args, **kwargs)
+                if acquired and not response.streaming:
+                    cache.set(key, _freeze(response), timeout=wait + 5)
+                return response
+        return wrapped_view
+    return decorator
+
+
+def _freeze(response):
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'retry_after': response.get('Retry-After'),
+        'finished': time.time(),
+    }
+
+
+def _rebuild(shared):
+    response = HttpResponse(shared['content'], status=shared['status'], content_type=shared['content_type'])
+    if shared['retry_after']:
+        response['Retry-After'] = shared['retry_after']
+    return response
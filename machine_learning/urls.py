@@ -27,8 +27,14 @@ urlpatterns = [
 
     # API URLs
     path('api/notifications/', views.get_notifications_api, name='get_notifications_api'),
+    path('api/notifications/stream/', views.notification_stream, name='notification_stream'),
     path('api/notifications/create/', views.create_notification_api, name='create_notification_api'),
+    path('api/notifications/bulk/', views.create_notifications_bulk_api, name='create_notifications_bulk_api'),
+    path('api/notifications/ingest/stats/', views.notification_ingest_stats, name='notification_ingest_stats'),
     path('api/notifications/generate-dynamic/', views.generate_dynamic_notifications, name='generate_dynamic_notifications'),
+
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
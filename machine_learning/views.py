@@ -1,16 +1,29 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.cache import cache_control
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.contrib.auth.models import User
+import hashlib
 import json
-import random
-from .models import Notification, NotificationTemplate
-from .models import ServiceCard
+import time
+from .models import Notification, NotificationCounter, NotificationChange
+from .notification_stream import event_stream
+from .notification_ingest import ingest_buffer
+from .notification_utils import build_notification, create_dynamic_notifications, create_notifications_bulk
+from . import metrics, profile_images, serializers
+from .pagination import KeysetPaginator, InvalidCursor
+from .global_notifications import global_notifications
+from .routers import use_primary
+from .poll_tokens import poll_token_auth, revoke as revoke_poll_tokens
+from .throttling import rate_limit, single_flight
+from .service_cards import get_grid as get_service_grid
 
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
@@ -20,11 +33,11 @@ from django.http import JsonResponse
 
 # ---------------- Index ----------------
 @login_required
+@ensure_csrf_cookie
 def index(request):
-    # Your existing services
-    from .models import ServiceCard
-    services = ServiceCard.objects.all()
-    return render(request, 'layout/layout.master.html', {'services': services})
+    # Card grid is cached until a ServiceCard changes
+    service_grid, _ = get_service_grid()
+    return render(request, 'layout/layout.master.html', {'service_grid': service_grid})
 
 # ---------------- Signup ----------------
 def signup_view(request):
@@ -77,6 +90,8 @@ def login_view(request):
 # ---------------- Logout ----------------
 @login_required
 def logout_view(request):
+    # The page's polling token would otherwise outlive the session
+    revoke_poll_tokens(request.user.pk)
     logout(request)
     return redirect('machine_learning:login')
 
@@ -108,13 +123,22 @@ def edit_profile(request):
         if User.objects.filter(email=email).exclude(id=user.id).exists():
             return render(request, 'profile/edit.html', {'error': 'Email already registered', 'user': user})
 
+        if profile_image:
+            # Stored under the hash of its content; the resized copies the
+            # pages show are written in the background
+            try:
+                image_name = profile_images.store_upload(profile_image)
+            except ValidationError as e:
+                return render(request, 'profile/edit.html', {'error': e.messages[0], 'user': user})
+            profile_images.process_in_background(image_name)
+
         # Update user
         user.username = username
         user.email = email
         user.first_name = first_name
         user.last_name = last_name
         if profile_image:
-            user.profile_image = profile_image  # from your added User field
+            user.profile_image = image_name  # from your added User field
         user.save()
 
         return redirect('machine_learning:profile')
@@ -123,42 +147,46 @@ def edit_profile(request):
 
 # Notification Views
 @login_required
+@ensure_csrf_cookie
 def notification_list(request):
     """List all notifications for the current user"""
-    notifications = Notification.objects.filter(
-        Q(user=request.user) | Q(is_global=True),
-        is_active=True
-    ).exclude(
-        Q(expiry_date__lt=timezone.now()) & Q(auto_expire=True)
-    ).order_by('-created_at')
-    
-    # Pagination
-    paginator = Paginator(notifications, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Badge counts come from the denormalized counters
+    user_counter, global_counter = _notification_counters(request)
+    unread_count, total_count = NotificationCounter.objects.combine(user_counter, global_counter)
     
-    # Count unread notifications
-    unread_count = notifications.filter(is_read=False).count()
+    # Keyset pagination: no OFFSET and no COUNT, the counter total is shown instead.
+    # Global notifications come from the in-process cache and are merged in.
+    paginator = KeysetPaginator(
+        _own_notifications(request.user), 20, total=total_count,
+        extra_rows=global_notifications.for_user(request.user, global_counter.version),
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'notifications': page_obj,
         'unread_count': unread_count,
-        'total_count': notifications.count(),
+        'total_count': total_count,
     }
     return render(request, 'notifications/list.html', context)
 
 @login_required
+@ensure_csrf_cookie
+@use_primary
 def notification_detail(request, notification_id):
     """View notification details and mark as read"""
-    notification = get_object_or_404(Notification, id=notification_id)
+    notification = get_object_or_404(
+        Notification.objects.retained().with_read_state(request.user), id=notification_id
+    )
     
     # Check if user can view this notification
     if notification.user and notification.user != request.user and not notification.is_global:
         return HttpResponse("Not authorized", status=403)
     
     # Mark as read when viewed
-    if not notification.is_read:
-        notification.mark_as_read()
+    if not notification.user_has_read:
+        notification.mark_as_read(request.user)
+        notification.user_has_read = True
+        notification.user_read_at = timezone.now()
     
     context = {
         'notification': notification,
@@ -169,29 +197,26 @@ def notification_detail(request, notification_id):
 @require_http_methods(["POST"])
 def mark_notification_read(request, notification_id):
     """Mark a specific notification as read"""
-    notification = get_object_or_404(Notification, id=notification_id)
+    notification = get_object_or_404(Notification.objects.retained(), id=notification_id)
     
     # Check if user can modify this notification
     if notification.user and notification.user != request.user and not notification.is_global:
         return JsonResponse({'error': 'Not authorized'}, status=403)
     
-    notification.mark_as_read()
+    notification.mark_as_read(request.user)
     return JsonResponse({'success': True, 'message': 'Notification marked as read'})
 
 @login_required
 @require_http_methods(["POST"])
 def mark_all_read(request):
     """Mark all notifications as read for the current user"""
-    notifications = Notification.objects.filter(
+    notifications = Notification.objects.retained().filter(
         Q(user=request.user) | Q(is_global=True),
-        is_read=False,
         is_active=True
     )
     
-    updated_count = notifications.update(
-        is_read=True,
-        read_at=timezone.now()
-    )
+    # Own notifications are flagged, global ones get this user's receipts
+    updated_count = notifications.mark_read_for(request.user)
     
     return JsonResponse({
         'success': True, 
@@ -202,7 +227,7 @@ def mark_all_read(request):
 @require_http_methods(["POST"])
 def delete_notification(request, notification_id):
     """Delete a notification"""
-    notification = get_object_or_404(Notification, id=notification_id)
+    notification = get_object_or_404(Notification.objects.retained(), id=notification_id)
     
     # Check if user can delete this notification
     if notification.user and notification.user != request.user and not notification.is_global:
@@ -213,44 +238,208 @@ def delete_notification(request, notification_id):
 
 # API Views for AJAX
 
-@login_required
-def get_notifications_api(request):
-    """API endpoint to get notifications for AJAX requests"""
-    notifications = Notification.objects.filter(
-        Q(user=request.user) | Q(is_global=True),
+def _notification_counters(request):
+    """Load the user's and global counter rows once per request"""
+    if not hasattr(request, '_notification_counters'):
+        request._notification_counters = NotificationCounter.objects.for_user(request.user)
+    return request._notification_counters
+
+def notifications_etag(request):
+    """
+    Cheap version stamp for a user's notification feed
+
+    Built from the counter versions, which move on every change to the
+    user's or the global notifications. Expiry is time based rather than a
+    write, so a time bucket is mixed in to bound how long an expired
+    notification can be served from a client's cache.
+    """
+    user_counter, global_counter = _notification_counters(request)
+    bucket = int(time.time() // settings.NOTIFICATIONS_ETAG_MAX_AGE)
+    etag = f'n{request.user.pk}-{user_counter.version}-{global_counter.version}-{bucket}'
+    if request.GET:
+        # Deltas and pages depend on the cursor they were asked for
+        etag += '-' + hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12]
+    return etag
+
+def notifications_last_modified(request):
+    """Latest change to the user's or the global notifications"""
+    return max(counter.updated_at for counter in _notification_counters(request))
+
+def _visible_notifications(user):
+    """
+    Active, unexpired notifications for a user, including global ones,
+    annotated with the user's read state. Limited to the retention window
+    so MySQL only reads the partitions of those months. For lookups by id;
+    lists use ``_own_notifications`` and the cached globals.
+    """
+    return Notification.objects.retained().with_read_state(user).filter(
+        Q(user=user) | Q(is_global=True),
         is_active=True
     ).exclude(
         Q(expiry_date__lt=timezone.now()) & Q(auto_expire=True)
-    ).order_by('-created_at')[:10]  # Limit to 10 most recent
-    
-    notifications_data = []
-    for notification in notifications:
-        notifications_data.append({
-            'id': str(notification.id),
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.notification_type,
-            'priority': notification.priority,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.isoformat(),
-            'action_url': notification.action_url,
-            'action_text': notification.action_text,
-            'model_name': notification.model_name,
-        })
-    
-    unread_count = Notification.objects.filter(
-        Q(user=request.user) | Q(is_global=True),
-        is_read=False,
+    )
+
+def _own_notifications(user):
+    """
+    Like ``_visible_notifications`` without the global ones, which lists
+    merge in from ``global_notifications``
+    """
+    return Notification.objects.retained().owned_by(user).filter(
         is_active=True
     ).exclude(
         Q(expiry_date__lt=timezone.now()) & Q(auto_expire=True)
-    ).count()
+    )
+
+@poll_token_auth
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notifications_etag, last_modified_func=notifications_last_modified)
+def get_notifications_api(request):
+    """
+    API endpoint to get notifications for AJAX requests
+
+    Without parameters this returns the 10 most recent notifications, a
+    ``next_cursor`` for older pages (``?cursor=<next_cursor>``) and a sync
+    ``cursor``. Passing the sync cursor back as ``?since=<cursor>`` returns
+    only what changed after it; see ``_notifications_delta``.
+    """
+    since = request.GET.get('since')
+    if since is not None:
+        if not since.isdigit():
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        if not NotificationChange.objects.is_cursor_expired(int(since)):
+            return _notifications_delta(request, int(since))
     
-    return JsonResponse({
+    # Taken before reading the list so nothing is missed in between
+    cursor = NotificationChange.objects.current_cursor()
+    # The global counter read for the ETag may predate the cursor; the
+    # globals must be at least as new, so read its version again
+    global_rows = [
+        serializers.FEED.row(notification)
+        for notification in global_notifications.for_user(
+            request.user, NotificationCounter.objects.global_version()
+        )
+    ]
+    rows = serializers.FEED.rows(_own_notifications(request.user))
+    try:
+        page = KeysetPaginator(rows, 10, extra_rows=global_rows).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid page cursor'}, status=400)
+    
+    notifications_data = [serializers.FEED.output(row) for row in page]
+    
+    # The counters were loaded for the ETag already, so this costs no query
+    unread_count, _ = NotificationCounter.objects.combine(*_notification_counters(request))
+    
+    response = {
         'notifications': notifications_data,
-        'unread_count': unread_count
+        'unread_count': unread_count,
+        'next_cursor': page.next_cursor,
+        'cursor': str(cursor),
+    }
+    if since is not None:
+        # The cursor is outside the change log: start over from a snapshot
+        response['reset'] = True
+    return serializers.json_response(response)
+
+def _notifications_delta(request, since):
+    """
+    Changes to a user's notifications after the ``since`` cursor
+
+    Returns changed notifications in full, read-state changes as
+    ``{id, is_read}`` pairs and the ids of notifications that were deleted,
+    expired or are otherwise no longer visible. ``has_more`` is set when the
+    client should ask again straight away with the new cursor.
+    """
+    page_size = settings.NOTIFICATIONS_SYNC_PAGE_SIZE
+    changes = NotificationChange.objects.changes_since(request.user, since, page_size + 1)
+    has_more = len(changes) > page_size
+    changes = changes[:page_size]
+    
+    # Only the latest change per notification matters; a full update wins
+    # over a read-state change that came before it
+    latest = {}
+    for _, notification_id, change_type, _ in changes:
+        if change_type == NotificationChange.READ and latest.get(notification_id) == NotificationChange.UPSERT:
+            continue
+        latest[notification_id] = change_type
+    
+    live_ids = [
+        notification_id for notification_id, change_type in latest.items()
+        if change_type in (NotificationChange.UPSERT, NotificationChange.READ)
+    ]
+    visible = {
+        row['id']: row
+        for row in serializers.DELTA.rows(
+            _visible_notifications(request.user).filter(id__in=live_ids).order_by()
+        )
+    }
+    
+    notifications_data = []
+    read_state = []
+    removed = []
+    for notification_id, change_type in latest.items():
+        row = visible.get(notification_id)
+        if row is None:
+            removed.append(notification_id)
+        elif change_type == NotificationChange.READ:
+            read_state.append({'id': notification_id, 'is_read': row['user_has_read']})
+        else:
+            notifications_data.append(serializers.DELTA.output(row))
+    
+    # Never move the cursor past entries that might not be committed yet
+    cutoff = NotificationChange.objects.settled_cutoff()
+    cursor = since
+    for change_id, _, _, created_at in changes:
+        if created_at > cutoff:
+            break
+        cursor = change_id
+    
+    unread_count, _ = NotificationCounter.objects.combine(*_notification_counters(request))
+    
+    return serializers.json_response({
+        'notifications': notifications_data,
+        'read_state': read_state,
+        'removed': removed,
+        'unread_count': unread_count,
+        'cursor': str(cursor),
+        'has_more': has_more and cursor > since,
     })
 
+@login_required
+async def notification_stream(request):
+    """Server-Sent Events stream announcing changes to the user's notifications"""
+    if not isinstance(request, ASGIRequest):
+        # An endless stream would hold a WSGI worker; 204 stops EventSource
+        # from reconnecting and the page keeps polling instead
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        event_stream(user.pk, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _api_notification_payload(data, user):
+    """Fields for a notification posted to the create APIs by ``user``"""
+    is_global = data.get('is_global', False)
+    return {
+        'title': data.get('title'),
+        'message': data.get('message'),
+        'notification_type': data.get('type', 'info'),
+        'priority': data.get('priority', 'medium'),
+        'user': None if is_global else user,
+        'is_global': is_global,
+        'action_url': data.get('action_url', ''),
+        'action_text': data.get('action_text', ''),
+        'model_name': data.get('model_name', ''),
+        'operation_id': data.get('operation_id', ''),
+        'metadata': data.get('metadata', {}),
+        'auto_expire': data.get('auto_expire', True),
+    }
+
 @login_required
 @csrf_exempt
 def create_notification_api(request):
@@ -269,6 +458,9 @@ def create_notification_api(request):
         if not title or not message:
             return JsonResponse({'error': 'Title and message are required'}, status=400)
         
+        if settings.NOTIFICATIONS_INGEST_MODE == 'buffered':
+            return _buffer_notification(_api_notification_payload(data, request.user))
+        
         # Create notification
         notification = Notification.objects.create(
             title=title,
@@ -296,6 +488,84 @@ def create_notification_api(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+def _buffer_notification(payload):
+    """Validate a notification and queue it for the write-behind buffer"""
+    notification, errors = build_notification(payload)
+    if errors:
+        return JsonResponse({'error': 'Invalid notification', 'errors': errors}, status=400)
+    
+    if not ingest_buffer.submit(notification):
+        response = JsonResponse({'error': 'Too many pending notifications, retry later'}, status=429)
+        response['Retry-After'] = '1'
+        return response
+    
+    # The id is final; the row is written by the buffer shortly after
+    return JsonResponse({
+        'success': True,
+        'notification_id': str(notification.id),
+        'message': 'Notification accepted'
+    }, status=202)
+
+@login_required
+def notification_ingest_stats(request):
+    """Queue depth and flush latency of the write-behind buffer (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Not authorized'}, status=403)
+    return JsonResponse({'mode': settings.NOTIFICATIONS_INGEST_MODE, **ingest_buffer.stats()})
+
+def metrics_view(request):
+    """Prometheus metrics of all worker processes, for METRICS_ALLOWED_IPS and staff"""
+    if (request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+            and not request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(
+        metrics.registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+@login_required
+@csrf_exempt
+def create_notifications_bulk_api(request):
+    """
+    API endpoint to create many notifications in one request
+    
+    Takes ``{"notifications": [...]}`` with items shaped like the body of
+    ``create_notification_api`` and answers with a result per item: the new
+    id, or the validation errors that kept it from being created.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    items = data.get('notifications') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'A non-empty "notifications" list is required'}, status=400)
+    if len(items) > settings.NOTIFICATIONS_BULK_MAX_ITEMS:
+        return JsonResponse(
+            {'error': f'At most {settings.NOTIFICATIONS_BULK_MAX_ITEMS} notifications per request'},
+            status=413,
+        )
+    
+    # Same fields and defaults as the single create API
+    payloads = [
+        _api_notification_payload(item, request.user) if isinstance(item, dict) else item
+        for item in items
+    ]
+    
+    results = create_notifications_bulk(payloads, chunk_size=settings.NOTIFICATIONS_BULK_CHUNK_SIZE)
+    created = sum(1 for result in results if 'id' in result)
+    
+    return JsonResponse({
+        'success': created == len(results),
+        'created': created,
+        'failed': len(results) - created,
+        'results': results,
+    }, status=200 if created else 400)
+
 # Utility functions for creating notifications
 
 def create_ml_training_notification(user, model_name, status, details=None):
@@ -350,7 +620,8 @@ def create_system_notification(title, message, priority='medium', is_global=True
     )
 
 @login_required
-@csrf_exempt
+@single_flight('generate_dynamic')
+@rate_limit('generate_dynamic')
 def generate_dynamic_notifications(request):
     """Generate and save dynamic notifications to database"""
     if request.method != 'POST':
@@ -365,115 +636,12 @@ def generate_dynamic_notifications(request):
         if not isinstance(count, int) or count < 1 or count > 10:
             count = 2  # Default to 2 if invalid
         
-        # Get notification templates from database
-        notification_templates = []
-        templates = NotificationTemplate.objects.filter(is_active=True)
+        created_notifications = [
+            serializers.GENERATED.from_instance(notification)
+            for notification in create_dynamic_notifications([request.user.id], count)
+        ]
         
-        for template in templates:
-            # Generate random values for template variables
-            template_data = {
-                'accuracy': f"{85 + (random.random() * 10):.1f}",
-                'records': random.randint(1000, 11000),
-                'duration': random.randint(5, 65),
-                'cpu_usage': random.randint(70, 90),
-                'confidence': f"{random.random() * 0.3 + 0.7:.2f}",
-                'improvement': f"{random.random() * 2 + 0.5:.1f}",
-                'file_size': random.randint(10, 60),
-                'record_count': random.randint(10000, 110000),
-                'model_version': random.randint(1, 10),
-                'predictor_version': random.randint(1, 3),
-                'production_version': random.randint(1, 3),
-                'anomaly_confidence': f"{random.random() * 0.2 + 0.8:.2f}",
-                'neural_net_version': random.randint(1, 5)
-            }
-            
-            # Format the template with random data
-            try:
-                formatted_title = template.title_template.format(**template_data)
-                formatted_message = template.message_template.format(**template_data)
-                
-                # Determine model name and action based on template type
-                model_name = ''
-                action_text = ''
-                action_url = ''
-                
-                if template.notification_type == 'training':
-                    model_name = f'NeuralNet_v{template_data["neural_net_version"]}'
-                    action_text = 'View Progress'
-                    action_url = '/models/training/'
-                elif template.notification_type == 'prediction':
-                    model_name = f'Predictor_{template_data["predictor_version"]}'
-                    action_text = 'View Prediction'
-                    action_url = '/predictions/'
-                elif template.notification_type == 'success' and 'model' in template.name:
-                    model_name = f'Model_v{template_data["model_version"]}'
-                    action_text = 'View Model'
-                    action_url = '/models/'
-                elif template.notification_type == 'info' and 'data' in template.name:
-                    action_text = 'View Results'
-                    action_url = '/data/processing/'
-                elif template.notification_type == 'warning' and 'system' in template.name:
-                    action_text = 'View Metrics'
-                    action_url = '/system/metrics/'
-                elif template.notification_type == 'warning' and 'anomaly' in template.name:
-                    action_text = 'Investigate'
-                    action_url = '/anomalies/'
-                elif template.notification_type == 'success' and 'deployment' in template.name:
-                    model_name = f'Production_Model_v{template_data["production_version"]}'
-                    action_text = 'Deploy Now'
-                    action_url = '/deploy/'
-                elif template.notification_type == 'info' and 'dataset' in template.name:
-                    action_text = 'View Dataset'
-                    action_url = '/datasets/'
-                
-                notification_templates.append({
-                    'title': formatted_title,
-                    'message': formatted_message,
-                    'notification_type': template.notification_type,
-                    'priority': template.priority,
-                    'model_name': model_name,
-                    'action_text': action_text,
-                    'action_url': action_url
-                })
-            except KeyError as e:
-                # Skip templates with missing variables
-                continue
-        
-        # Select the requested number of random notifications
-        selected_notifications = random.sample(notification_templates, min(count, len(notification_templates)))
-        created_notifications = []
-        
-        for template in selected_notifications:
-            notification = Notification.objects.create(
-                title=template['title'],
-                message=template['message'],
-                notification_type=template['notification_type'],
-                priority=template['priority'],
-                user=request.user,
-                model_name=template.get('model_name', ''),
-                action_text=template.get('action_text', ''),
-                action_url=template.get('action_url', ''),
-                metadata={
-                    'isDynamic': True,
-                    'generated_at': timezone.now().isoformat(),
-                    'generated_by': 'system',
-                    'source': 'dynamic_generator'
-                }
-            )
-            created_notifications.append({
-                'id': str(notification.id),
-                'title': notification.title,
-                'message': notification.message,
-                'type': notification.notification_type,
-                'priority': notification.priority,
-                'created_at': notification.created_at.isoformat(),
-                'action_url': notification.action_url,
-                'action_text': notification.action_text,
-                'model_name': notification.model_name,
-                'metadata': notification.metadata
-            })
-        
-        return JsonResponse({
+        return serializers.json_response({
             'success': True,
             'notifications': created_notifications,
             'message': f'Generated {len(created_notifications)} dynamic notifications'